@@ -6,4 +6,5 @@ class MbpConfig(AppConfig):
     name = 'MBP'
 
     def ready(self):
+        import MBP.checks
         import MBP.signals
@@ -0,0 +1,189 @@
+import gzip
+import json
+import os
+import threading
+import uuid
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from .audit import audit_setting
+
+SEGMENT_SUFFIX = '.jsonl.gz'
+INDEX_SUFFIX = '.idx.json'
+
+
+def archive_dir():
+    return str(audit_setting('ARCHIVE_DIR') or os.path.join(settings.BASE_DIR, 'audit_archive'))
+
+
+def format_timestamp(value):
+    """Fixed-width UTC timestamp, so archived timestamps compare correctly as strings."""
+    return value.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def archive_row(entry):
+    """Flatten an AuditLog (with user selected) into the shape AuditLogSerializer returns."""
+    return {
+        'id': entry.id,
+        'user': str(entry.user_id) if entry.user_id else None,
+        'user_email': entry.user.email if entry.user_id else None,
+        'action': entry.action,
+        'model_name': entry.model_name,
+        'object_id': entry.object_id,
+        'details': entry.details,
+        'old_data': entry.old_data,
+        'new_data': entry.new_data,
+        'ip_address': entry.ip_address,
+        'user_agent': entry.user_agent,
+        'timestamp': format_timestamp(entry.timestamp),
+    }
+
+
+def _fsync_replace(tmp_path, path):
+    with open(tmp_path, 'rb') as fh:
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_segment(rows, directory=None, block_rows=1000):
+    """
+    Write rows (sorted by timestamp, oldest first) as a new gzip JSONL segment.
+
+    Each block of block_rows lines is its own gzip member, so the segment is a
+    valid .gz file as a whole while a reader can seek to a single block. The
+    sidecar index holds the timestamp range and byte range of every block plus
+    the blocks each user and model_name appears in. It is published last, which
+    makes the segment visible to readers.
+    """
+    directory = directory or archive_dir()
+    os.makedirs(directory, exist_ok=True)
+
+    first, last = rows[0]['timestamp'], rows[-1]['timestamp']
+    name = f"auditlog-{first[:19].replace(':', '')}-{last[:19].replace(':', '')}-{uuid.uuid4().hex[:8]}"
+    segment_path = os.path.join(directory, name + SEGMENT_SUFFIX)
+
+    blocks, users, model_names = [], {}, {}
+    with open(segment_path + '.tmp', 'wb') as fh:
+        for start in range(0, len(rows), block_rows):
+            chunk = rows[start:start + block_rows]
+            payload = ''.join(
+                json.dumps(row, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n' for row in chunk
+            ).encode()
+            data = gzip.compress(payload)
+            number = len(blocks)
+            blocks.append({
+                'offset': fh.tell(),
+                'length': len(data),
+                'rows': len(chunk),
+                'min_timestamp': chunk[0]['timestamp'],
+                'max_timestamp': chunk[-1]['timestamp'],
+            })
+            fh.write(data)
+
+            for row in chunk:
+                if row['user']:
+                    numbers = users.setdefault(row['user'], [])
+                    if not numbers or numbers[-1] != number:
+                        numbers.append(number)
+                if row['model_name']:
+                    numbers = model_names.setdefault(row['model_name'], [])
+                    if not numbers or numbers[-1] != number:
+                        numbers.append(number)
+    _fsync_replace(segment_path + '.tmp', segment_path)
+
+    index = {
+        'segment': name + SEGMENT_SUFFIX,
+        'rows': len(rows),
+        'min_timestamp': first,
+        'max_timestamp': last,
+        'blocks': blocks,
+        'users': users,
+        'model_names': model_names,
+    }
+    index_path = os.path.join(directory, name + INDEX_SUFFIX)
+    with open(index_path + '.tmp', 'w') as fh:
+        json.dump(index, fh, separators=(',', ':'))
+    _fsync_replace(index_path + '.tmp', index_path)
+    return index
+
+
+class AuditArchive:
+    """Reads archived audit segments through their sidecar indexes."""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._indexes = {}
+
+    def segments(self):
+        """Segment indexes, newest first. Parsed indexes are cached by file mtime."""
+        directory = self.directory or archive_dir()
+        if not os.path.isdir(directory):
+            return []
+
+        indexes = {}
+        for file_name in os.listdir(directory):
+            if not file_name.endswith(INDEX_SUFFIX):
+                continue
+            path = os.path.join(directory, file_name)
+            mtime = os.path.getmtime(path)
+            cached = self._indexes.get(path)
+            if cached and cached[0] == mtime:
+                indexes[path] = cached
+                continue
+            with open(path) as fh:
+                indexes[path] = (mtime, json.load(fh))
+
+        with self._lock:
+            self._indexes = indexes
+        return sorted(
+            (index for _, index in indexes.values()),
+            key=lambda index: index['max_timestamp'],
+            reverse=True
+        )
+
+    def _read_block(self, index, block):
+        path = os.path.join(self.directory or archive_dir(), index['segment'])
+        with open(path, 'rb') as fh:
+            fh.seek(block['offset'])
+            data = gzip.decompress(fh.read(block['length']))
+        return [json.loads(line) for line in data.decode().splitlines()]
+
+    def _candidate_blocks(self, index, user_ids, model_name):
+        numbers = set(range(len(index['blocks'])))
+        if user_ids is not None:
+            numbers &= {n for user_id in user_ids for n in index['users'].get(user_id, ())}
+        if model_name:
+            numbers &= set(index['model_names'].get(model_name, ()))
+        return sorted(numbers, reverse=True)
+
+    def query(self, user_ids=None, action=None, model_name=None, before=None):
+        """
+        Yield archived rows, newest first, matching the given filters.
+        user_ids is a collection of user id strings; before is a (timestamp, id)
+        key with a formatted timestamp, and only rows strictly older are returned.
+        """
+        if user_ids is not None:
+            user_ids = {str(user_id) for user_id in user_ids}
+        before_timestamp = before[0] if before else None
+        for index in self.segments():
+            if before_timestamp and index['min_timestamp'] > before_timestamp:
+                continue
+            for number in self._candidate_blocks(index, user_ids, model_name):
+                block = index['blocks'][number]
+                if before_timestamp and block['min_timestamp'] > before_timestamp:
+                    continue
+                for row in reversed(self._read_block(index, block)):
+                    if before and (row['timestamp'], row['id']) >= tuple(before):
+                        continue
+                    if user_ids is not None and row['user'] not in user_ids:
+                        continue
+                    if action and row['action'] != action:
+                        continue
+                    if model_name and row['model_name'] != model_name:
+                        continue
+                    yield row
+
+
+audit_archive = AuditArchive()
@@ -0,0 +1,60 @@
+import atexit
+
+from django.apps import apps
+from django.conf import settings
+from .buffer import BufferedWriter
+from .models import AuditLog
+
+AUDIT_LOG_DEFAULTS = {
+    'BUFFERED': True,       # False writes every entry synchronously inside the request
+    'BATCH_SIZE': 200,      # flush as soon as this many entries are queued
+    'FLUSH_INTERVAL': 2.0,  # seconds between background flushes
+    'MAX_QUEUE': 10000,     # entries beyond this are dropped and counted
+    'DELTA': False,         # store only the changed fields of updates in old_data/new_data
+    'ARCHIVE_DIR': None,    # archive_audit_logs segments; defaults to BASE_DIR / 'audit_archive'
+    'ARCHIVE_AFTER_DAYS': 90,
+    'MODELS': (),           # "app_label.Model" labels whose writes are audited
+}
+
+
+def audit_setting(name):
+    return getattr(settings, 'AUDIT_LOG', {}).get(name, AUDIT_LOG_DEFAULTS[name])
+
+
+_audited_models = set()
+
+
+def audited(model):
+    """Class decorator registering a model for create/update/delete audit logging."""
+    _audited_models.add(model)
+    return model
+
+
+def audited_models():
+    """Models registered with @audited plus those listed in AUDIT_LOG['MODELS']."""
+    models = set(_audited_models)
+    models.update(apps.get_model(label) for label in audit_setting('MODELS'))
+    models.discard(AuditLog)
+    return models
+
+
+class AuditSink(BufferedWriter):
+    """
+    Queues AuditLog rows and writes them with bulk_create from a background thread.
+
+    Entries recorded inside a transaction are only queued once it commits, so a
+    rolled back write leaves no audit row. The queue is flushed when it reaches
+    BATCH_SIZE, every FLUSH_INTERVAL seconds and at interpreter shutdown.
+    """
+    thread_name = 'audit-log-writer'
+    label = 'audit logs'
+
+    def setting(self, name):
+        return audit_setting(name)
+
+    def write_batch(self, entries):
+        AuditLog.objects.bulk_create(entries, batch_size=audit_setting('BATCH_SIZE'))
+
+
+audit_sink = AuditSink()
+atexit.register(audit_sink.shutdown)
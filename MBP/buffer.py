@@ -0,0 +1,121 @@
+import os
+import threading
+
+from django.db import transaction, close_old_connections
+
+
+class BufferedWriter:
+    """
+    Queues rows and writes them in batches from a background thread.
+
+    Entries recorded inside a transaction are only queued once it commits, so a
+    rolled back write leaves no row. The queue is flushed when it reaches
+    BATCH_SIZE, every FLUSH_INTERVAL seconds and at interpreter shutdown.
+    Subclasses provide setting() (BUFFERED, BATCH_SIZE, FLUSH_INTERVAL and
+    MAX_QUEUE) and write_batch().
+    """
+    thread_name = 'buffered-writer'
+    label = 'rows'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._buffer = []
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+        self.written = 0
+        self.dropped = 0
+
+    def setting(self, name):
+        raise NotImplementedError
+
+    def write_batch(self, entries):
+        raise NotImplementedError
+
+    def record(self, entry):
+        self.record_many([entry])
+
+    def record_many(self, entries):
+        if not entries:
+            return
+
+        if not self.setting('BUFFERED'):
+            self._write(entries)
+            return
+
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self._enqueue(entries))
+        else:
+            self._enqueue(entries)
+
+    def _enqueue(self, entries):
+        with self._lock:
+            room = max(self.setting('MAX_QUEUE') - len(self._buffer), 0)
+            if len(entries) > room:
+                self.dropped += len(entries) - room
+                entries = entries[:room]
+            self._buffer.extend(entries)
+            full = len(self._buffer) >= self.setting('BATCH_SIZE')
+
+        if not self._ensure_thread():
+            self.flush()
+        elif full:
+            self._wakeup.set()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return True
+        if self._stopping:
+            return False
+
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+                try:
+                    thread.start()
+                except RuntimeError:
+                    # Interpreter is shutting down; the caller writes synchronously
+                    return False
+                self._thread = thread
+                self._pid = os.getpid()
+        return True
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.setting('FLUSH_INTERVAL'))
+            self._wakeup.clear()
+            self.flush()
+            close_old_connections()
+
+    def flush(self):
+        with self._lock:
+            entries, self._buffer = self._buffer, []
+        if entries:
+            self._write(entries)
+
+    def _write(self, entries):
+        try:
+            self.write_batch(entries)
+        except Exception as e:
+            with self._lock:
+                self.dropped += len(entries)
+            print(f"Failed to write {self.label}:", e)
+        else:
+            with self._lock:
+                self.written += len(entries)
+
+    def shutdown(self):
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._buffer),
+                'written': self.written,
+                'dropped': self.dropped,
+            }
@@ -0,0 +1,298 @@
+from django.contrib.auth.base_user import AbstractBaseUser
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db import IntegrityError, models, router, transaction
+from django.db.models.signals import post_save
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import MethodNotAllowed, ValidationError
+from rest_framework.response import Response
+from rest_framework.relations import PrimaryKeyRelatedField, SlugRelatedField
+from rest_framework.serializers import ModelSerializer
+from rest_framework.utils import model_meta
+from .audit import audited_models
+from .slugs import UniqueSlugMixin, assign_unique_slugs
+from .utils import serialize_instance, audit_update_data, log_audit_batch
+
+BULK_PERMISSION_CODES = {'POST': 'c', 'PATCH': 'u', 'DELETE': 'd'}
+
+# save() implementations a bulk write can stand in for: slugs are allocated for
+# the whole batch and nothing else they do needs a per-row save
+BULK_SAFE_SAVES = {models.Model.save, UniqueSlugMixin.save, AbstractBaseUser.save}
+
+
+def has_stock_save(model):
+    """True when no class of the model overrides save() beyond BULK_SAFE_SAVES."""
+    for klass in model.__mro__:
+        if klass is models.Model:
+            break
+        save = vars(klass).get('save')
+        if save is not None and save not in BULK_SAFE_SAVES:
+            return False
+    return True
+
+
+def writes_plainly(model, serializer, method):
+    """True when rows can go through bulk_create/bulk_update without skipping custom code."""
+    if getattr(type(serializer), method) is not getattr(ModelSerializer, method):
+        return False
+    return has_stock_save(model)
+
+
+def prime_related_fields(serializers, items):
+    """
+    Resolve the PrimaryKeyRelatedField/SlugRelatedField values of a whole payload
+    with one query per field. Otherwise validation runs a query per item and field.
+    Values that were not found fall through to the field's own lookup and error.
+    """
+    if not serializers:
+        return
+    for name, field in serializers[0].fields.items():
+        if field.read_only or type(field) not in (PrimaryKeyRelatedField, SlugRelatedField):
+            continue
+        key = field.slug_field if isinstance(field, SlugRelatedField) else 'pk'
+        values = {
+            str(item[name]) for item in items
+            if isinstance(item, dict) and item.get(name) not in (None, '')
+        }
+        if not values:
+            continue
+        try:
+            found = {str(getattr(obj, key)): obj for obj in field.get_queryset().filter(**{f'{key}__in': values})}
+        except (TypeError, ValueError, DjangoValidationError):
+            continue
+
+        for serializer in serializers:
+            bound = serializer.fields[name]
+            lookup = bound.to_internal_value
+            bound.to_internal_value = lambda data, lookup=lookup: found.get(str(data)) or lookup(data)
+
+
+class BulkModelMixin:
+    """
+    List-payload writes on <prefix>/bulk/:
+
+    POST    [{...}, ...]                         create
+    PATCH   [{"<lookup_field>": ..., ...}, ...]  partial update
+    DELETE  ["<lookup value>", ...]              delete
+
+    Every request runs in one transaction and is all or nothing. Validation
+    errors come back as a list aligned with the payload, with {} for valid items.
+    Models whose serializer and save() are stock are written with
+    bulk_create/bulk_update, with slugs allocated for the whole batch. Others are
+    saved one by one inside the same transaction. Audit entries for the request
+    are recorded as one batch.
+    """
+    bulk_actions = ('create', 'update', 'delete')
+    bulk_max_items = 1000
+    bulk_batch_size = 500
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request, *args, **kwargs):
+        handler = {
+            'POST': ('create', self.bulk_create),
+            'PATCH': ('update', self.bulk_update),
+            'DELETE': ('delete', self.bulk_delete),
+        }.get(request.method)
+        if handler is None or handler[0] not in self.bulk_actions:
+            raise MethodNotAllowed(request.method)
+        try:
+            return handler[1](request)
+        except IntegrityError as e:
+            return Response({'detail': f'Bulk {handler[0]} conflicts with existing data: {e}'},
+                            status=status.HTTP_409_CONFLICT)
+
+    def get_bulk_items(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'detail': 'Expected a list of items.'})
+        if len(items) > self.bulk_max_items:
+            raise ValidationError({'detail': f'At most {self.bulk_max_items} items per request.'})
+        return items
+
+    def get_bulk_instances(self, keys):
+        """Map str(lookup value) to instance for the keys, in one query on the view's queryset."""
+        lookup = self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        return {
+            str(getattr(instance, lookup)): instance
+            for instance in queryset.filter(**{f'{lookup}__in': set(keys)})
+        }
+
+    def resolve_bulk_keys(self, items, key_for):
+        lookup = self.lookup_field
+        keys = [key_for(item) for item in items]
+        found = self.get_bulk_instances([key for key in keys if key])
+
+        errors, seen = [{} for _ in items], set()
+        for position, key in enumerate(keys):
+            if not key:
+                errors[position] = {lookup: ['This field is required.']}
+            elif key not in found:
+                errors[position] = {lookup: ['Not found.']}
+            elif key in seen:
+                errors[position] = {lookup: ['Duplicate item.']}
+            seen.add(key)
+        if any(errors):
+            raise ValidationError(errors)
+        return [found[key] for key in keys]
+
+    def save_each(self, save, items):
+        """Per-row fallback. Errors raised while saving are reported by position too."""
+        instances, errors = [], [{} for _ in items]
+        for position, item in enumerate(items):
+            try:
+                instances.append(save(item))
+            except ValidationError as e:
+                errors[position] = e.detail
+        if any(errors):
+            raise ValidationError(errors)
+        return instances
+
+    def bulk_create(self, request):
+        items = self.get_bulk_items(request)
+        serializer = self.get_serializer(data=items, many=True)
+        prime_related_fields([serializer.child], items)
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            instances = self.perform_bulk_create(serializer)
+        return Response(self.get_serializer(instances, many=True).data, status=status.HTTP_201_CREATED)
+
+    def perform_bulk_create(self, serializer):
+        child = serializer.child
+        model = child.Meta.model
+        items = [dict(data) for data in serializer.validated_data]
+
+        if writes_plainly(model, child, 'create'):
+            instances = self.insert_rows(model, items)
+        else:
+            instances = self.save_each(child.create, items)
+
+        if model in audited_models():
+            model_name = model.__name__
+            log_audit_batch(self.request.user, 'create', model_name, [
+                (instance.pk, f"Created {model_name}", None, serialize_instance(instance))
+                for instance in instances
+            ])
+        return instances
+
+    def insert_rows(self, model, items):
+        info = model_meta.get_field_info(model)
+        using = router.db_for_write(model)
+        instances, many_to_many = [], []
+        for data in items:
+            many_to_many.append({
+                name: data.pop(name) for name, relation in info.relations.items()
+                if relation.to_many and name in data
+            })
+            instances.append(model(**data))
+
+        assign_unique_slugs(instances, using=using)
+        model._default_manager.db_manager(using).bulk_create(instances, batch_size=self.bulk_batch_size)
+
+        for instance, relations in zip(instances, many_to_many):
+            for name, value in relations.items():
+                getattr(instance, name).set(value)
+            # Receivers other than the audit log (profiles, permission caches) still see every row
+            post_save.send(sender=model, instance=instance, created=True, update_fields=None,
+                           raw=False, using=using)
+        return instances
+
+    def bulk_update(self, request):
+        items = self.get_bulk_items(request)
+        lookup = self.lookup_field
+        instances = self.resolve_bulk_keys(
+            items, lambda item: str(item.get(lookup) or '') if isinstance(item, dict) else ''
+        )
+
+        serializers = [
+            self.get_serializer(instance, data=item, partial=True) for instance, item in zip(instances, items)
+        ]
+        prime_related_fields(serializers, items)
+        errors = [{} if serializer.is_valid() else serializer.errors for serializer in serializers]
+        if any(errors):
+            raise ValidationError(errors)
+
+        with transaction.atomic():
+            instances = self.perform_bulk_update(serializers)
+        return Response(self.get_serializer(instances, many=True).data)
+
+    def perform_bulk_update(self, serializers):
+        model = self.get_queryset().model
+        old_data = [serialize_instance(serializer.instance) for serializer in serializers]
+
+        if serializers and writes_plainly(model, serializers[0], 'update'):
+            instances = self.update_rows(model, serializers)
+        else:
+            instances = self.save_each(lambda serializer: serializer.save(), serializers)
+
+        if model in audited_models():
+            model_name = model.__name__
+            log_audit_batch(self.request.user, 'update', model_name, [
+                (instance.pk, f"Updated {model_name}", *audit_update_data(old, serialize_instance(instance)))
+                for instance, old in zip(instances, old_data)
+            ])
+        return instances
+
+    def update_rows(self, model, serializers):
+        info = model_meta.get_field_info(model)
+        using = router.db_for_write(model)
+        instances, many_to_many, fields = [], [], set()
+        for serializer in serializers:
+            instance, relations = serializer.instance, {}
+            for name, value in serializer.validated_data.items():
+                if name in info.relations and info.relations[name].to_many:
+                    relations[name] = value
+                    continue
+                setattr(instance, name, value)
+                try:
+                    if model._meta.get_field(name).concrete:
+                        fields.add(name)
+                except FieldDoesNotExist:
+                    pass
+            instances.append(instance)
+            many_to_many.append(relations)
+
+        if fields:
+            # bulk_update skips Field.pre_save, so auto_now columns are stamped here
+            for field in model._meta.concrete_fields:
+                if getattr(field, 'auto_now', False):
+                    for instance in instances:
+                        field.pre_save(instance, add=False)
+                    fields.add(field.name)
+            model._default_manager.db_manager(using).bulk_update(
+                instances, sorted(fields), batch_size=self.bulk_batch_size
+            )
+
+        for instance, relations in zip(instances, many_to_many):
+            for name, value in relations.items():
+                getattr(instance, name).set(value)
+            post_save.send(sender=model, instance=instance, created=False, update_fields=frozenset(fields),
+                           raw=False, using=using)
+        return instances
+
+    def bulk_delete(self, request):
+        items = self.get_bulk_items(request)
+        lookup = self.lookup_field
+        instances = self.resolve_bulk_keys(
+            items, lambda item: str((item.get(lookup) if isinstance(item, dict) else item) or '')
+        )
+
+        with transaction.atomic():
+            deleted = self.perform_bulk_delete(instances)
+        return Response({'deleted': deleted})
+
+    def perform_bulk_delete(self, instances):
+        model = self.get_queryset().model
+        changes = []
+        if model in audited_models():
+            model_name = model.__name__
+            changes = [
+                (instance.pk, f"Deleted {model_name}: {instance}", serialize_instance(instance), None)
+                for instance in instances
+            ]
+
+        model._default_manager.filter(pk__in=[instance.pk for instance in instances]).delete()
+        if changes:
+            log_audit_batch(self.request.user, 'delete', model.__name__, changes)
+        return len(instances)
@@ -0,0 +1,13 @@
+from django.conf import settings
+
+# Backends whose entries live in one process (or nowhere): every worker has its own
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_shared_cache(alias):
+    """Whether every worker process reads the same entries from the cache alias."""
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', '')
+    return backend not in PROCESS_LOCAL_BACKENDS
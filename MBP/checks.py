@@ -0,0 +1,16 @@
+from django.core.checks import Error, register
+from .caching import is_shared_cache
+from .db_router import replica_aliases, replica_setting
+
+
+@register()
+def replica_cache(app_configs, **kwargs):
+    """Read-your-writes pins must be seen by every worker, or a user's next read may miss their write."""
+    alias = replica_setting('CACHE')
+    if not replica_aliases() or is_shared_cache(alias):
+        return []
+    return [Error(
+        f"Read replicas are configured but the pin cache '{alias}' is local to each process.",
+        hint="Point DATABASE_REPLICAS['CACHE'] at a shared backend (e.g. set REDIS_URL) or remove the replicas.",
+        id='MBP.E001',
+    )]
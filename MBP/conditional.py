@@ -0,0 +1,182 @@
+import hashlib
+import json
+from calendar import timegm
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+from .response_cache import generations, related_models, resolve_models, shared_generations, watch_model
+from .utils import instance_etag
+
+
+def has_updated_at(model):
+    return any(field.name == 'updated_at' for field in model._meta.concrete_fields)
+
+
+def http_timestamp(value):
+    # HTTP dates have whole seconds; ETags are what tell apart two writes within one
+    return int(timegm(value.utctimetuple())) if value is not None else None
+
+
+def representation_models(fields, model):
+    """
+    (models, complete) for some serializer fields of model: the other models
+    they read, through forward and reverse relations and nested serializers,
+    and whether that is all they read. It is not when a field reads something
+    that cannot be told from its source (SerializerMethodField, source='*',
+    model properties and methods) or a many-to-many relation, whose changes
+    send no post_save.
+    """
+    models, complete = set(), True
+    for field in fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*':
+            complete = False
+            continue
+        attrs, current = field.source_attrs, model
+        for position, attr in enumerate(attrs):
+            try:
+                model_field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                complete = False
+                break
+            if not model_field.is_relation:
+                # Anything past a plain column (a JSON key, a method of its value) is not traced
+                complete = complete and position == len(attrs) - 1
+                break
+            if model_field.many_to_many or model_field.related_model is None:
+                complete = False
+                break
+            current = model_field.related_model
+            models.add(current)
+        else:
+            nested = field.child if isinstance(field, ListSerializer) else field
+            if isinstance(nested, BaseSerializer):
+                nested_models, nested_complete = representation_models(nested.fields, current)
+                models |= nested_models
+                complete = complete and nested_complete
+    models.discard(model)
+    return models, complete
+
+
+def not_modified(request, etag, last_modified=None):
+    """A 304 when If-None-Match (or If-Modified-Since) says the client's copy is current, else None."""
+    response = get_conditional_response(request, etag=etag, last_modified=http_timestamp(last_modified))
+    if response is None or response.status_code != 304:
+        # If-Match on a read is not a precondition this API enforces
+        return None
+    if etag:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(http_timestamp(last_modified))
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified validators for list and retrieve, computed from
+    updated_at without serializing, so a request whose If-None-Match (or, on
+    retrieve, If-Modified-Since) still matches is answered 304 before the
+    serializer runs.
+
+    An object's ETag covers its updated_at and the generations (bumped on
+    save/delete, see response_cache) of every model its representation reads:
+    forward relations, reverse relations and nested serializers, found by
+    walking the serializer fields, plus cache_depends_on. ?fields= and
+    ?expand= are folded in as well. Writes carrying If-Match are checked
+    against the ETag of the plain representation.
+
+    A list's ETag covers Max('updated_at') and the row count of the filtered
+    queryset (one aggregate query), the same generations and the query
+    parameters and media type, so each page, page size and field set has
+    its own. Its Last-Modified is informative only: deleting a row does not
+    move it, so If-Modified-Since is honoured on retrieve only. Changes made
+    with QuerySet.update() keep updated_at and are not seen.
+
+    304s are only served when the validators cover the whole representation:
+    models without updated_at, and serializers with fields that cannot be
+    traced (SerializerMethodField, properties, many-to-many), get none unless
+    the viewset sets conditional_get = True and names what those fields read
+    in cache_depends_on. conditional_get = False turns them off. Generations
+    are left out while the response cache backend is per-process (they would
+    differ between workers), so only representations of a single model get
+    304s then.
+    """
+    conditional_get = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        queryset = getattr(cls, 'queryset', None)
+        serializer_class = getattr(cls, 'serializer_class', None)
+        cls.representation = None
+        if queryset is not None and serializer_class is not None and has_updated_at(queryset.model):
+            cls.representation = representation_models(serializer_class().fields, queryset.model)
+            for model in cls.validator_models(queryset.model, cls.representation[0]):
+                watch_model(model)
+
+    @classmethod
+    def validator_models(cls, model, read):
+        return related_models(model) | read | resolve_models(getattr(cls, 'cache_depends_on', ()))
+
+    def representation_params(self):
+        fields, expand = self.sparse_fieldset() if hasattr(self, 'sparse_fieldset') else (None, [])
+        return [sorted(fields or ()), sorted(expand)] if fields or expand else []
+
+    def validator_dependencies(self, model):
+        """
+        (models, covered): the models whose generations the validators of this
+        request fold in, and whether they cover everything it renders.
+        """
+        cached = self.__dict__.get('_validator_dependencies')
+        if cached is not None:
+            return cached
+        if self.representation_params():
+            # ?fields= and ?expand= change what is read: trace the serializer this request renders
+            serializer = self.get_serializer()
+            read, complete = representation_models(getattr(serializer, 'child', serializer).fields, model)
+        else:
+            read, complete = self.representation or (set(), False)
+        models = self.validator_models(model, read)
+        for dependency in models:
+            watch_model(dependency)
+        covered = self.conditional_get is not False and (complete or self.conditional_get is True)
+        if not shared_generations():
+            # Another worker's writes would not move them: only the row itself can be validated
+            covered, models = covered and not models, set()
+        self._validator_dependencies = (models, covered)
+        return self._validator_dependencies
+
+    def uses_conditional_get(self, model):
+        return has_updated_at(model) and self.validator_dependencies(model)[1]
+
+    def object_etag(self, instance):
+        models, _ = self.validator_dependencies(type(instance))
+        params = self.representation_params()
+        related = generations(models) if models else []
+        return instance_etag(instance, related + [params] if params else related)
+
+    def list_validators(self, queryset):
+        """(ETag, Last-Modified) of a filtered list, from one aggregate query."""
+        model = queryset.model
+        request = self.request
+        row = queryset.order_by().aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+        key = json.dumps(
+            [
+                model._meta.label, row['count'], row['last_modified'],
+                generations(self.validator_dependencies(model)[0]),
+                sorted(request.query_params.lists()), getattr(request, 'accepted_media_type', None),
+            ],
+            default=str,
+        )
+        return quote_etag(hashlib.md5(key.encode()).hexdigest()), row['last_modified']
+
+    def with_validators(self, response, etag, last_modified=None):
+        if etag is not None:
+            response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(http_timestamp(last_modified))
+        return response
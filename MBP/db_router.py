@@ -0,0 +1,184 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+REPLICA_DEFAULTS = {
+    'REPLICAS': None,            # aliases reads may use; None: every DATABASES entry except default
+    'PIN_SECONDS': 5.0,          # after a write, the user reads from the primary this long
+    'MAX_LAG_SECONDS': None,     # replicas further behind are skipped; None: lag is not checked
+    'LAG_CHECK_INTERVAL': 5.0,   # seconds a replica's measured lag is trusted
+    'CACHE': 'default',          # alias in CACHES holding the pins; must be shared when replicas are used
+    # Bookkeeping writes that neither pin the user nor send the rest of the request to the primary
+    'UNPINNED_MODELS': ('sessions.Session', 'MBP.AuditLog', 'analytics.SearchQuery'),
+}
+
+
+def replica_setting(name):
+    return getattr(settings, 'DATABASE_REPLICAS', {}).get(name, REPLICA_DEFAULTS[name])
+
+
+def replica_aliases():
+    aliases = replica_setting('REPLICAS')
+    if aliases is None:
+        aliases = [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+    return list(aliases)
+
+
+class RequestRouting:
+    """Routing state of one request: whether reads may go to a replica and whether it wrote."""
+
+    def __init__(self):
+        self.replica_reads = False
+        self.wrote = False
+        self.replica = None
+
+
+_routing = ContextVar('db_routing', default=None)
+
+
+def current_routing():
+    return _routing.get()
+
+
+@contextmanager
+def routing_scope():
+    routing = RequestRouting()
+    token = _routing.set(routing)
+    try:
+        yield routing
+    finally:
+        _routing.reset(token)
+
+
+def mark_write(model):
+    """
+    Record that the current request writes model (from db_for_write): it reads
+    from the primary from now on and pins its user. Sessions and logs do not count.
+    """
+    routing = current_routing()
+    if routing is None or routing.wrote:
+        return
+    # DatabaseCache routes its table through here too; it has no model label
+    label = getattr(model._meta, 'label', None)
+    if label is None or label in replica_setting('UNPINNED_MODELS'):
+        return
+    routing.wrote = True
+
+
+def replica_lag(alias):
+    """Seconds the replica is behind its primary, 0 when the backend cannot tell."""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT CASE WHEN pg_is_in_recovery() THEN "
+            "COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) ELSE 0 END"
+        )
+        return float(cursor.fetchone()[0])
+
+
+class ReplicaHealth:
+    """Per-process cache of replica lag checks, so a request costs at most one check per interval."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = {}   # alias -> (checked at, usable)
+
+    def usable(self, alias):
+        max_lag = replica_setting('MAX_LAG_SECONDS')
+        if max_lag is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            checked = self._checked.get(alias)
+        if checked is not None and now - checked[0] < replica_setting('LAG_CHECK_INTERVAL'):
+            return checked[1]
+
+        try:
+            usable = replica_lag(alias) <= max_lag
+        except DatabaseError as e:
+            print(f"Replica {alias} skipped: {e}")
+            usable = False
+        with self._lock:
+            self._checked[alias] = (now, usable)
+        return usable
+
+    def reset(self):
+        with self._lock:
+            self._checked.clear()
+
+
+replica_health = ReplicaHealth()
+
+
+def pin_key(user_id):
+    return f'db-pin:{user_id}'
+
+
+def pin_cache():
+    return caches[replica_setting('CACHE')]
+
+
+def pin_to_primary(user):
+    """Send the user's reads to the primary for PIN_SECONDS (read-your-writes)."""
+    if user is not None and user.is_authenticated:
+        pin_cache().set(pin_key(user.pk), True, replica_setting('PIN_SECONDS'))
+
+
+def is_pinned(user):
+    return user is not None and user.is_authenticated and bool(pin_cache().get(pin_key(user.pk)))
+
+
+def allow_replica_reads(user):
+    """Called once a read-only request is authenticated; the replica is picked on the first read."""
+    routing = current_routing()
+    if routing is not None and not routing.wrote and not is_pinned(user):
+        routing.replica_reads = True
+
+
+class ReplicaRouter:
+    """
+    Writes go to the primary (default). Reads go to the primary too, except in
+    requests that allow_replica_reads() opened up (ProtectedModelViewSet list and
+    retrieve). Those read from one replica per request, picked at random among
+    the replicas within MAX_LAG_SECONDS of the primary.
+
+    A request that writes (save, delete, update(), bulk_create(), m2m changes,
+    select_for_update) reads from the primary for the rest of the request, and
+    its user stays on the primary for PIN_SECONDS (see mark_write). Writes are
+    seen in db_for_write, which Django consults before every one of them, so
+    no signal receiver is needed. The pin lives in the CACHE alias, which must be
+    shared between processes (Redis, Memcached, database) for the pin to hold
+    across workers; the replica_cache check refuses to start with replicas
+    and a per-process cache.
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = current_routing()
+        if routing is None or not routing.replica_reads or routing.wrote:
+            return DEFAULT_DB_ALIAS
+        if routing.replica is None:
+            usable = [alias for alias in replica_aliases() if replica_health.usable(alias)]
+            routing.replica = random.choice(usable) if usable else DEFAULT_DB_ALIAS
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        mark_write(model)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        if db in replica_aliases():
+            return False
+        return None
@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from MBP.archive import archive_dir, archive_row, write_segment
+from MBP.audit import audit_setting
+from MBP.models import AuditLog
+
+DELETE_CHUNK = 500
+
+
+class Command(BaseCommand):
+    help = 'Move audit logs older than N days into compressed, append-only archive segments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=audit_setting('ARCHIVE_AFTER_DAYS'),
+                            help='Archive rows older than this many days')
+        parser.add_argument('--segment-rows', type=int, default=50000, help='Maximum rows per segment file')
+        parser.add_argument('--block-rows', type=int, default=1000, help='Rows per independently readable block')
+        parser.add_argument('--dir', help='Archive directory (defaults to AUDIT_LOG["ARCHIVE_DIR"])')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be archived')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        directory = options['dir'] or archive_dir()
+        queryset = AuditLog.objects.filter(timestamp__lt=cutoff).select_related('user').order_by('timestamp', 'id')
+
+        if options['dry_run']:
+            self.stdout.write(f"{queryset.count()} audit logs older than {cutoff:%Y-%m-%d %H:%M} would be archived.")
+            return
+
+        archived = segments = 0
+        while True:
+            # Archived rows are deleted below, so every pass starts from the oldest remaining row
+            batch = list(queryset[:options['segment_rows']])
+            if not batch:
+                break
+
+            index = write_segment([archive_row(entry) for entry in batch], directory, options['block_rows'])
+
+            ids = [entry.pk for entry in batch]
+            with transaction.atomic():
+                for start in range(0, len(ids), DELETE_CHUNK):
+                    AuditLog.objects.filter(pk__in=ids[start:start + DELETE_CHUNK]).delete()
+
+            archived += len(batch)
+            segments += 1
+            self.stdout.write(f"Wrote {index['segment']} ({index['rows']} rows, {len(index['blocks'])} blocks)")
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} audit logs into {segments} segments in {directory}."))
@@ -0,0 +1,215 @@
+import gc
+import io
+import json
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import URLPattern, URLResolver, get_resolver, resolve, reverse
+from rest_framework.test import APIClient
+from MBP.querystats import QueryRecorder, percentile
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'endpoint_baseline.json'
+
+
+def router_endpoints(patterns=None, namespace=''):
+    """(name, viewset, action, url kwargs) for every GET route registered through a router."""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            nested = f'{namespace}{pattern.namespace}:' if pattern.namespace else namespace
+            yield from router_endpoints(pattern.url_patterns, nested)
+            continue
+        if not isinstance(pattern, URLPattern) or not pattern.name:
+            continue
+        actions = getattr(pattern.callback, 'actions', None)
+        if not actions or 'get' not in actions:
+            continue
+        kwargs = set(pattern.pattern.regex.groupindex)
+        if 'format' in kwargs:   # format-suffix duplicates of the same route
+            continue
+        yield f'{namespace}{pattern.name}', pattern.callback.cls, actions['get'], kwargs
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every router GET endpoint with the DRF test client: p50/p95/p99 latency, SQL count and '
+        'response bytes, compared against a committed baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+        parser.add_argument('--update-baseline', action='store_true', help='Write the results as the new baseline')
+        parser.add_argument('--requests', type=int, default=20, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--tolerance', type=float, default=0.5,
+                            help='Allowed relative growth of p95 latency and response bytes')
+        parser.add_argument('--min-latency-delta', type=float, default=5.0,
+                            help='Latency growth in ms below which p95 is never a regression')
+        parser.add_argument('--query-tolerance', type=int, default=0, help='Extra SQL statements allowed')
+        parser.add_argument('--seed-scale', type=float, default=0.02,
+                            help='seed_load_data --scale for the throwaway benchmark database')
+        parser.add_argument('--use-existing', action='store_true',
+                            help='Run against the configured database as it is instead of a seeded test database')
+        parser.add_argument('--email', help='With --use-existing: user to authenticate as (default: first superuser)')
+        parser.add_argument('--filter', help='Only endpoints whose name contains this text')
+        parser.add_argument('--with-response-cache', action='store_true',
+                            help='Keep the response cache on; by default the database path is measured')
+
+    def handle(self, *args, **options):
+        if not options['with_response_cache']:
+            settings.RESPONSE_CACHE = {**getattr(settings, 'RESPONSE_CACHE', {}), 'ENABLED': False}
+        if options['use_existing']:
+            results = self.run(options)
+        else:
+            setup_test_environment()
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                call_command('seed_load_data', scale=options['seed_scale'], workers=1, stdout=io.StringIO())
+                results = self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+        baseline_path = Path(options['baseline'])
+        if options['update_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(results, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {baseline_path} ({len(results)} endpoints)"))
+            return
+
+        if not baseline_path.exists():
+            raise CommandError(f"No baseline at {baseline_path}; run with --update-baseline first.")
+        regressions = self.compare(results, json.loads(baseline_path.read_text()), options)
+        if regressions:
+            raise CommandError(f"{len(regressions)} endpoint regression(s):\n" + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+
+    def get_user(self, options):
+        from accounts.models import User
+
+        if not options['use_existing']:
+            return User.objects.create_superuser('bench@seed.example', 'bench-password')
+        users = User.objects.filter(email=options['email']) if options['email'] else User.objects.filter(is_superuser=True)
+        user = users.first()
+        if user is None:
+            raise CommandError("No user to authenticate as; pass --email.")
+        return user
+
+    def run(self, options):
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(self.get_user(options))
+
+        endpoints = sorted(router_endpoints(), key=lambda endpoint: (endpoint[0].endswith('-list') is False, endpoint[0]))
+        lookups, results = {}, {}
+        for name, viewset, action, kwargs in endpoints:
+            if options['filter'] and options['filter'] not in name:
+                continue
+            url_kwarg = viewset.lookup_url_kwarg or viewset.lookup_field
+            if kwargs - {url_kwarg}:
+                continue
+            if kwargs:
+                value = lookups.get(viewset) or self.first_lookup(viewset)
+                if value is None:
+                    self.stdout.write(f"{name:<48} skipped: no rows")
+                    continue
+                url = reverse(name, kwargs={url_kwarg: value})
+            else:
+                url = reverse(name)
+
+            # Two routers registering the same prefix: the later route is never reached
+            match = resolve(url)
+            if getattr(match.func, 'cls', None) is not viewset:
+                self.stdout.write(f"{name:<48} skipped: {url} is served by {match.url_name}")
+                continue
+
+            result = self.measure(client, url, options['requests'], options['warmup'])
+            results[f'GET {name}'] = result
+            self.stdout.write(
+                f"{name:<48} {result['status']} p50={result['p50_ms']:>8.2f} p95={result['p95_ms']:>8.2f} "
+                f"p99={result['p99_ms']:>8.2f} ms queries={result['queries']:<4} bytes={result['bytes']}"
+            )
+            if action == 'list' and result['status'] == 200:
+                value = self.lookup_from_list(result.pop('_data'), viewset.lookup_field)
+                if value is not None:
+                    lookups[viewset] = value
+            result.pop('_data', None)
+        return results
+
+    def first_lookup(self, viewset):
+        queryset = getattr(viewset, 'queryset', None)
+        if queryset is None:
+            return None
+        instance = queryset.all().order_by().first()
+        return getattr(instance, viewset.lookup_field, None) if instance else None
+
+    def lookup_from_list(self, data, lookup_field):
+        rows = data.get('results') if isinstance(data, dict) else data
+        if rows and isinstance(rows[0], dict) and rows[0].get(lookup_field) is not None:
+            return rows[0][lookup_field]
+        return None
+
+    def measure(self, client, url, requests, warmup):
+        for _ in range(warmup):
+            client.get(url)
+
+        # A collection landing inside one request would dominate its p95
+        gc.collect()
+        gc.disable()
+        try:
+            timings, queries, response = self.timed_requests(client, url, requests)
+        finally:
+            gc.enable()
+
+        return {
+            'url': url,
+            'status': response.status_code,
+            'p50_ms': round(percentile(timings, 0.50), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+            'queries': queries,
+            'bytes': len(response.content),
+            '_data': getattr(response, 'data', None),
+        }
+
+    def timed_requests(self, client, url, requests):
+        timings, queries = [], 0
+        for _ in range(max(requests, 1)):
+            recorder = QueryRecorder()
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(recorder))
+                start = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries = max(queries, recorder.count)
+
+        return timings, queries, response
+
+    def compare(self, results, baseline, options):
+        regressions = []
+        tolerance = options['tolerance']
+        for name, result in sorted(results.items()):
+            before = baseline.get(name)
+            if before is None:
+                self.stdout.write(f"new endpoint (not in baseline): {name}")
+                continue
+            if result['status'] != before['status']:
+                regressions.append(f"{name}: status {before['status']} -> {result['status']}")
+            if result['queries'] > before['queries'] + options['query_tolerance']:
+                regressions.append(f"{name}: queries {before['queries']} -> {result['queries']}")
+            latency_limit = max(before['p95_ms'] * (1 + tolerance), before['p95_ms'] + options['min_latency_delta'])
+            if result['p95_ms'] > latency_limit:
+                regressions.append(f"{name}: p95 {before['p95_ms']:.2f} -> {result['p95_ms']:.2f} ms")
+            if result['bytes'] > before['bytes'] * (1 + tolerance):
+                regressions.append(f"{name}: bytes {before['bytes']} -> {result['bytes']}")
+        if not options['filter']:
+            for name in sorted(set(baseline) - set(results)):
+                self.stdout.write(f"endpoint missing from this run: {name}")
+        return regressions
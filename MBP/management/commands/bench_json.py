@@ -0,0 +1,92 @@
+import io
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.text import compress_string
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from catalog.models import Brand, Category, Product
+from catalog.serializers import ProductSerializer
+from MBP import renderers
+from MBP.middleware import brotli, CompressionMiddleware
+from MBP.renderers import FastJSONParser, FastJSONRenderer
+
+
+def sample_products(rows):
+    """Unsaved products shaped like catalog rows, so the benchmark needs no data."""
+    categories = [Category(id=uuid.uuid4(), name=f'Category {n}', slug=f'category-{n}') for n in range(20)]
+    brands = [Brand(id=uuid.uuid4(), name=f'Brand {n}', slug=f'brand-{n}') for n in range(50)]
+    now = timezone.now()
+    products = []
+    for n in range(rows):
+        products.append(Product(
+            id=uuid.uuid4(), name=f'Product {n}', slug=f'product-{n}', sku=f'SKU-{n:08d}',
+            category=categories[n % len(categories)], brand=brands[n % len(brands)],
+            short_description='Everyday cotton crew-neck tee',
+            description='Soft, breathable cotton with a relaxed fit. Machine washable. ' * 4,
+            status=Product.STATUS_PUBLISHED, weight_grams=180 + n % 400,
+            dimensions={'length': 300, 'width': 220, 'height': 15}, country_of_origin='IN',
+            seo_title=f'Product {n} | Store', seo_description='Buy online with free shipping',
+            metadata={'tags': ['cotton', 'summer'], 'rating': 4.5}, created_at=now, updated_at=now,
+        ))
+    return products
+
+
+class Command(BaseCommand):
+    help = 'Compare JSON render/parse time and compressed size for a ProductSerializer list'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--iterations', type=int, default=5)
+        parser.add_argument('--from-db', action='store_true', help='Serialize stored products instead of samples')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        iterations = options['iterations']
+
+        if options['from_db']:
+            products = list(Product.objects.select_related('category', 'brand')[:rows])
+        else:
+            products = sample_products(rows)
+
+        start = time.perf_counter()
+        data = ProductSerializer(products, many=True).data
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"Rows: {len(products)}, serializer: {elapsed * 1000:.1f} ms, iterations: {iterations}")
+        if renderers.orjson is None:
+            self.stdout.write("orjson is not installed: the fast renderer and parser fall back to stdlib json")
+
+        # Decimal values (prices, totals) go through the renderer's default hook
+        priced = [dict(item, price=Decimal('499.00')) for item in data]
+
+        body = self._run("render json", iterations, lambda: JSONRenderer().render(priced))
+        fast_body = self._run("render orjson", iterations, lambda: FastJSONRenderer().render(priced))
+        self.stdout.write(f"{'size':<16} json={len(body)} bytes, orjson={len(fast_body)} bytes")
+
+        self._run("parse json", iterations, lambda: JSONParser().parse(io.BytesIO(body)))
+        self._run("parse orjson", iterations, lambda: FastJSONParser().parse(io.BytesIO(body)))
+
+        compressed = self._run(
+            "gzip", iterations,
+            lambda: compress_string(fast_body, max_random_bytes=CompressionMiddleware.max_random_bytes)
+        )
+        self.stdout.write(f"{'gzip size':<16} {len(compressed)} bytes ({len(compressed) / len(fast_body):.1%})")
+        if brotli is None:
+            self.stdout.write("brotli is not installed: responses are gzipped only")
+            return
+        compressed = self._run(
+            "brotli", iterations,
+            lambda: brotli.compress(fast_body, quality=CompressionMiddleware.brotli_quality)
+        )
+        self.stdout.write(f"{'brotli size':<16} {len(compressed)} bytes ({len(compressed) / len(fast_body):.1%})")
+
+    def _run(self, label, iterations, work):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            result = work()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{label:<16} ms/run={elapsed / iterations * 1000:<10.1f}")
+        return result
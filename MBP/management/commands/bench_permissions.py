@@ -0,0 +1,84 @@
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from accounts.models import UserRole
+from MBP.models import RoleModelPermission, AppModel, PermissionType
+from MBP.permissions import HasModelPermission, permission_matrix
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def legacy_check(role, model_name, permission_code):
+    """The per-request lookup HasModelPermission used before the compiled matrix."""
+    try:
+        model_obj = AppModel.objects.get(name__iexact=model_name)
+        perm_type = PermissionType.objects.get(code=permission_code.lower())
+        return RoleModelPermission.objects.filter(
+            role=role,
+            model=model_obj,
+            permission_type=perm_type
+        ).exists()
+    except (AppModel.DoesNotExist, PermissionType.DoesNotExist):
+        return False
+
+
+class Command(BaseCommand):
+    help = 'Compare SQL count and latency of permission checks: per-request queries vs the compiled matrix'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help='User to check (defaults to the first user with a role)')
+        parser.add_argument('--model', default='Product', help='Model name checked against')
+        parser.add_argument('--code', default='r', choices=['c', 'r', 'u', 'd'])
+        parser.add_argument('--iterations', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user_roles = UserRole.objects.select_related('user', 'role')
+        if options['email']:
+            user_roles = user_roles.filter(user__email=options['email'])
+        user_role = user_roles.first()
+        if not user_role:
+            raise CommandError("No user with an assigned role found.")
+
+        user = user_role.user
+        model_name = options['model']
+        code = options['code']
+        iterations = options['iterations']
+
+        request = SimpleNamespace(user=user)
+        view = SimpleNamespace(model_name=model_name, permission_code=code)
+        permission = HasModelPermission()
+
+        self.stdout.write(f"User: {user.email} ({user_role.role.name}), check: {model_name}/{code}, iterations: {iterations}")
+
+        self._run("legacy (3 queries)", iterations, lambda: legacy_check(user_role.role, model_name, code))
+
+        permission_matrix.invalidate()
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            allowed = permission.has_permission(request, view)
+        self.stdout.write(f"{'compiled (cold)':<22} queries/check={counter.count:<6} allowed={allowed}")
+
+        self._run("compiled (warm)", iterations, lambda: permission.has_permission(request, view))
+
+    def _run(self, label, iterations, check):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                allowed = check()
+            elapsed = time.perf_counter() - start
+
+        per_check_us = elapsed / iterations * 1_000_000
+        queries = counter.count / iterations
+        self.stdout.write(
+            f"{label:<22} queries/check={queries:<6.2f} us/check={per_check_us:<10.1f} allowed={allowed}"
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from catalog.tree import rebuild_category_paths
+
+
+class Command(BaseCommand):
+    help = 'Recompute the materialized category paths from the parent links'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per UPDATE batch')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated, unreachable = rebuild_category_paths(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{updated} category paths rebuilt."))
+        if unreachable:
+            self.stdout.write(self.style.WARNING(
+                f"{unreachable} categories sit on a parent cycle and were left unchanged."
+            ))
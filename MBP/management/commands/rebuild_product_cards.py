@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from catalog.cards import rebuild_product_cards
+
+
+class Command(BaseCommand):
+    help = 'Recompute the ProductCard listing table from products, variants, prices, stock, media, reviews and promotions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--due', action='store_true',
+            help='Only reprice the cards whose promotions started or ended since they were written (run from cron)',
+        )
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        written = rebuild_product_cards(options['batch_size'], options['due'], options['database'])
+        self.stdout.write(self.style.SUCCESS(f"{written} product cards written."))
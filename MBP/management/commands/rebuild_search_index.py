@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from catalog.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text product search index from the product, brand and category tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        indexed = rebuild_search_index(options['database'])
+        if indexed is None:
+            self.stdout.write(self.style.WARNING("No full-text index on this database; searches use icontains."))
+            return
+        self.stdout.write(self.style.SUCCESS(f"{indexed} products indexed."))
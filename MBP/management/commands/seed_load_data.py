@@ -0,0 +1,442 @@
+import multiprocessing
+import os
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+
+# Row counts at --scale 1. --scale applies to the SCALED sizes that are not given
+# explicitly; every "*_per_*" size is per parent row.
+DEFAULT_SIZES = {
+    'users': 1000,
+    'categories': 100,
+    'brands': 200,
+    'attributes': 12,
+    'values_per_attribute': 8,
+    'products': 10000,
+    'attributes_per_product': 4,
+    'variants_per_product': 3,
+    'warehouses': 5,
+    'stock_per_product': 2,
+    'carts': 1000,
+    'items_per_cart': 3,
+    'orders': 5000,
+    'items_per_order': 3,
+    'reviews': 20000,
+    'activity': 100000,
+    'audit_logs': 50000,
+}
+SCALED = ('users', 'categories', 'brands', 'products', 'carts', 'orders', 'reviews', 'activity', 'audit_logs')
+
+KIND_CODES = {
+    'user': 1, 'profile': 2, 'category': 3, 'brand': 4, 'attribute': 5, 'attribute_value': 6,
+    'warehouse': 7, 'product': 8, 'product_attribute': 9, 'variant': 10, 'variant_attribute': 11,
+    'stock': 12, 'cart': 13, 'cart_item': 14, 'order': 15, 'order_item': 16, 'review': 17,
+    'activity': 18,
+}
+
+FIRST_NAMES = ['Aarav', 'Diya', 'Kabir', 'Meera', 'Rohan', 'Sara', 'Vivaan', 'Anika', 'Arjun', 'Isha']
+LAST_NAMES = ['Sharma', 'Patel', 'Iyer', 'Khan', 'Gupta', 'Das', 'Reddy', 'Singh', 'Nair', 'Joshi']
+CATEGORY_WORDS = ['Apparel', 'Footwear', 'Electronics', 'Home', 'Kitchen', 'Beauty', 'Sports', 'Toys', 'Books', 'Garden']
+BRAND_WORDS = ['Acme', 'Northwind', 'Globex', 'Initech', 'Umbrella', 'Soylent', 'Hooli', 'Vandelay', 'Stark', 'Wayne']
+ADJECTIVES = ['Classic', 'Slim', 'Organic', 'Premium', 'Everyday', 'Compact', 'Wireless', 'Vintage', 'Smart', 'Eco']
+NOUNS = ['Tee', 'Sneaker', 'Headphones', 'Lamp', 'Kettle', 'Serum', 'Racket', 'Puzzle', 'Notebook', 'Planter']
+ATTRIBUTE_NAMES = ['Color', 'Material', 'Pattern', 'Fit', 'Season', 'Sleeve', 'Finish', 'Occasion', 'Style', 'Origin']
+VALUE_WORDS = ['Red', 'Blue', 'Black', 'White', 'Green', 'Grey', 'Cotton', 'Linen', 'Wool', 'Denim', 'Matte', 'Gloss']
+SIZE_LABELS = ['XS', 'S', 'M', 'L', 'XL', 'XXL']
+CITIES = ['Mumbai', 'Delhi', 'Bengaluru', 'Chennai', 'Pune', 'Kolkata', 'Hyderabad', 'Jaipur']
+WORDS = 'soft durable lightweight breathable classic fit daily wear premium quality finish easy care'.split()
+
+TIME_SPAN = timedelta(days=365)   # seeded rows are spread over the last year, oldest first
+
+
+def seed_id(kind, n):
+    """Deterministic primary key, so any worker can point at rows another worker inserts."""
+    return uuid.UUID(int=(0x5EED << 112) | (KIND_CODES[kind] << 64) | n)
+
+
+def price_of(product):
+    return Decimal(199 + (product * 7919) % 9800)
+
+
+def spread(count, step):
+    """Stride that picks step distinct rows out of count, for per-parent child rows."""
+    return max(count // max(step, 1), 1)
+
+
+class Seeder:
+    """Builds the unsaved instance for row n of a phase. Plain arithmetic on n keeps foreign keys consistent."""
+
+    def __init__(self, sizes, seed, password, now):
+        self.sizes = sizes
+        self.seed = seed
+        self.password = password
+        self.now = now
+
+    def when(self, n, count):
+        return self.now - TIME_SPAN * (count - n) / max(count, 1)
+
+    def phases(self):
+        from accounts.models import User, UserProfile
+        from analytics.models import UserActivity
+        from catalog.models import (
+            Attribute, AttributeValue, Brand, Category, Product, ProductAttribute, Variant, VariantAttribute,
+        )
+        from inventory.models import Stock, Warehouse
+        from MBP.models import AuditLog
+        from orders.models import Cart, CartItem, Order, OrderItem
+        from reviews.models import ProductReview
+
+        s = self.sizes
+        per_product = min(s['attributes_per_product'], s['attributes'] - 1)
+        return [
+            ('users', User, s['users']),
+            ('profiles', UserProfile, s['users']),
+            ('categories', Category, s['categories']),
+            ('brands', Brand, s['brands']),
+            ('attributes', Attribute, s['attributes']),
+            ('attribute_values', AttributeValue, s['attributes'] * s['values_per_attribute']),
+            ('warehouses', Warehouse, s['warehouses']),
+            ('products', Product, s['products']),
+            ('product_attributes', ProductAttribute, s['products'] * per_product),
+            ('variants', Variant, s['products'] * s['variants_per_product']),
+            ('variant_attributes', VariantAttribute, s['products'] * s['variants_per_product']),
+            ('stock', Stock, s['products'] * s['stock_per_product']),
+            ('carts', Cart, s['carts']),
+            ('cart_items', CartItem, s['carts'] * s['items_per_cart']),
+            ('orders', Order, s['orders']),
+            ('order_items', OrderItem, s['orders'] * s['items_per_order']),
+            ('reviews', ProductReview, s['reviews']),
+            ('activity', UserActivity, s['activity']),
+            ('audit_logs', AuditLog, s['audit_logs']),
+        ]
+
+    def build(self, phase, model, n, count, rng):
+        return model(**getattr(self, f'row_{phase}')(n, count, rng))
+
+    def row_users(self, n, count, rng):
+        name = f'{FIRST_NAMES[n % 10]} {LAST_NAMES[n // 10 % 10]}'
+        return dict(
+            id=seed_id('user', n), email=f'user{n}@seed.example', full_name=name, slug=f'user-{n}',
+            password=self.password, is_active=True, date_joined=self.when(n, count),
+        )
+
+    def row_profiles(self, n, count, rng):
+        return dict(
+            id=seed_id('profile', n), user_id=seed_id('user', n), slug=f'profile-{n}', age=18 + n % 50,
+            gender=rng.choice(['male', 'female', 'other']), country='India',
+            created_at=self.when(n, count), updated_at=self.when(n, count),
+        )
+
+    def row_categories(self, n, count, rng):
+        roots = max(count // 10, 1)
+        parent = None if n < roots else seed_id('category', n % roots)
+        return dict(
+            id=seed_id('category', n), name=f'{CATEGORY_WORDS[n % 10]} {n}', slug=f'category-{n}',
+            parent_id=parent, path=(f'{parent.hex}/' if parent else '') + f"{seed_id('category', n).hex}/",
+            created_at=self.when(n, count), updated_at=self.when(n, count),
+        )
+
+    def row_brands(self, n, count, rng):
+        return dict(
+            id=seed_id('brand', n), name=f'{BRAND_WORDS[n % 10]} {n}', slug=f'brand-{n}',
+            created_at=self.when(n, count), updated_at=self.when(n, count),
+        )
+
+    def row_attributes(self, n, count, rng):
+        # Attribute 0 is the variant axis (size); the others describe products
+        name = 'Size' if n == 0 else f'{ATTRIBUTE_NAMES[n % 10]} {n}'
+        return dict(
+            id=seed_id('attribute', n), name=name, slug=f'attribute-{n}', type='select',
+            is_variant_axis=n == 0, ordering=n,
+            created_at=self.when(n, count), updated_at=self.when(n, count),
+        )
+
+    def row_attribute_values(self, n, count, rng):
+        per_attribute = self.sizes['values_per_attribute']
+        attribute, k = divmod(n, per_attribute)
+        if attribute == 0:
+            value = SIZE_LABELS[k] if k < len(SIZE_LABELS) else f'Size {k}'
+        else:
+            value = VALUE_WORDS[k] if k < len(VALUE_WORDS) else f'{VALUE_WORDS[k % len(VALUE_WORDS)]} {k}'
+        return dict(
+            id=seed_id('attribute_value', n), attribute_id=seed_id('attribute', attribute),
+            value=value, slug=f'value-{n}', ordering=k,
+        )
+
+    def row_warehouses(self, n, count, rng):
+        city = CITIES[n % len(CITIES)]
+        return dict(
+            id=seed_id('warehouse', n), name=f'Warehouse {n} {city}', slug=f'warehouse-{n}', city=city,
+            country='India', created_at=self.when(n, count), updated_at=self.when(n, count),
+        )
+
+    def row_products(self, n, count, rng):
+        s = self.sizes
+        name = f'{ADJECTIVES[n % 10]} {NOUNS[n // 10 % 10]} {n}'
+        return dict(
+            id=seed_id('product', n), name=name, slug=f'{ADJECTIVES[n % 10]}-{NOUNS[n // 10 % 10]}-{n}'.lower(),
+            sku=f'SKU-{n:09d}', category_id=seed_id('category', n % s['categories']),
+            brand_id=seed_id('brand', n * 7 % s['brands']),
+            type='variant_parent' if s['variants_per_product'] else 'simple',
+            short_description=' '.join(rng.sample(WORDS, 5)), description=' '.join(rng.choices(WORDS, k=60)),
+            status=rng.choices(['published', 'draft', 'archived'], weights=[85, 10, 5])[0],
+            weight_grams=rng.randint(50, 5000), dimensions={'length': 300, 'width': 200, 'height': 50},
+            country_of_origin='IN', metadata={'seeded': True},
+            created_at=self.when(n, count), updated_at=self.when(n, count),
+        )
+
+    def row_product_attributes(self, n, count, rng):
+        s = self.sizes
+        per_product = min(s['attributes_per_product'], s['attributes'] - 1)
+        product, j = divmod(n, per_product)
+        attribute = 1 + (product + j) % (s['attributes'] - 1)
+        value = attribute * s['values_per_attribute'] + (product * 31 + j) % s['values_per_attribute']
+        return dict(
+            id=seed_id('product_attribute', n), product_id=seed_id('product', product),
+            attribute_id=seed_id('attribute', attribute), attribute_value_id=seed_id('attribute_value', value),
+        )
+
+    def row_variants(self, n, count, rng):
+        product, k = divmod(n, self.sizes['variants_per_product'])
+        size = SIZE_LABELS[k % len(SIZE_LABELS)]
+        price = price_of(product) + 50 * k
+        return dict(
+            id=seed_id('variant', n), product_id=seed_id('product', product), sku=f'SKU-{product:09d}-{k}',
+            slug=f'variant-{n}', name=size, price=price, compare_at_price=price + 200,
+            cost_price=price * Decimal('0.6'), created_at=self.when(n, count), updated_at=self.when(n, count),
+        )
+
+    def row_variant_attributes(self, n, count, rng):
+        k = n % self.sizes['variants_per_product']
+        return dict(
+            id=seed_id('variant_attribute', n), variant_id=seed_id('variant', n),
+            attribute_id=seed_id('attribute', 0),
+            attribute_value_id=seed_id('attribute_value', k % self.sizes['values_per_attribute']),
+        )
+
+    def row_stock(self, n, count, rng):
+        product, j = divmod(n, self.sizes['stock_per_product'])
+        return dict(
+            id=seed_id('stock', n), slug=f'stock-{n}', product_id=seed_id('product', product),
+            warehouse_id=seed_id('warehouse', (product + j) % self.sizes['warehouses']),
+            quantity=rng.randint(0, 500), reserved_quantity=rng.randint(0, 10), min_quantity=10,
+            max_quantity=1000, created_at=self.when(n, count), updated_at=self.when(n, count),
+        )
+
+    def row_carts(self, n, count, rng):
+        return dict(
+            id=seed_id('cart', n), slug=f'cart-{n}', user_id=seed_id('user', n % self.sizes['users']),
+            is_active=rng.random() < 0.8, created_at=self.when(n, count), updated_at=self.when(n, count),
+        )
+
+    def row_cart_items(self, n, count, rng):
+        s = self.sizes
+        cart, k = divmod(n, s['items_per_cart'])
+        product = (cart + k * spread(s['products'], s['items_per_cart'])) % s['products']
+        quantity = 1 + (cart + k) % 3
+        return dict(
+            id=seed_id('cart_item', n), slug=f'cart-item-{n}', cart_id=seed_id('cart', cart),
+            product_id=seed_id('product', product), quantity=quantity, price=price_of(product),
+            total_price=price_of(product) * quantity,
+            created_at=self.when(n, count), updated_at=self.when(n, count),
+        )
+
+    def order_lines(self, order):
+        s = self.sizes
+        step = spread(s['products'], s['items_per_order'])
+        for k in range(s['items_per_order']):
+            product = (order * 13 + k * step) % s['products']
+            yield k, product, 1 + (order + k) % 3
+
+    def row_orders(self, n, count, rng):
+        total = sum(price_of(product) * quantity for _, product, quantity in self.order_lines(n))
+        discount = (total * Decimal('0.1')).quantize(Decimal('0.01')) if n % 5 == 0 else Decimal('0.00')
+        address = f'{n % 500 + 1} MG Road, {CITIES[n % len(CITIES)]}'
+        status = rng.choices(['delivered', 'shipped', 'processing', 'pending', 'cancelled', 'refunded'],
+                             weights=[55, 15, 10, 10, 7, 3])[0]
+        return dict(
+            id=seed_id('order', n), slug=f'order-{n}', user_id=seed_id('user', n % self.sizes['users']),
+            status=status, total_amount=total, discount_amount=discount, final_amount=total - discount,
+            shipping_address=address, billing_address=address,
+            payment_status='failed' if status == 'cancelled' else 'paid',
+            payment_method=rng.choice(['cod', 'card', 'upi']),
+            created_at=self.when(n, count), updated_at=self.when(n, count),
+        )
+
+    def row_order_items(self, n, count, rng):
+        order, k = divmod(n, self.sizes['items_per_order'])
+        _, product, quantity = list(self.order_lines(order))[k]
+        return dict(
+            id=seed_id('order_item', n), slug=f'order-item-{n}', order_id=seed_id('order', order),
+            product_id=seed_id('product', product), quantity=quantity, price=price_of(product),
+            subtotal=price_of(product) * quantity, created_at=self.when(n, count),
+        )
+
+    def row_reviews(self, n, count, rng):
+        s = self.sizes
+        # (product, user) pairs stay unique for n < products * users
+        product = n % s['products']
+        user = (n // s['products'] + product) % s['users']
+        return dict(
+            id=seed_id('review', n), slug=f'review-{n}', product_id=seed_id('product', product),
+            user_id=seed_id('user', user), rating=rng.choices([5, 4, 3, 2, 1], weights=[45, 30, 12, 6, 7])[0],
+            title=' '.join(rng.sample(WORDS, 3)).capitalize(), content=' '.join(rng.choices(WORDS, k=30)),
+            is_verified_purchase=rng.random() < 0.6, is_approved=rng.random() < 0.9,
+            likes=rng.randint(0, 50), dislikes=rng.randint(0, 5),
+            created_at=self.when(n, count), updated_at=self.when(n, count),
+        )
+
+    def row_activity(self, n, count, rng):
+        s = self.sizes
+        return dict(
+            id=seed_id('activity', n), slug=f'activity-{n}',
+            user_id=seed_id('user', n % s['users']) if n % 10 else None,
+            product_id=seed_id('product', n * 7919 % s['products']),
+            action=rng.choices(['view', 'add_to_cart', 'wishlist', 'purchase'], weights=[80, 10, 6, 4])[0],
+            created_at=self.when(n, count),
+        )
+
+    def row_audit_logs(self, n, count, rng):
+        s = self.sizes
+        action = rng.choices(['login', 'update', 'create', 'delete'], weights=[50, 35, 12, 3])[0]
+        row = dict(user_id=seed_id('user', n % s['users']), action=action, timestamp=self.when(n, count),
+                   ip_address=f'10.0.{n // 256 % 256}.{n % 256}', user_agent='seed_load_data')
+        if action != 'login':
+            product = n * 31 % s['products']
+            row.update(model_name='Product', object_id=str(seed_id('product', product)),
+                       details=f'{action.capitalize()}d Product', new_data={'status': 'published'})
+        else:
+            row['details'] = f'user{n % s["users"]}@seed.example logged in'
+        return row
+
+
+@contextmanager
+def explicit_timestamps(model):
+    """Let bulk_create keep the created_at/updated_at values set on the rows."""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _init_worker():
+    django.setup()
+    connections.close_all()
+
+
+def insert_chunk(task):
+    """Build and insert rows [start, end) of one phase. Runs in a worker process."""
+    seeder, phase, start, end = task
+    name, model, count = next(item for item in seeder.phases() if item[0] == phase)
+    rng = random.Random(f'{seeder.seed}:{phase}:{start}')
+    rows = [seeder.build(phase, model, n, count, rng) for n in range(start, end)]
+    with explicit_timestamps(model), transaction.atomic():
+        model.objects.bulk_create(rows, batch_size=1000)
+    return end - start
+
+
+class Command(BaseCommand):
+    help = 'Fill an empty database with a large, FK-consistent synthetic dataset for load tests and benchmarks'
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_SIZES.items():
+            parser.add_argument(f"--{name.replace('_', '-')}", type=int, dest=name, help=f'Default: {default}')
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help=f"Multiply the default row counts ({', '.join(SCALED)})")
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows built and inserted per task')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the generated text and numbers')
+
+    def handle(self, *args, **options):
+        sizes = {}
+        for name, default in DEFAULT_SIZES.items():
+            if options[name] is not None:
+                sizes[name] = options[name]
+            elif name in SCALED:
+                sizes[name] = max(int(default * options['scale']), 1)
+            else:
+                sizes[name] = default
+        self.validate(sizes)
+
+        from catalog.models import Product
+        if Product.objects.filter(pk=seed_id('product', 0)).exists():
+            raise CommandError("This database is already seeded; run seed_load_data on an empty database.")
+
+        workers = max(options['workers'], 1)
+        if connections['default'].vendor == 'sqlite' and workers > 1:
+            self.stdout.write("SQLite allows one writer at a time: inserting from a single process.")
+            workers = 1
+
+        # One hash for every seeded user: hashing per row would dominate the run
+        seeder = Seeder(sizes, options['seed'], make_password('seed-password'), timezone.now())
+        chunk = max(options['chunk_size'], 1)
+
+        pool = None
+        if workers > 1:
+            connections.close_all()
+            pool = multiprocessing.get_context().Pool(workers, initializer=_init_worker)
+        started = time.perf_counter()
+        try:
+            for phase, model, count in seeder.phases():
+                tasks = [(seeder, phase, start, min(start + chunk, count)) for start in range(0, count, chunk)]
+                phase_started = time.perf_counter()
+                if pool is not None:
+                    inserted = sum(pool.imap_unordered(insert_chunk, tasks))
+                else:
+                    inserted = sum(map(insert_chunk, tasks))
+                elapsed = time.perf_counter() - phase_started
+                self.stdout.write(
+                    f"{phase:<20} {inserted:>12,} rows {elapsed:>8.1f} s {inserted / max(elapsed, 1e-9):>12,.0f} rows/s"
+                )
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        # Bulk inserts skip the signals that keep the search index and product cards current
+        from catalog.cards import rebuild_product_cards
+        from catalog.search import rebuild_search_index
+        phase_started = time.perf_counter()
+        indexed = rebuild_search_index() or 0
+        self.stdout.write(f"{'search index':<20} {indexed:>12,} rows {time.perf_counter() - phase_started:>8.1f} s")
+        phase_started = time.perf_counter()
+        cards = rebuild_product_cards()
+        self.stdout.write(f"{'product cards':<20} {cards:>12,} rows {time.perf_counter() - phase_started:>8.1f} s")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded in {time.perf_counter() - started:.1f} s with {workers} worker(s). "
+            f"Users log in with user<n>@seed.example / seed-password."
+        ))
+
+    def validate(self, sizes):
+        if any(value < 0 for value in sizes.values()):
+            raise CommandError("Sizes cannot be negative.")
+        for name in ('users', 'categories', 'brands', 'products', 'warehouses', 'values_per_attribute'):
+            if sizes[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1.")
+        if sizes['attributes'] < 2:
+            raise CommandError("--attributes must be at least 2 (one variant axis, one product attribute).")
+        if sizes['stock_per_product'] > sizes['warehouses']:
+            raise CommandError("--stock-per-product cannot exceed --warehouses.")
+        for name in ('items_per_cart', 'items_per_order'):
+            if sizes[name] > sizes['products']:
+                raise CommandError(f"--{name.replace('_', '-')} cannot exceed --products.")
+        if sizes['reviews'] > sizes['products'] * sizes['users']:
+            raise CommandError("--reviews cannot exceed products x users (one review per product and user).")
@@ -1,5 +1,7 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.text import slugify
+from .slugs import UniqueSlugMixin
 import uuid
 from django.conf import settings
 
@@ -26,6 +28,7 @@ class Role(models.Model):
     name = models.CharField(max_length=50, unique=True)
     slug = models.SlugField(unique=True, blank=True)
     description = models.TextField(blank=True)
+    permissions_version = models.PositiveIntegerField(default=1, editable=False)  # bumped on permission changes, embedded in JWTs
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -36,7 +39,7 @@ class Role(models.Model):
         return self.name
 
 
-class AppModel(models.Model):
+class AppModel(UniqueSlugMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(unique=True, blank=True)
@@ -44,16 +47,8 @@ class AppModel(models.Model):
     description = models.TextField(blank=True)
     app_label = models.CharField(max_length=100)
     
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.name)
-            unique_slug = base_slug
-            counter = 1
-            while AppModel.objects.filter(slug=unique_slug).exists():
-                unique_slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = unique_slug or str(uuid.uuid4())
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return self.name
     
     def __str__(self):
         return self.name
@@ -74,7 +69,7 @@ class PermissionType(models.Model):
         return self.name
 
 
-class RoleModelPermission(models.Model):
+class RoleModelPermission(UniqueSlugMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     slug = models.SlugField(null=True, blank=True)
     role = models.ForeignKey(Role, on_delete=models.CASCADE)
@@ -87,17 +82,20 @@ class RoleModelPermission(models.Model):
     def __str__(self):
         return f"{self.role.name} — {self.model.name} [{self.permission_type.name}]"
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base = f"{self.role.name}-{self.model.name}-{self.permission_type.slug}"
-            base_slug = slugify(base)
-            unique_slug = base_slug
-            counter = 1
-            while RoleModelPermission.objects.filter(slug=unique_slug).exclude(pk=self.pk).exists():
-                unique_slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = unique_slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return f"{self.role.name}-{self.model.name}-{self.permission_type.slug}"
+
+
+class PermissionMatrixVersion(models.Model):
+    """
+    A single row whose token changes with every write to roles, permissions,
+    models or user roles, in the same transaction. Workers read it on each
+    check and recompile their in-memory matrix when it moved.
+    """
+    token = models.CharField(max_length=32)
+
+    def __str__(self):
+        return self.token
 
 
 class AuditLog(models.Model):
@@ -120,7 +118,15 @@ class AuditLog(models.Model):
     new_data = models.JSONField(null=True, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)  # set when recorded, not when flushed
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp', 'id']),
+            models.Index(fields=['action', 'timestamp']),
+            models.Index(fields=['model_name', 'object_id', 'timestamp']),
+            models.Index(fields=['user', 'timestamp']),
+        ]
 
     def __str__(self):
         return f"{self.timestamp.strftime('%Y-%m-%d %H:%M:%S')} | {self.user} | {self.action} | {self.model_name} ({self.object_id})"
@@ -0,0 +1,289 @@
+import base64
+import binascii
+import datetime
+import json
+from collections import OrderedDict
+from operator import attrgetter
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder truncates datetimes to milliseconds; cursor keys must round-trip exactly
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def table_estimate(queryset):
+    """Planner row estimate for an unfiltered table on PostgreSQL, otherwise None."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or queryset.query.where:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                       [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    return max(row[0], 0) if row else None
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a composite key such as ('-timestamp', '-id').
+
+    DRF's CursorPagination positions on the first ordering field plus an offset.
+    Here the cursor carries the full key of the boundary row instead, so every
+    page is one range scan on a matching index no matter how many rows share a
+    value. The key is the view's keyset_ordering if set, otherwise the ordering
+    the queryset ends up with (view queryset, OrderingFilter or Meta.ordering),
+    completed with the primary key so it is unique. Nullable fields sort last.
+
+    ?count=true adds the exact total, ?count=estimate a cheap one.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE or 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    count_query_param = 'count'
+    count_estimate_cap = 10000
+    ordering = ('-pk',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, queryset, view):
+        ordering = getattr(view, 'keyset_ordering', None)
+        if ordering:
+            return ordering
+        query = queryset.query
+        ordering = query.order_by or (query.default_ordering and queryset.model._meta.ordering) or ()
+        if ordering and all(isinstance(field, str) and field != '?' for field in ordering):
+            return ordering
+        if any(field.name == 'created_at' for field in queryset.model._meta.concrete_fields):
+            return ('-created_at', '-pk')
+        return self.ordering
+
+    def resolve_ordering(self, model, ordering, annotations=()):
+        """
+        (path, descending, nullable) per ordering field, ending at the first unique
+        field; the primary key is appended when none is. Paths ending in a foreign
+        key are keyed on its column, annotations (such as a search rank) on their
+        value, taken to be non-null. Returns None for orderings that cannot be keyed.
+        """
+        resolved = []
+        for item in ordering:
+            descending = item.startswith('-')
+            parts = item.lstrip('-+').split('__')
+            if len(parts) == 1 and parts[0] in annotations:
+                resolved.append((parts[0], descending, False))
+                continue
+            current, nullable, path = model, False, []
+            try:
+                for position, part in enumerate(parts):
+                    field = current._meta.pk if part == 'pk' else current._meta.get_field(part)
+                    if field.many_to_many or field.one_to_many:
+                        return None
+                    nullable = nullable or field.null
+                    last = position == len(parts) - 1
+                    path.append(field.attname if last and field.is_relation else part)
+                    if field.is_relation and not last:
+                        current = field.related_model
+            except FieldDoesNotExist:
+                return None
+            resolved.append(('__'.join(path), descending, nullable))
+            if len(parts) == 1 and (field.primary_key or (field.unique and not field.null)):
+                return resolved
+        direction = resolved[-1][1] if resolved else True
+        return resolved + [('pk', direction, False)]
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            values = payload['v']
+            if not isinstance(values, list) or len(values) != len(self.ordering_fields):
+                raise ValueError
+            # A cursor is only meaningful for the ordering it was issued for
+            if payload['o'] != self.ordering_signature:
+                raise ValueError
+        except (TypeError, ValueError, KeyError, binascii.Error, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return values, bool(payload.get('r'))
+
+    def key_field(self, queryset, path):
+        annotation = queryset.query.annotations.get(path)
+        if annotation is not None:
+            return annotation.output_field
+        model, parts = queryset.model, path.split('__')
+        for part in parts[:-1]:
+            model = model._meta.get_field(part).related_model
+        return model._meta.pk if parts[-1] == 'pk' else model._meta.get_field(parts[-1])
+
+    def clean_cursor_values(self, queryset, values):
+        """
+        Cursor values as the key fields' Python values. Cursors come from
+        clients: a value its field rejects is an invalid cursor (404), not a
+        database error.
+        """
+        cleaned = []
+        try:
+            for (path, _, nullable), value in zip(self.ordering_fields, values):
+                if not isinstance(value, (str, int, float, bool, type(None))):
+                    raise ValueError
+                if value is not None:
+                    value = self.key_field(queryset, path).to_python(value)
+                if value is None and not nullable:
+                    raise ValueError
+                cleaned.append(value)
+        except (ValidationError, TypeError, ValueError, OverflowError):
+            raise NotFound(self.invalid_cursor_message)
+        return cleaned
+
+    def encode_cursor(self, values, reverse=False):
+        payload = json.dumps(
+            {'v': values, 'r': int(reverse), 'o': self.ordering_signature},
+            cls=CursorEncoder, separators=(',', ':')
+        )
+        encoded = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def order_by(self, path, descending, nullable):
+        if not nullable:
+            return f'-{path}' if descending != self.reverse else path
+        # NULLs come last in the forward direction, first when walking back
+        expression = F(path)
+        if self.reverse:
+            return expression.asc(nulls_first=True) if descending else expression.desc(nulls_first=True)
+        return expression.desc(nulls_last=True) if descending else expression.asc(nulls_last=True)
+
+    def after(self, path, descending, nullable, value, reverse):
+        """Rows strictly past value on one field in the walking direction, or None if there are none."""
+        lookup = 'lt' if descending != reverse else 'gt'
+        if value is None:
+            return Q(**{f'{path}__isnull': False}) if reverse else None
+        clause = Q(**{f'{path}__{lookup}': value})
+        if nullable and not reverse:
+            clause |= Q(**{f'{path}__isnull': True})
+        return clause
+
+    def keyset_filter(self, values, reverse):
+        """(a, b) < (x, y) expanded to: a < x OR (a = x AND b < y), per field direction."""
+        condition = Q()
+        for position, (path, descending, nullable) in enumerate(self.ordering_fields):
+            clause = self.after(path, descending, nullable, values[position], reverse)
+            if clause is None:
+                continue
+            for previous, (previous_path, _, _) in enumerate(self.ordering_fields[:position]):
+                if values[previous] is None:
+                    clause &= Q(**{f'{previous_path}__isnull': True})
+                else:
+                    clause &= Q(**{previous_path: values[previous]})
+            condition |= clause
+        # Nothing can follow a key that is NULL in every nullable field and the last
+        # in its group; an always-false filter keeps the page empty
+        return condition if condition else Q(pk__in=[])
+
+    def key_for(self, obj):
+        return [attrgetter(path.replace('__', '.'))(obj) for path, _, _ in self.ordering_fields]
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param, '').lower()
+        if mode in ('true', '1', 'exact'):
+            return queryset.order_by().count(), False
+        if mode == 'estimate':
+            estimate = table_estimate(queryset)
+            if estimate is not None:
+                return estimate, True
+            # Counting stops at the cap, a lower bound for larger results
+            count = queryset.order_by()[:self.count_estimate_cap].count()
+            return count, count >= self.count_estimate_cap
+        return None, False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        ordering = self.get_ordering(queryset, view)
+        self.ordering_fields = self.resolve_ordering(queryset.model, ordering, queryset.query.annotations)
+        if self.ordering_fields is None:
+            self.ordering_fields = self.resolve_ordering(queryset.model, self.ordering)
+        self.ordering_signature = [
+            f"{'-' if descending else ''}{path}" for path, descending, _ in self.ordering_fields
+        ]
+        self.cursor_values, self.reverse = self.decode_cursor(request)
+        if self.cursor_values is not None:
+            self.cursor_values = self.clean_cursor_values(queryset, self.cursor_values)
+        self.count, self.count_estimated = self.get_count(queryset, request)
+
+        queryset = queryset.order_by(*[
+            self.order_by(path, descending, nullable) for path, descending, nullable in self.ordering_fields
+        ])
+        if self.cursor_values is not None:
+            queryset = queryset.filter(self.keyset_filter(self.cursor_values, self.reverse))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if self.reverse:
+            results.reverse()
+            self.has_next = self.cursor_values is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor_values is not None
+
+        self.next_values = self.key_for(results[-1]) if results else self.cursor_values
+        self.previous_values = self.key_for(results[0]) if results else self.cursor_values
+        return results
+
+    def get_next_link(self):
+        if not self.has_next or self.next_values is None:
+            return None
+        return self.encode_cursor(self.next_values)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.previous_values is None:
+            return None
+        return self.encode_cursor(self.previous_values, reverse=True)
+
+    def get_paginated_response(self, data):
+        response = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.count is not None:
+            response['count'] = self.count
+            response['count_estimated'] = self.count_estimated
+        response['results'] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'count_estimated': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
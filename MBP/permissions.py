@@ -1,15 +1,227 @@
+import base64
+import threading
+import time
+import uuid
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from rest_framework.permissions import BasePermission
-from .models import RoleModelPermission, AppModel, PermissionType
+from .models import Role, AppModel, RoleModelPermission, PermissionMatrixVersion
+
+PERMISSION_CODES = 'crud'
+
+PERMISSION_MATRIX_DEFAULTS = {
+    'VERSION_TTL': 1.0,   # seconds a worker trusts its last read of the shared version; 0 reads it every check
+}
+
+
+def permission_matrix_setting(name):
+    return getattr(settings, 'PERMISSION_MATRIX', {}).get(name, PERMISSION_MATRIX_DEFAULTS[name])
+
+
+def encode_permission_bits(bits):
+    raw = bits.to_bytes((bits.bit_length() + 7) // 8 or 1, 'big')
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+@lru_cache(maxsize=1024)
+def decode_permission_bits(value):
+    raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+    return int.from_bytes(raw, 'big')
+
+
+class PermissionMatrix:
+    """
+    Compiled role -> model -> permission-code lookup held in process memory.
+
+    The matrix is rebuilt lazily whenever the shared version moves. The
+    version is a row in the database (PermissionMatrixVersion); signals in
+    MBP.signals bump it in the same transaction as the Role,
+    RoleModelPermission, AppModel, PermissionType or UserRole write. A worker
+    reads the row at most once per VERSION_TTL seconds, so checks in between
+    run no SQL and a bump made elsewhere reaches every worker within
+    VERSION_TTL; a bump made in this process applies at once.
+
+    The matrix also mints and verifies the permission claims carried in JWT
+    access tokens: a bitset with four bits (c/r/u/d) per AppModel, indexed by
+    AppModel name order, stamped with the role's permissions_version.
+    """
+    VERSION_PK = 1
+    MAX_CACHED_USERS = 50000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = None   # time.monotonic() of the last version read
+        self._roles = {}
+        self._role_versions = {}
+        self._model_index = {}
+        self._user_roles = {}
+
+    def shared_version(self):
+        return PermissionMatrixVersion.objects.filter(pk=self.VERSION_PK).values_list('token', flat=True).first() or ''
+
+    def invalidate(self):
+        # A random token rather than a counter: a rolled back bump never comes back as a later one
+        token = uuid.uuid4().hex
+        if not PermissionMatrixVersion.objects.filter(pk=self.VERSION_PK).update(token=token):
+            try:
+                with transaction.atomic():
+                    PermissionMatrixVersion.objects.create(pk=self.VERSION_PK, token=token)
+            except IntegrityError:
+                PermissionMatrixVersion.objects.filter(pk=self.VERSION_PK).update(token=token)
+        self.expire()
+        # Again once committed: a check in between may have kept the old version for VERSION_TTL
+        transaction.on_commit(self.expire)
+
+    def expire(self):
+        with self._lock:
+            self._version = None
+
+    def _compile(self, version):
+        roles = {}
+        rows = RoleModelPermission.objects.values_list('role_id', 'model__name', 'permission_type__code')
+        for role_id, model_name, code in rows:
+            roles.setdefault(role_id, {}).setdefault(model_name.lower(), set()).add(code.lower())
+
+        self._roles = {
+            role_id: {model: frozenset(codes) for model, codes in models.items()}
+            for role_id, models in roles.items()
+        }
+        self._role_versions = {
+            str(role_id): permissions_version
+            for role_id, permissions_version in Role.objects.values_list('id', 'permissions_version')
+        }
+        self._model_index = {
+            name.lower(): index
+            for index, name in enumerate(AppModel.objects.order_by('name').values_list('name', flat=True))
+        }
+        self._user_roles = {}
+        self._version = version
+
+    def ensure_compiled(self):
+        now = time.monotonic()
+        checked_at = self._checked_at
+        if self._version is not None and checked_at is not None \
+                and now - checked_at < permission_matrix_setting('VERSION_TTL'):
+            return
+
+        version = self.shared_version()
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    self._compile(version)
+        self._checked_at = now
+
+    def role_for_user(self, user):
+        if not user or not user.pk:
+            return None
+
+        self.ensure_compiled()
+        return self._role_for_user(user)
+
+    def _role_for_user(self, user):
+        # The matrix is compiled: no second read of the version
+        try:
+            return self._user_roles[user.pk]
+        except KeyError:
+            pass
+
+        from accounts.models import UserRole
+        role_id = UserRole.objects.filter(user_id=user.pk).values_list('role_id', flat=True).first()
+        with self._lock:
+            if len(self._user_roles) >= self.MAX_CACHED_USERS:
+                self._user_roles = {}
+            self._user_roles[user.pk] = role_id
+        return role_id
+
+    def permissions_for_role(self, role_id):
+        self.ensure_compiled()
+        return self._roles.get(role_id, {})
+
+    def has_permission(self, user, model_name, permission_code):
+        role_id = self.role_for_user(user)
+        if role_id is None:
+            return False
+        codes = self._roles.get(role_id, {}).get(model_name.lower())
+        return bool(codes) and permission_code.lower() in codes
+
+    def permission_claims(self, role_id):
+        self.ensure_compiled()
+        bits = 0
+        for model_name, codes in self._roles.get(role_id, {}).items():
+            index = self._model_index.get(model_name)
+            if index is None:
+                continue
+            for code in codes:
+                if code in PERMISSION_CODES:
+                    bits |= 1 << (index * 4 + PERMISSION_CODES.index(code))
+
+        return {
+            'role': str(role_id),
+            'role_ver': self._role_versions.get(str(role_id), 0),
+            'perms': encode_permission_bits(bits),
+        }
+
+    def has_permission_from_claims(self, token, user, model_name, permission_code):
+        """
+        Authorize from the token's permission claims.
+        Returns None when the token has no usable claims, or when they are stale
+        because the role's permissions or the user's role changed since issue;
+        both are compared with the database-backed matrix.
+        """
+        if token is None:
+            return None
+
+        role = token.get('role')
+        role_ver = token.get('role_ver')
+        perms = token.get('perms')
+        if role is None or role_ver is None or perms is None:
+            return None
+
+        self.ensure_compiled()
+        if self._role_versions.get(role) != role_ver:
+            return None
+
+        role_id = self._role_for_user(user) if user and user.pk else None
+        if role_id is None or str(role_id) != role:
+            return None
+
+        code = permission_code.lower()
+        index = self._model_index.get(model_name.lower())
+        if index is None or code not in PERMISSION_CODES:
+            return False
+
+        try:
+            bits = decode_permission_bits(perms)
+        except (TypeError, ValueError):
+            return None
+        return bool(bits >> (index * 4 + PERMISSION_CODES.index(code)) & 1)
+
+
+permission_matrix = PermissionMatrix()
+
+
+def has_model_permission(request, model_name, permission_code):
+    """Whether the request's user may use permission_code on model_name: token claims first, then the matrix."""
+    if request.user.is_superuser:
+        return True
+
+    allowed = permission_matrix.has_permission_from_claims(
+        request.auth, request.user, model_name, permission_code
+    )
+    if allowed is not None:
+        return allowed
+
+    return permission_matrix.has_permission(request.user, model_name, permission_code)
+
 
 class HasModelPermission(BasePermission):
     def has_permission(self, request, view):
         if request.user.is_superuser:
             return True
 
-        role = getattr(request.user, 'role', None)
-        if not role:
-            return False
-
         # Auto infer model_name from view's queryset
         model_name = getattr(view, 'model_name', None)
         if not model_name and hasattr(view, 'queryset'):
@@ -20,13 +232,11 @@ class HasModelPermission(BasePermission):
         if not model_name or not permission_code:
             return False
 
-        try:
-            model_obj = AppModel.objects.get(name__iexact=model_name)
-            perm_type = PermissionType.objects.get(code=permission_code.lower())
-            return RoleModelPermission.objects.filter(
-                role=role,
-                model=model_obj,
-                permission_type=perm_type
-            ).exists()
-        except (AppModel.DoesNotExist, PermissionType.DoesNotExist):
-            return False
+        return has_model_permission(request, model_name, permission_code)
+
+
+def add_permission_claims(token, role):
+    """Embed the role and its compiled permission bitset in a JWT."""
+    for claim, value in permission_matrix.permission_claims(role.pk).items():
+        token[claim] = value
+    return token
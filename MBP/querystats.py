@@ -0,0 +1,136 @@
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+from django.conf import settings
+
+QUERY_STATS_DEFAULTS = {
+    'ENABLED': True,
+    'WINDOW': 200,                # recent requests kept per endpoint for the percentiles
+    'MAX_ENDPOINTS': 500,         # least recently hit endpoints are evicted beyond this
+    'N_PLUS_ONE_THRESHOLD': 5,    # a statement shape run this often in one request is flagged
+    'SERVER_TIMING': None,        # None: only for DEBUG or staff users
+}
+
+
+def query_stats_setting(name):
+    return getattr(settings, 'QUERY_STATS', {}).get(name, QUERY_STATS_DEFAULTS[name])
+
+
+_LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def statement_shape(sql):
+    """SQL with literals, placeholders and IN lists collapsed, so repeated lookups compare equal."""
+    for pattern, replacement in _LITERALS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class QueryRecorder:
+    """execute_wrapper counting statements, DB time and statement shapes for one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[statement_shape(sql)] += 1
+
+    def repeated(self, threshold=None):
+        """(shape, count) of statements run at least threshold times, most repeated first."""
+        threshold = threshold or query_stats_setting('N_PLUS_ONE_THRESHOLD')
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class EndpointStats:
+    def __init__(self, window):
+        self.requests = 0
+        self.queries = 0
+        self.db_time = 0.0
+        self.n_plus_one = 0
+        self.recent = deque(maxlen=window)   # (queries, db ms, total ms)
+        self.repeated = []
+
+    def as_dict(self, endpoint):
+        queries = [sample[0] for sample in self.recent]
+        db_ms = [sample[1] for sample in self.recent]
+        total_ms = [sample[2] for sample in self.recent]
+        return {
+            'endpoint': endpoint,
+            'requests': self.requests,
+            'queries_total': self.queries,
+            'queries_avg': round(self.queries / self.requests, 2) if self.requests else 0,
+            'queries_p95': percentile(queries, 0.95),
+            'queries_max': max(queries, default=0),
+            'db_ms_avg': round(self.db_time * 1000 / self.requests, 2) if self.requests else 0,
+            'db_ms_p95': round(percentile(db_ms, 0.95), 2),
+            'total_ms_p95': round(percentile(total_ms, 0.95), 2),
+            'n_plus_one_requests': self.n_plus_one,
+            'repeated_statements': [{'sql': shape[:500], 'count': count} for shape, count in self.repeated],
+        }
+
+
+class QueryStatsTable:
+    """
+    Rolling per-endpoint SQL statistics of this process, kept in memory.
+
+    Totals cover every request since the last reset; percentiles cover the last
+    WINDOW requests per endpoint. The statements flagged on the most recent
+    N+1 request of an endpoint are kept with it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = OrderedDict()
+
+    def add(self, endpoint, recorder, total_time):
+        repeated = recorder.repeated()
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats(query_stats_setting('WINDOW'))
+                while len(self._endpoints) > query_stats_setting('MAX_ENDPOINTS'):
+                    self._endpoints.popitem(last=False)
+            else:
+                self._endpoints.move_to_end(endpoint)
+            stats.requests += 1
+            stats.queries += recorder.count
+            stats.db_time += recorder.duration
+            stats.recent.append((recorder.count, recorder.duration * 1000, total_time * 1000))
+            if repeated:
+                stats.n_plus_one += 1
+                stats.repeated = repeated[:5]
+
+    def snapshot(self):
+        with self._lock:
+            rows = [stats.as_dict(endpoint) for endpoint, stats in self._endpoints.items()]
+        return sorted(rows, key=lambda row: row['queries_total'], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+query_stats = QueryStatsTable()
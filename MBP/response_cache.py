@@ -0,0 +1,251 @@
+import hashlib
+import json
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from rest_framework.response import Response
+from .caching import is_shared_cache
+from .permissions import permission_matrix
+
+RESPONSE_CACHE_DEFAULTS = {
+    'ENABLED': True,           # only takes effect on a shared CACHE, see response_cache_enabled()
+    'CACHE': 'default',        # alias in CACHES; must be shared between workers (Redis, Memcached)
+    'TIMEOUT': 300,            # seconds an entry lives when nothing invalidates it first
+    'FILL_LOCK_TIMEOUT': 10,   # seconds a miss may hold the fill lock
+    'FILL_WAIT': 5.0,          # seconds a concurrent miss waits for the filler before rendering itself
+    'FILL_POLL': 0.02,
+}
+GENERATION_KEY = 'mbp:rc:gen:{}'
+
+
+def response_cache_setting(name):
+    return getattr(settings, 'RESPONSE_CACHE', {}).get(name, RESPONSE_CACHE_DEFAULTS[name])
+
+
+def response_cache_backend():
+    return caches[response_cache_setting('CACHE')]
+
+
+def shared_generations():
+    """
+    Whether every worker sees the same generations. With a per-process cache a
+    write only bumps them in the worker that made it, so they cannot version
+    anything another worker serves.
+    """
+    return is_shared_cache(response_cache_setting('CACHE'))
+
+
+def response_cache_enabled():
+    """ENABLED and on a shared CACHE; a per-process one would keep serving entries other workers invalidated."""
+    return bool(response_cache_setting('ENABLED')) and shared_generations()
+
+
+def generations(models):
+    """Current generation of each model; a bump makes every entry that read it unreachable."""
+    keys = {GENERATION_KEY.format(model._meta.label_lower): model for model in models}
+    found = response_cache_backend().get_many(list(keys))
+    return sorted((keys[key]._meta.label_lower, found.get(key, 0)) for key in keys)
+
+
+def bump_generation(model):
+    backend = response_cache_backend()
+    key = GENERATION_KEY.format(model._meta.label_lower)
+    try:
+        backend.incr(key)
+    except ValueError:
+        backend.add(key, 1, None) or backend.incr(key)
+    response_cache_stats.invalidated(model._meta.label)
+
+
+def invalidate_responses(sender, **kwargs):
+    bump_generation(sender)
+    if transaction.get_connection().in_atomic_block:
+        # Misses that read before the commit may have stored the old rows under the new generation
+        transaction.on_commit(lambda: bump_generation(sender))
+
+
+def related_models(model):
+    """Models the forward relations of model point at, model itself excluded."""
+    return {
+        field.related_model for field in model._meta.concrete_fields
+        if field.is_relation and field.related_model not in (None, model)
+    }
+
+
+def resolve_models(models):
+    """Model classes for a mix of classes and "app_label.Model" labels."""
+    return {apps.get_model(model) if isinstance(model, str) else model for model in models}
+
+
+_watched = set()
+
+
+def watch_model(model):
+    """Invalidate cached responses that read model whenever a row is saved or deleted."""
+    if model in _watched:
+        return
+    _watched.add(model)
+    uid = f'response_cache_{model._meta.label_lower}'
+    post_save.connect(invalidate_responses, sender=model, dispatch_uid=f'{uid}_save', weak=False)
+    post_delete.connect(invalidate_responses, sender=model, dispatch_uid=f'{uid}_delete', weak=False)
+
+
+class ResponseCacheStats:
+    """Hit/miss counters per viewset and invalidations per model, for this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self._invalidations = {}
+
+    def count(self, view, outcome):
+        with self._lock:
+            counters = self._views.setdefault(view, {'hits': 0, 'misses': 0, 'coalesced': 0, 'stored': 0})
+            counters[outcome] += 1
+
+    def invalidated(self, label):
+        with self._lock:
+            self._invalidations[label] = self._invalidations.get(label, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            views = {view: dict(counters) for view, counters in self._views.items()}
+            invalidations = dict(self._invalidations)
+        for counters in views.values():
+            served = counters['hits'] + counters['coalesced'] + counters['misses']
+            counters['hit_ratio'] = round((counters['hits'] + counters['coalesced']) / served, 3) if served else 0
+        return {'views': views, 'invalidations': invalidations}
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+            self._invalidations.clear()
+
+
+response_cache_stats = ResponseCacheStats()
+
+
+class ResponseCacheMixin:
+    """
+    Opt-in cache of rendered list and retrieve responses (cache_responses = True).
+
+    Keys vary on the view, action, URL kwargs, query parameters, negotiated
+    media type and the requester's permission set (superuser or role), plus
+    the generation of the queryset model, the models its forward relations
+    point at and cache_depends_on. post_save/post_delete of any of those models
+    bumps its generation, so stale entries are never read again and expire
+    after TIMEOUT. Changes made with QuerySet.update() send no signals and are
+    not seen until then.
+
+    Concurrent misses on one key are coalesced: the first renders and stores
+    the response, the others wait up to FILL_WAIT for it.
+
+    Generations and fill locks only work when every worker shares the cache,
+    so the cache stays off while CACHE is a per-process (LocMem) backend.
+    """
+    cache_responses = False
+    cache_depends_on = ()   # extra models (or "app_label.Model" labels) the representation reads
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.cache_responses:
+            for model in cls.cache_dependencies():
+                watch_model(model)
+
+    @classmethod
+    def cache_dependencies(cls):
+        model = cls.queryset.model
+        return {model} | related_models(model) | resolve_models(cls.cache_depends_on)
+
+    def uses_response_cache(self, request):
+        return (
+            self.cache_responses
+            and response_cache_enabled()
+            and request.method in ('GET', 'HEAD')
+            and getattr(request.accepted_renderer, 'format', None) == 'json'
+        )
+
+    def response_cache_key(self, request):
+        user = request.user
+        scope = 'superuser' if user.is_superuser else f'role:{permission_matrix.role_for_user(user)}'
+        raw = json.dumps([
+            f'{type(self).__module__}.{type(self).__qualname__}', self.action, self.kwargs,
+            sorted(request.query_params.lists()), request.accepted_media_type, scope,
+            generations(self.cache_dependencies()),
+        ], default=str)
+        return 'mbp:rc:' + hashlib.sha1(raw.encode()).hexdigest()
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        if not self.uses_response_cache(request):
+            return handler(request, *args, **kwargs)
+
+        backend = response_cache_backend()
+        view = type(self).__name__
+        key = self.response_cache_key(request)
+        entry = backend.get(key)
+        if entry is not None:
+            response_cache_stats.count(view, 'hits')
+            return self.cached_entry_response(request, entry, 'HIT')
+
+        lock_key = f'{key}:fill'
+        if not backend.add(lock_key, 1, response_cache_setting('FILL_LOCK_TIMEOUT')):
+            deadline = time.monotonic() + response_cache_setting('FILL_WAIT')
+            while time.monotonic() < deadline:
+                time.sleep(response_cache_setting('FILL_POLL'))
+                entry = backend.get(key)
+                if entry is not None:
+                    response_cache_stats.count(view, 'coalesced')
+                    return self.cached_entry_response(request, entry, 'HIT')
+            lock_key = None   # the filler is slow or gone: render without storing twice
+
+        response_cache_stats.count(view, 'misses')
+        try:
+            response = handler(request, *args, **kwargs)
+        except BaseException:
+            if lock_key:
+                backend.delete(lock_key)
+            raise
+
+        if response.status_code != 200 or not isinstance(response, Response):
+            if lock_key:
+                backend.delete(lock_key)
+            return response
+
+        def store(rendered):
+            entry = {
+                'content': rendered.content,
+                'content_type': rendered['Content-Type'],
+                'etag': rendered.get('ETag'),
+                'last_modified': rendered.get('Last-Modified'),
+            }
+            backend.set(key, entry, response_cache_setting('TIMEOUT'))
+            if lock_key:
+                backend.delete(lock_key)
+            response_cache_stats.count(view, 'stored')
+
+        response.add_post_render_callback(store)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def cached_entry_response(self, request, entry, state):
+        if entry['etag']:
+            # The entry is as current as a fresh render, so its ETag answers If-None-Match
+            response = get_conditional_response(request, etag=entry['etag'])
+            if response is not None and response.status_code == 304:
+                response['ETag'] = entry['etag']
+                response['X-Cache'] = state
+                return response
+        response = HttpResponse(entry['content'], content_type=entry['content_type'])
+        if entry['etag']:
+            response['ETag'] = entry['etag']
+        if entry.get('last_modified'):
+            response['Last-Modified'] = entry['last_modified']
+        response['X-Cache'] = state
+        return response
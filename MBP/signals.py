@@ -1,11 +1,14 @@
+from django.db import transaction
+from django.db.models import F
 from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import AuditLog
+from .audit import audited_models
+from .models import AuditLog, Role, AppModel, PermissionType, RoleModelPermission
+from .permissions import permission_matrix
 from .utils import log_audit_from_user
-from .utils import serialize_instance
+from .utils import serialize_instance, audit_update_data
 
 
-@receiver(post_save)
 def log_create_or_update(sender, instance, created, **kwargs):
     if sender == AuditLog:
         return
@@ -29,6 +32,7 @@ def log_create_or_update(sender, instance, created, **kwargs):
             new_data=new_data
         )
     else:
+        old_data, new_data = audit_update_data(old_data, new_data)
         log_audit_from_user(
             user=user,
             action='update',
@@ -40,7 +44,6 @@ def log_create_or_update(sender, instance, created, **kwargs):
         )
 
 
-@receiver(post_delete)
 def log_deletion(sender, instance, **kwargs):
     if sender == AuditLog:
         return
@@ -61,3 +64,36 @@ def log_deletion(sender, instance, **kwargs):
         details=f"Signal: Deleted {model_name}: {instance}",
         old_data=old_data
     )
+
+
+def connect_audit_receivers():
+    # Connected per sender so saves of unaudited models skip signal dispatch entirely
+    for model in audited_models():
+        label = model._meta.label
+        post_save.connect(log_create_or_update, sender=model, dispatch_uid=f'audit_save_{label}')
+        post_delete.connect(log_deletion, sender=model, dispatch_uid=f'audit_delete_{label}')
+
+
+connect_audit_receivers()
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=RoleModelPermission)
+@receiver(post_delete, sender=RoleModelPermission)
+@receiver(post_save, sender=AppModel)
+@receiver(post_delete, sender=AppModel)
+@receiver(post_save, sender=PermissionType)
+@receiver(post_delete, sender=PermissionType)
+@receiver(post_save, sender='accounts.UserRole')
+@receiver(post_delete, sender='accounts.UserRole')
+def permissions_changed(sender, instance, **kwargs):
+    # Role versions before the matrix version, committed together: a worker that
+    # recompiles on the new matrix version reads the new role versions with it
+    with transaction.atomic():
+        if sender is RoleModelPermission:
+            Role.objects.filter(pk=instance.role_id).update(permissions_version=F('permissions_version') + 1)
+        elif sender in (AppModel, PermissionType):
+            # Token bitsets are indexed by AppModel order, so every role's claims go stale
+            Role.objects.update(permissions_version=F('permissions_version') + 1)
+        permission_matrix.invalidate()
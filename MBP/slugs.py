@@ -0,0 +1,134 @@
+import re
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import CharField, Max, Q, Value, When, Case
+from django.db.models.functions import Cast, Concat, Length, LPad
+from django.utils.text import slugify
+
+SUFFIX_ROOM = 8        # characters kept free for "-<n>" when truncating the base
+SLUG_ATTEMPTS = 5      # saves retried when a concurrent writer takes the same slug
+BASES_PER_QUERY = 50   # distinct bases resolved by one aggregate query
+
+
+def slug_base(model, source, field='slug'):
+    """Slugified source, truncated so a numeric suffix still fits the column."""
+    max_length = model._meta.get_field(field).max_length or 50
+    base = slugify(source or '')[:max_length - SUFFIX_ROOM].strip('-')
+    return base or model._meta.model_name
+
+
+def _pattern(base):
+    return rf'^{re.escape(base)}(-[1-9][0-9]*)?$'
+
+
+def _highest_suffixes(model, bases, field='slug', using=None):
+    """
+    Map every base to the highest suffix in use: -1 when the base is free, 0 when
+    only the bare base exists, n when base-n is the highest numbered copy.
+
+    Each query covers BASES_PER_QUERY bases and returns a single row. The
+    startswith filter narrows the scan to an index range; per base the aggregate
+    keeps the longest, then greatest slug, which is the one with the highest suffix.
+    """
+    manager = model._default_manager.db_manager(using)
+    highest = {}
+    bases = list(dict.fromkeys(bases))
+    for start in range(0, len(bases), BASES_PER_QUERY):
+        chunk = bases[start:start + BASES_PER_QUERY]
+        conditions = [
+            Q(**{f'{field}__startswith': base, f'{field}__regex': _pattern(base)}) for base in chunk
+        ]
+        key = Concat(
+            LPad(Cast(Length(field), CharField()), 4, Value('0')), field, output_field=CharField()
+        )
+        match = Q()
+        for condition in conditions:
+            match |= condition
+        row = manager.filter(match).aggregate(**{
+            f'b{position}': Max(Case(When(condition, then=key), output_field=CharField()))
+            for position, condition in enumerate(conditions)
+        })
+        for position, base in enumerate(chunk):
+            value = row[f'b{position}']
+            if value is None:
+                highest[base] = -1
+            else:
+                slug = value[4:]
+                highest[base] = 0 if slug == base else int(slug[len(base) + 1:])
+    return highest
+
+
+def allocate_slugs(model, sources, field='slug', using=None):
+    """
+    Unique slugs for a batch of new rows, in the order of sources, for bulk_create.
+
+    Costs one query per BASES_PER_QUERY distinct bases however many rows already
+    share a base: "T-Shirt" becomes t-shirt, t-shirt-1, ... continuing after the
+    highest suffix in the table.
+    """
+    bases = [slug_base(model, source, field) for source in sources]
+    highest = _highest_suffixes(model, bases, field, using)
+
+    slugs, allocated = [], set()
+    for base in bases:
+        number = highest[base] + 1
+        slug = base if number == 0 else f'{base}-{number}'
+        # A bare base of one row can equal a numbered copy of another base in the batch
+        while slug in allocated:
+            number += 1
+            slug = f'{base}-{number}'
+        highest[base] = number
+        allocated.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def unique_slug(model, source, field='slug', using=None):
+    return allocate_slugs(model, [source], field, using)[0]
+
+
+def assign_unique_slugs(instances, using=None):
+    """Fill the empty slugs of unsaved instances (of any UniqueSlugMixin models) in batches."""
+    pending = {}
+    for instance in instances:
+        if isinstance(instance, UniqueSlugMixin) and not getattr(instance, instance.slug_field):
+            pending.setdefault(type(instance), []).append(instance)
+
+    for model, group in pending.items():
+        slugs = allocate_slugs(model, [instance.slug_source() for instance in group], model.slug_field, using)
+        for instance, slug in zip(group, slugs):
+            setattr(instance, model.slug_field, slug)
+
+
+class UniqueSlugMixin:
+    """
+    Fills an empty slug from slug_source() on save.
+
+    The slug is allocated with a single query. If a concurrent writer inserts the
+    same slug first, the save is rolled back to a savepoint and retried with a
+    freshly allocated slug.
+    """
+    slug_field = 'slug'
+
+    def slug_source(self):
+        raise NotImplementedError('UniqueSlugMixin models must define slug_source()')
+
+    def save(self, *args, **kwargs):
+        if getattr(self, self.slug_field):
+            return super().save(*args, **kwargs)
+
+        model = type(self)
+        using = kwargs.get('using') or router.db_for_write(model, instance=self)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], self.slug_field}
+        for attempt in range(SLUG_ATTEMPTS):
+            slug = unique_slug(model, self.slug_source(), self.slug_field, using)
+            setattr(self, self.slug_field, slug)
+            try:
+                with transaction.atomic(using=using):
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                setattr(self, self.slug_field, '')
+                taken = model._default_manager.db_manager(using).filter(**{self.slug_field: slug}).exists()
+                if not taken or attempt == SLUG_ATTEMPTS - 1:
+                    raise
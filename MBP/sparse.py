@@ -0,0 +1,198 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.serializers import BaseSerializer, ListSerializer
+from .permissions import has_model_permission
+
+_serializers_by_model = {}
+
+
+def serializer_for_model(model):
+    """
+    (serializer, permission model name) of the ProtectedModelViewSet registered
+    for model, used to expand relations; None when there is none.
+    """
+    if not _serializers_by_model:
+        from .views import ProtectedModelViewSet
+
+        pending = list(ProtectedModelViewSet.__subclasses__())
+        while pending:
+            view = pending.pop(0)
+            pending.extend(view.__subclasses__())
+            serializer_class = getattr(view, 'serializer_class', None)
+            meta = getattr(serializer_class, 'Meta', None)
+            if meta is not None and getattr(meta, 'model', None) is not None:
+                _serializers_by_model.setdefault(
+                    meta.model, (serializer_class, getattr(view, 'model_name', None) or meta.model.__name__)
+                )
+    return _serializers_by_model.get(model)
+
+
+def split_param(value):
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+def forward_relation(model, name):
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    if field.concrete and (field.many_to_one or field.one_to_one):
+        return field
+    return None
+
+
+def projection(fields, model, prefix=''):
+    """
+    Columns and select_related paths the given serializer fields read, or None
+    when a field reads something that cannot be told from its source (source='*',
+    model properties and methods, SerializerMethodField).
+    """
+    columns, related = set(), set()
+    for field in fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*':
+            return None
+        attrs = field.source_attrs
+        try:
+            model_field = model._meta.get_field(attrs[0])
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete:
+            # Reverse relations and many-to-many only need the primary key
+            continue
+
+        columns.add(attrs[0])
+        if not model_field.is_relation:
+            continue
+
+        # A primary key field reads the FK column; anything else needs the related row
+        if isinstance(field, PrimaryKeyRelatedField) and len(attrs) == 1:
+            continue
+        path, current = prefix + attrs[0], model_field.related_model
+        related.add(path)
+        for attr in attrs[1:]:
+            step = forward_relation(current, attr)
+            if step is None:
+                break
+            path, current = f'{path}__{attr}', step.related_model
+            related.add(path)
+
+        if isinstance(field, BaseSerializer) and not isinstance(field, ListSerializer) and len(attrs) == 1:
+            nested = projection(field.fields, model_field.related_model, prefix=f'{path}__')
+            if nested is not None:
+                related |= nested[1]
+    return columns, related
+
+
+class SparseFieldsMixin:
+    """
+    ?fields=id,name,slug limits the representation to those fields and
+    ?expand=brand,category renders the named relations with the related model's
+    serializer instead of a string or primary key. Expanding needs read
+    permission on the related model, as listing it would.
+
+    On reads the queryset is narrowed to match: only() the columns the remaining
+    fields read and select_related() the relations they traverse, so unrequested
+    columns are never loaded. Writes validate and respond with the full serializer.
+    """
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def sparse_fieldset(self):
+        """(fields, expand) requested for this read, or (None, []) when not applicable."""
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return None, []
+        params = request.query_params
+        fields = split_param(params.get(self.fields_query_param)) or None
+        return fields, split_param(params.get(self.expand_query_param))
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields, expand = self.sparse_fieldset()
+        if fields or expand:
+            self.apply_fieldset(getattr(serializer, 'child', serializer), fields, expand)
+        return serializer
+
+    def apply_fieldset(self, serializer, fields, expand):
+        model = serializer.Meta.model
+        readable = {name for name, field in serializer.fields.items() if not field.write_only}
+
+        errors, denied = {}, []
+        for name in expand:
+            registered = None
+            relation = forward_relation(model, name)
+            if relation is not None:
+                registered = serializer_for_model(relation.related_model)
+            if registered is None:
+                errors.setdefault(self.expand_query_param, []).append(f'Cannot expand "{name}".')
+                continue
+            related_serializer, model_name = registered
+            if not self.may_expand(model_name):
+                denied.append(name)
+                continue
+            serializer.fields[name] = related_serializer(read_only=True)
+            readable.add(name)
+        if denied:
+            raise PermissionDenied(f"You do not have permission to expand {', '.join(denied)}.")
+
+        if fields:
+            unknown = [name for name in fields if name not in readable]
+            if unknown:
+                errors.setdefault(self.fields_query_param, []).append(f"Unknown field(s): {', '.join(unknown)}.")
+            keep = set(fields) | set(expand)
+            for name in list(serializer.fields):
+                if name not in keep:
+                    serializer.fields.pop(name)
+        if errors:
+            raise ValidationError(errors)
+
+    def may_expand(self, model_name):
+        # Checked once per request and model: get_serializer runs several times per read
+        checked = self.__dict__.setdefault('_expand_permissions', {})
+        if model_name not in checked:
+            checked[model_name] = has_model_permission(self.request, model_name, 'r')
+        return checked[model_name]
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields, expand = self.sparse_fieldset()
+        if not fields and not expand:
+            return queryset
+        return self.project_queryset(queryset)
+
+    def project_queryset(self, queryset):
+        serializer = self.get_serializer()
+        plan = projection(serializer.fields, queryset.model)
+        if plan is None:
+            return queryset
+        columns, related = plan
+        model = queryset.model
+
+        # Keep what pagination, lookups and ETags read even when not rendered
+        ordering = list(queryset.query.order_by or model._meta.ordering or ())
+        ordering += list(getattr(self, 'keyset_ordering', None) or ())
+        for item in ordering:
+            if not isinstance(item, str):
+                continue
+            parts = item.lstrip('-+').split('__')
+            if parts[0] != 'pk':
+                columns.add(parts[0])
+            if len(parts) > 1 and forward_relation(model, parts[0]):
+                related.add(parts[0])
+        for name in ('created_at', 'updated_at', self.lookup_field):
+            try:
+                if model._meta.get_field(name).concrete:
+                    columns.add(name)
+            except FieldDoesNotExist:
+                pass
+        for lookup in queryset._prefetch_related_lookups:
+            first = getattr(lookup, 'prefetch_through', lookup).split('__')[0]
+            if forward_relation(model, first):
+                columns.add(first)
+
+        if self.fields_query_param in self.request.query_params:
+            queryset = queryset.select_related(None).only(model._meta.pk.name, *columns)
+        return queryset.select_related(*related) if related else queryset
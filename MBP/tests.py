@@ -1,3 +1,784 @@
-from django.test import TestCase
+import base64
+import gzip
+import json
+import os
+import tempfile
+import threading
+import uuid
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from accounts.models import User, UserRole
+from catalog.models import Brand, Category, Product
+from .models import AppModel, AuditLog, PermissionType, Role, RoleModelPermission
+from .archive import AuditArchive
+from .buffer import BufferedWriter
+from .bulk import has_stock_save
+from .checks import replica_cache
+from .db_router import routing_scope
+from .middleware import CompressionMiddleware, QueryStatsMiddleware, brotli
+from .permissions import PermissionMatrix, permission_matrix
+from .querystats import query_stats
+from .renderers import FastJSONParser, FastJSONRenderer, orjson
+from .slugs import allocate_slugs, assign_unique_slugs, unique_slug
+from .utils import audit_update_data, diff_snapshots
+
+
+# Audit rows are written inside the request, so the test database sees them
+UNBUFFERED_AUDIT_LOG = {**settings.AUDIT_LOG, 'BUFFERED': False}
+
+
+def version_ttl_passed():
+    # Other workers re-read the shared version once their VERSION_TTL has passed
+    return override_settings(PERMISSION_MATRIX={'VERSION_TTL': 0})
+
+
+class PermissionMatrixTests(TestCase):
+    def setUp(self):
+        self.product = AppModel.objects.create(name='Product', verbose_name='Product', app_label='catalog')
+        self.read = PermissionType.objects.create(name='Read', code='r')
+        self.role = Role.objects.create(name='Editor')
+        self.grant = RoleModelPermission.objects.create(role=self.role, model=self.product, permission_type=self.read)
+        self.user = User.objects.create_user(email='editor@example.com', password='pw')
+        UserRole.objects.create(user=self.user, role=self.role)
+
+    def test_revocation_reaches_other_workers(self):
+        # A second matrix stands in for another process: it shares nothing with this one but the database
+        other_worker = PermissionMatrix()
+        self.assertTrue(other_worker.has_permission(self.user, 'Product', 'r'))
+
+        self.grant.delete()
+
+        # This process applies its own change at once, another worker within VERSION_TTL
+        self.assertFalse(permission_matrix.has_permission(self.user, 'Product', 'r'))
+        self.assertTrue(other_worker.has_permission(self.user, 'Product', 'r'))
+        with version_ttl_passed():
+            self.assertFalse(other_worker.has_permission(self.user, 'Product', 'r'))
+
+    def test_user_role_change_reaches_other_workers(self):
+        viewer = Role.objects.create(name='Viewer')
+        other_worker = PermissionMatrix()
+        self.assertTrue(other_worker.has_permission(self.user, 'Product', 'r'))
+
+        user_role = UserRole.objects.get(user=self.user)
+        user_role.role = viewer
+        user_role.save()
+
+        with version_ttl_passed():
+            self.assertFalse(other_worker.has_permission(self.user, 'Product', 'r'))
+
+    def test_unchanged_version_serves_from_memory(self):
+        permission_matrix.has_permission(self.user, 'Product', 'r')
+        # Within VERSION_TTL not even the version row is read
+        with self.assertNumQueries(0):
+            self.assertTrue(permission_matrix.has_permission(self.user, 'Product', 'r'))
+        with version_ttl_passed(), self.assertNumQueries(1):
+            self.assertTrue(permission_matrix.has_permission(self.user, 'Product', 'r'))
+
+
+class PermissionClaimTests(TestCase):
+    def setUp(self):
+        self.product = AppModel.objects.create(name='Product', verbose_name='Product', app_label='catalog')
+        self.read = PermissionType.objects.create(name='Read', code='r')
+        self.role = Role.objects.create(name='Editor')
+        self.grant = RoleModelPermission.objects.create(role=self.role, model=self.product, permission_type=self.read)
+        self.user = User.objects.create_user(email='editor@example.com', password='pw')
+        self.user_role = UserRole.objects.create(user=self.user, role=self.role)
+        self.role.refresh_from_db()
+        self.claims = permission_matrix.permission_claims(self.role.pk)
+
+    def check(self, matrix=permission_matrix):
+        return matrix.has_permission_from_claims(self.claims, self.user, 'Product', 'r')
+
+    def test_fresh_claims_authorize(self):
+        self.assertIs(self.check(), True)
+        with self.assertNumQueries(0):
+            self.assertIs(self.check(), True)
+        self.assertIs(permission_matrix.has_permission_from_claims(self.claims, self.user, 'Product', 'd'), False)
+
+    def test_revoked_permission_makes_claims_stale(self):
+        other_worker = PermissionMatrix()
+        self.assertIs(self.check(other_worker), True)
+        self.grant.delete()
+        with version_ttl_passed():
+            self.assertIsNone(self.check(other_worker))
+
+    def test_changed_user_role_makes_claims_stale(self):
+        other_worker = PermissionMatrix()
+        self.assertIs(self.check(other_worker), True)
+        self.user_role.role = Role.objects.create(name='Viewer')
+        self.user_role.save()
+        with version_ttl_passed():
+            self.assertIsNone(self.check(other_worker))
+
+    def test_removed_user_role_makes_claims_stale(self):
+        other_worker = PermissionMatrix()
+        self.assertIs(self.check(other_worker), True)
+        self.user_role.delete()
+        with version_ttl_passed():
+            self.assertIsNone(self.check(other_worker))
+            self.assertFalse(other_worker.has_permission(self.user, 'Product', 'r'))
+
+    def test_role_version_moves_before_the_matrix_version(self):
+        # A worker recompiling on the new matrix version must not read the old role version
+        seen = []
+        invalidate = PermissionMatrix.invalidate
+
+        def record(matrix):
+            seen.append(Role.objects.get(pk=self.role.pk).permissions_version)
+            invalidate(matrix)
+
+        with mock.patch.object(PermissionMatrix, 'invalidate', record):
+            self.grant.delete()
+        self.assertEqual(seen, [self.role.permissions_version + 1])
+
+
+class PermissionTokenTests(APITestCase):
+    def setUp(self):
+        brand = AppModel.objects.create(name='Brand', verbose_name='Brand', app_label='catalog')
+        read = PermissionType.objects.create(name='Read', code='r')
+        role = Role.objects.create(name='Catalog reader')
+        self.grant = RoleModelPermission.objects.create(role=role, model=brand, permission_type=read)
+        user = User.objects.create_user(email='reader@example.com', password='pw', is_active=True)
+        UserRole.objects.create(user=user, role=role)
+
+        response = self.client.post('/api/login/', {'email': 'reader@example.com', 'password': 'pw'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}")
+
+    def test_revoked_permission_rejects_an_old_token(self):
+        self.assertEqual(self.client.get('/api/brands/').status_code, 200)
+        self.grant.delete()
+        self.assertEqual(self.client.get('/api/brands/').status_code, 403)
+
+
+class KeysetCursorTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_superuser('admin@example.com', 'pw'))
+        for number in range(3):
+            AuditLog.objects.create(action='other', details=f'entry {number}')
+
+    def cursor(self, payload):
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    def get(self, payload, **params):
+        return self.client.get('/api/logs/', {'cursor': self.cursor(payload), **params})
+
+    def test_next_link_round_trips(self):
+        first = self.client.get('/api/logs/', {'page_size': 2}).json()
+        self.assertEqual(len(first['results']), 2)
+        second = self.client.get(first['next']).json()
+        self.assertEqual([row['details'] for row in second['results']], ['entry 0'])
+
+    def test_tampered_cursors_are_not_found(self):
+        timestamp = '2024-01-01T00:00:00+00:00'
+        payloads = [
+            {'v': [timestamp, 1], 'r': 0},                                  # no ordering signature
+            {'v': [timestamp, 1], 'r': 0, 'o': ['-id']},                    # another ordering
+            {'v': ['garbage', 'x'], 'r': 0, 'o': ['-timestamp', '-id']},
+            {'v': ['2024-13-01', 1], 'r': 0, 'o': ['-timestamp', '-id']},
+            {'v': [timestamp, 'x'], 'r': 0, 'o': ['-timestamp', '-id']},
+            {'v': [5, 1], 'r': 0, 'o': ['-timestamp', '-id']},
+            {'v': [[timestamp], 1], 'r': 0, 'o': ['-timestamp', '-id']},
+            {'v': [None, 1], 'r': 0, 'o': ['-timestamp', '-id']},           # timestamp is not nullable
+            {'v': [timestamp], 'r': 0, 'o': ['-timestamp', '-id']},
+        ]
+        for payload in payloads:
+            response = self.get(payload)
+            self.assertEqual(response.status_code, 404, payload)
+            self.assertEqual(response.json()['detail'], 'Invalid cursor')
+
+    def test_archive_continuation_uses_cleaned_cursor(self):
+        # A bare date is a valid timestamp key: midnight, also as the archive boundary
+        response = self.get({'v': ['2024-1-1', 1], 'r': 0, 'o': ['-timestamp', '-id']}, include_archived='true')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='reader@example.com', password='pw')
+
+    def test_model_writes_pin_the_request(self):
+        with routing_scope() as routing:
+            self.user.full_name = 'Reader'
+            self.user.save()
+        self.assertTrue(routing.wrote)
+
+    def test_queryset_writes_pin_the_request(self):
+        with routing_scope() as routing:
+            User.objects.filter(pk=self.user.pk).update(full_name='Reader')
+        self.assertTrue(routing.wrote)
+
+        with routing_scope() as routing:
+            Brand.objects.bulk_create([Brand(name='Acme', slug='acme')])
+        self.assertTrue(routing.wrote)
+
+    def test_no_receiver_on_every_model(self):
+        # Writes are seen by the router; models without receivers keep fast deletes
+        for signal in (post_save, post_delete, m2m_changed):
+            self.assertFalse(signal.has_listeners(Session))
+
+    def test_bookkeeping_writes_do_not(self):
+        with routing_scope() as routing:
+            Session.objects.create(session_key='k' * 32, session_data='', expire_date=timezone.now())
+            AuditLog.objects.create(action='other', details='read')
+            User.objects.filter(pk=self.user.pk).exists()
+        self.assertFalse(routing.wrote)
+
+    @override_settings(DATABASE_REPLICAS={'REPLICAS': ['replica1']})
+    def test_replicas_need_a_shared_pin_cache(self):
+        self.assertEqual([error.id for error in replica_cache(None)], ['MBP.E001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(replica_cache(None), [])
+
+    def test_no_replicas_no_requirement(self):
+        self.assertEqual(replica_cache(None), [])
+
+
+class ResponseCacheBackendTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_superuser('admin@example.com', 'pw'))
+
+    def test_off_on_a_per_process_cache(self):
+        self.client.get('/api/attributes/')
+        self.assertNotIn('X-Cache', self.client.get('/api/attributes/'))
+
+    def test_on_with_a_shared_cache(self):
+        shared = {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': tempfile.mkdtemp(prefix='mbp-tests-'),
+        }}
+        with override_settings(CACHES=shared):
+            cache.clear()
+            self.assertEqual(self.client.get('/api/attributes/')['X-Cache'], 'MISS')
+            self.assertEqual(self.client.get('/api/attributes/')['X-Cache'], 'HIT')
+
+
+class BulkPermissionTests(APITestCase):
+    def setUp(self):
+        self.brand_model = AppModel.objects.create(name='Brand', verbose_name='Brand', app_label='catalog')
+        self.role = Role.objects.create(name='Catalog clerk')
+        self.grant('r')
+        user = User.objects.create_user(email='clerk@example.com', password='pw')
+        UserRole.objects.create(user=user, role=self.role)
+        self.client.force_authenticate(user)
+        self.acme = Brand.objects.create(name='Acme')
+
+    def grant(self, code):
+        permission_type = PermissionType.objects.get_or_create(code=code, defaults={'name': code})[0]
+        RoleModelPermission.objects.create(role=self.role, model=self.brand_model, permission_type=permission_type)
+
+    def create(self):
+        return self.client.post('/api/brands/bulk/', [{'name': 'Globex'}, {'name': 'Initech'}], format='json')
+
+    def update(self):
+        return self.client.patch('/api/brands/bulk/', [{'slug': self.acme.slug, 'name': 'Acme Corp'}], format='json')
+
+    def delete(self):
+        return self.client.delete('/api/brands/bulk/', [self.acme.slug], format='json')
+
+    def test_read_permission_allows_no_bulk_write(self):
+        for response in (self.create(), self.update(), self.delete()):
+            self.assertEqual(response.status_code, 403)
+        self.assertEqual(list(Brand.objects.values_list('name', flat=True)), ['Acme'])
+
+    def test_create_needs_c(self):
+        self.grant('c')
+        self.assertEqual(self.create().status_code, 201)
+        self.assertEqual(Brand.objects.count(), 3)
+        self.assertEqual(self.update().status_code, 403)
+        self.assertEqual(self.delete().status_code, 403)
+
+    def test_update_needs_u(self):
+        self.grant('u')
+        self.assertEqual(self.create().status_code, 403)
+        self.assertEqual(self.update().status_code, 200)
+        self.assertEqual(Brand.objects.get(pk=self.acme.pk).name, 'Acme Corp')
+
+    def test_delete_needs_d(self):
+        self.grant('d')
+        self.assertEqual(self.update().status_code, 403)
+        self.assertEqual(self.delete().json(), {'deleted': 1})
+        self.assertFalse(Brand.objects.exists())
+
+
+class UniqueSlugTests(TestCase):
+    def setUp(self):
+        for slug in ('t-shirt', 't-shirt-12', 't-shirt-pro'):
+            Product.objects.create(name='T-Shirt', slug=slug)
+
+    def test_save_continues_after_the_highest_suffix(self):
+        self.assertEqual(Product.objects.create(name='T-Shirt').slug, 't-shirt-13')
+        self.assertEqual(Product.objects.create(name='T-Shirt Pro').slug, 't-shirt-pro-1')
+        self.assertEqual(Product.objects.create(name='Mug').slug, 'mug')
+
+    def test_bulk_allocation(self):
+        products = [
+            Product(name='T-Shirt'), Product(name='Mug'), Product(name='T-Shirt'), Product(name='Kept', slug='kept'),
+        ]
+        with self.assertNumQueries(1):
+            assign_unique_slugs(products)
+        self.assertEqual([product.slug for product in products], ['t-shirt-13', 'mug', 't-shirt-14', 'kept'])
+
+    def test_bare_base_and_numbered_copy_in_one_batch(self):
+        Product.objects.create(name='Lamp')
+        self.assertEqual(allocate_slugs(Product, ['Lamp 1', 'Lamp']), ['lamp-1', 'lamp-2'])
+
+    def test_slug_taken_by_a_concurrent_writer_is_reallocated(self):
+        allocated = []
+
+        def racing(*args, **kwargs):
+            # The first allocation loses the race: another writer has just inserted its slug
+            allocated.append(unique_slug(*args, **kwargs))
+            return 't-shirt-12' if len(allocated) == 1 else allocated[-1]
+
+        with mock.patch('MBP.slugs.unique_slug', racing):
+            product = Product.objects.create(name='T-Shirt')
+        self.assertEqual(len(allocated), 2)
+        self.assertEqual(product.slug, 't-shirt-13')
+
+    def test_other_integrity_errors_are_not_retried(self):
+        Product.objects.create(name='Lamp', sku='LAMP-1')
+        with mock.patch('MBP.slugs.unique_slug', wraps=unique_slug) as allocate:
+            with self.assertRaises(IntegrityError):
+                Product.objects.create(name='Lamp', sku='LAMP-1')
+        self.assertEqual(allocate.call_count, 1)
+
+
+@override_settings(AUDIT_LOG=UNBUFFERED_AUDIT_LOG)
+class IfMatchTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_superuser('admin@example.com', 'pw'))
+        self.acme = Brand.objects.create(name='Acme', description='Lamps', website='https://acme.example.com')
+        self.path = f'/api/brands/{self.acme.slug}/'
+        self.etag = self.client.get(self.path)['ETag']
+
+    def patch(self, etag, **data):
+        return self.client.patch(self.path, data or {'name': 'Acme Corp'}, format='json', HTTP_IF_MATCH=etag)
+
+    def test_fresh_etag_updates(self):
+        response = self.patch(self.etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], self.etag)
+        # The response's ETag is the one the next write must carry
+        self.assertEqual(self.patch(response['ETag'], name='Acme Lighting').status_code, 200)
+
+    def test_stale_etag_is_refused(self):
+        self.assertEqual(self.patch(self.etag).status_code, 200)
+        response = self.patch(self.etag, name='Acme Lighting')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(Brand.objects.get(pk=self.acme.pk).name, 'Acme Corp')
+
+    def test_any_etag(self):
+        self.assertEqual(self.patch('*').status_code, 200)
+
+    def test_weak_etag_names_the_same_version(self):
+        # Compressed responses carry their ETag as W/"..."
+        self.assertEqual(self.patch('W/' + self.etag).status_code, 200)
+
+    def test_one_of_several_etags(self):
+        self.assertEqual(self.patch(f'"stale", {self.etag}').status_code, 200)
+
+    def test_delete(self):
+        self.assertEqual(self.client.delete(self.path, HTTP_IF_MATCH='"stale"').status_code, 412)
+        self.assertTrue(Brand.objects.filter(pk=self.acme.pk).exists())
+        self.assertEqual(self.client.delete(self.path, HTTP_IF_MATCH=self.etag).status_code, 204)
+        self.assertFalse(Brand.objects.filter(pk=self.acme.pk).exists())
+
+    def brand_updates(self, data):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.path, data, format='json')
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries if query['sql'].startswith('UPDATE "catalog_brand"')]
+
+    def test_only_changed_columns_are_written(self):
+        [update] = self.brand_updates({'name': 'Acme Corp', 'description': 'Lamps'})
+        assignments = update.split(' WHERE ')[0]
+        self.assertIn('"name"', assignments)
+        self.assertIn('"updated_at"', assignments)
+        for column in ('"description"', '"website"', '"slug"', '"created_at"'):
+            self.assertNotIn(column, assignments)
+
+    def test_unchanged_data_writes_nothing(self):
+        self.assertEqual(self.brand_updates({'name': 'Acme', 'description': 'Lamps'}), [])
+
+
+@override_settings(AUDIT_LOG=UNBUFFERED_AUDIT_LOG)
+class BulkWriteTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_superuser('admin@example.com', 'pw'))
+        self.acme = Brand.objects.create(name='Acme')
+        self.globex = Brand.objects.create(name='Globex')
+
+    def bulk(self, method, items, path='/api/brands/bulk/'):
+        return getattr(self.client, method)(path, items, format='json')
+
+    def names(self):
+        return list(Brand.objects.order_by('name').values_list('name', flat=True))
+
+    def test_create(self):
+        response = self.bulk('post', [{'name': 'Initech'}, {'name': 'Hooli', 'website': 'https://hooli.example.com'}])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row['slug'] for row in response.json()], ['initech', 'hooli'])
+        self.assertEqual(self.names(), ['Acme', 'Globex', 'Hooli', 'Initech'])
+        self.assertEqual(AuditLog.objects.filter(action='create', model_name='Brand').count(), 2)
+
+    def test_update(self):
+        response = self.bulk('patch', [
+            {'slug': self.acme.slug, 'name': 'Acme Corp'},
+            {'slug': self.globex.slug, 'description': 'Everything'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.names(), ['Acme Corp', 'Globex'])
+        self.assertEqual(Brand.objects.get(pk=self.globex.pk).description, 'Everything')
+
+        entry = AuditLog.objects.get(action='update', object_id=str(self.acme.pk))
+        self.assertEqual(set(entry.new_data), {'name', 'updated_at'})
+
+    def test_delete(self):
+        response = self.bulk('delete', [self.acme.slug, {'slug': self.globex.slug}])
+        self.assertEqual(response.json(), {'deleted': 2})
+        self.assertEqual(self.names(), [])
+        self.assertEqual(AuditLog.objects.filter(action='delete', model_name='Brand').count(), 2)
+
+    def test_validation_errors_are_keyed_by_position(self):
+        response = self.bulk('post', [{'name': 'Initech'}, {}, {'name': 'Acme'}])
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(errors[0], {})
+        self.assertEqual(list(errors[1]), ['name'])
+        self.assertEqual(list(errors[2]), ['name'])
+        self.assertEqual(self.names(), ['Acme', 'Globex'])
+
+    def test_unknown_missing_and_duplicate_keys(self):
+        response = self.bulk('patch', [
+            {'slug': self.acme.slug, 'name': 'Acme Corp'},
+            {'slug': 'nope', 'name': 'Nope'},
+            {'name': 'Keyless'},
+            {'slug': self.acme.slug, 'name': 'Again'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), [
+            {}, {'slug': ['Not found.']}, {'slug': ['This field is required.']}, {'slug': ['Duplicate item.']},
+        ])
+        self.assertEqual(self.bulk('delete', ['nope']).json(), [{'slug': ['Not found.']}])
+        self.assertEqual(self.names(), ['Acme', 'Globex'])
+
+    def test_conflict_rolls_back_the_batch(self):
+        response = self.bulk('post', [{'name': 'Initech'}, {'name': 'Hooli'}, {'name': 'Hooli'}])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.names(), ['Acme', 'Globex'])
+
+    def test_custom_save_falls_back_to_one_save_per_row(self):
+        self.assertTrue(has_stock_save(Brand))
+        self.assertFalse(has_stock_save(Category))
+
+        home = Category.objects.create(name='Home')
+        response = self.bulk('post', [
+            {'name': 'Lighting', 'parent_id': str(home.pk)}, {'name': 'Garden', 'parent_id': str(home.pk)},
+        ], path='/api/categories/bulk/')
+        self.assertEqual(response.status_code, 201, response.content)
+        # Category.save() computes the materialized path, which bulk_create would skip
+        for category in Category.objects.filter(parent=home):
+            self.assertEqual(category.path, home.path + category.path_segment)
+
+
+class RecordingWriter(BufferedWriter):
+    """A BufferedWriter that keeps its batches in memory."""
+
+    def __init__(self, **overrides):
+        super().__init__()
+        self.config = {'BUFFERED': True, 'BATCH_SIZE': 100, 'FLUSH_INTERVAL': 3600, 'MAX_QUEUE': 1000, **overrides}
+        self.batches = []
+        self.written_event = threading.Event()
+
+    def setting(self, name):
+        return self.config[name]
+
+    def write_batch(self, entries):
+        self.batches.append(list(entries))
+        self.written_event.set()
+
+
+class BufferedWriterTests(TestCase):
+    def setUp(self):
+        self.writer = RecordingWriter()
+        self.addCleanup(self.writer.shutdown)
+
+    def test_entries_are_queued_when_the_transaction_commits(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.writer.record('created')
+                self.assertEqual(self.writer.stats()['pending'], 0)
+        self.assertEqual(self.writer.stats()['pending'], 1)
+
+        self.writer.flush()
+        self.assertEqual(self.writer.batches, [['created']])
+        self.assertEqual(self.writer.stats(), {'pending': 0, 'written': 1, 'dropped': 0})
+
+    def test_rolled_back_entries_are_discarded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ZeroDivisionError), transaction.atomic():
+                self.writer.record('created')
+                1 / 0
+            with transaction.atomic():
+                self.writer.record('kept')
+        self.writer.flush()
+        self.assertEqual(self.writer.batches, [['kept']])
+
+    def test_full_batch_wakes_the_writer_thread(self):
+        self.writer.config['BATCH_SIZE'] = 2
+        with self.captureOnCommitCallbacks(execute=True):
+            self.writer.record_many(['a', 'b'])
+        self.assertTrue(self.writer.written_event.wait(5))
+        self.assertEqual(self.writer.batches, [['a', 'b']])
+
+    def test_entries_beyond_max_queue_are_dropped(self):
+        self.writer.config['MAX_QUEUE'] = 2
+        with self.captureOnCommitCallbacks(execute=True):
+            self.writer.record_many(['a', 'b', 'c'])
+        self.assertEqual(self.writer.stats(), {'pending': 2, 'written': 0, 'dropped': 1})
+
+    def test_unbuffered_writes_at_once(self):
+        self.writer.config['BUFFERED'] = False
+        self.writer.record('created')
+        self.assertEqual(self.writer.batches, [['created']])
+
+
+class AuditDeltaTests(APITestCase):
+    def test_diff_snapshots(self):
+        old = {'name': 'Acme', 'website': None, 'is_active': True}
+        new = {'name': 'Acme Corp', 'website': None, 'is_active': True}
+        self.assertEqual(diff_snapshots(old, new), ({'name': 'Acme'}, {'name': 'Acme Corp'}))
+        self.assertEqual(diff_snapshots(old, old), ({}, {}))
+        self.assertEqual(diff_snapshots(None, {'name': 'Acme'}), ({'name': None}, {'name': 'Acme'}))
+
+    def test_delta_setting(self):
+        old, new = {'name': 'Acme', 'slug': 'acme'}, {'name': 'Acme Corp', 'slug': 'acme'}
+        with override_settings(AUDIT_LOG={'DELTA': True}):
+            self.assertEqual(audit_update_data(old, new), ({'name': 'Acme'}, {'name': 'Acme Corp'}))
+            # Without a snapshot of the old row there is nothing to diff against
+            self.assertEqual(audit_update_data(None, new), (None, new))
+        with override_settings(AUDIT_LOG={'DELTA': False}):
+            self.assertEqual(audit_update_data(old, new), (old, new))
+
+    @override_settings(AUDIT_LOG=UNBUFFERED_AUDIT_LOG)
+    def test_update_through_the_api_stores_the_changed_fields(self):
+        self.client.force_authenticate(User.objects.create_superuser('admin@example.com', 'pw'))
+        acme = Brand.objects.create(name='Acme', description='Lamps')
+        response = self.client.patch(f'/api/brands/{acme.slug}/', {'name': 'Acme Corp', 'description': 'Lamps'},
+                                     format='json')
+        self.assertEqual(response.status_code, 200)
+
+        entry = AuditLog.objects.get(action='update', object_id=str(acme.pk))
+        self.assertEqual(set(entry.old_data), {'name', 'updated_at'})
+        self.assertEqual((entry.old_data['name'], entry.new_data['name']), ('Acme', 'Acme Corp'))
+
+
+class AuditArchiveTests(APITestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='mbp-archive-')
+        self.enterContext(override_settings(AUDIT_LOG={**settings.AUDIT_LOG, 'ARCHIVE_DIR': self.directory}))
+
+        self.alice = User.objects.create_user(email='alice@example.com', password='pw')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pw')
+        start = timezone.now() - timedelta(days=100)
+        for number in range(5):
+            entry = AuditLog.objects.create(
+                user=self.alice if number % 2 == 0 else self.bob,
+                action='update' if number < 3 else 'delete',
+                model_name='Brand' if number != 1 else 'Product',
+                details=f'old {number}',
+            )
+            AuditLog.objects.filter(pk=entry.pk).update(timestamp=start + timedelta(minutes=number))
+        for number in range(2):
+            AuditLog.objects.create(action='other', details=f'new {number}')
+
+        call_command('archive_audit_logs', days=90, block_rows=2, stdout=StringIO())
+        self.archive = AuditArchive(self.directory)
+
+    def details(self, rows):
+        return [row['details'] for row in rows]
+
+    def test_old_rows_move_into_a_segment(self):
+        self.assertEqual(list(AuditLog.objects.order_by('id').values_list('details', flat=True)), ['new 0', 'new 1'])
+        [index] = self.archive.segments()
+        self.assertEqual((index['rows'], len(index['blocks'])), (5, 3))
+
+    def test_query_newest_first_with_filters(self):
+        self.assertEqual(self.details(self.archive.query()), ['old 4', 'old 3', 'old 2', 'old 1', 'old 0'])
+        self.assertEqual(self.details(self.archive.query(user_ids=[self.bob.pk])), ['old 3', 'old 1'])
+        self.assertEqual(self.details(self.archive.query(model_name='Product')), ['old 1'])
+        self.assertEqual(self.details(self.archive.query(action='delete', user_ids=[self.alice.pk])), ['old 4'])
+        self.assertEqual(self.details(self.archive.query(user_ids=[])), [])
+
+    def test_before_returns_strictly_older_rows(self):
+        rows = list(self.archive.query())
+        self.assertEqual(self.details(self.archive.query(before=(rows[1]['timestamp'], rows[1]['id']))),
+                         ['old 2', 'old 1', 'old 0'])
+        self.assertEqual(self.details(self.archive.query(before=(rows[-1]['timestamp'], rows[-1]['id']))), [])
+
+    def test_log_pages_continue_into_the_archive(self):
+        self.client.force_authenticate(User.objects.create_superuser('admin@example.com', 'pw'))
+        first = self.client.get('/api/logs/', {'include_archived': 'true', 'page_size': 4}).json()
+        self.assertEqual(self.details(first['results']), ['new 1', 'new 0', 'old 4', 'old 3'])
+
+        second = self.client.get(first['next']).json()
+        self.assertEqual(self.details(second['results']), ['old 2', 'old 1', 'old 0'])
+        self.assertIsNone(second['next'])
+
+        filtered = self.client.get('/api/logs/', {'include_archived': 'true', 'user_email': 'bob@example.com'})
+        self.assertEqual(self.details(filtered.json()['results']), ['old 3', 'old 1'])
+
+
+@skipUnless(orjson, 'orjson is not installed')
+class FastJSONRendererTests(SimpleTestCase):
+    data = {
+        'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'price': Decimal('12.50'),
+        'at': datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc),
+        'local': datetime(2024, 5, 1, 12, 30, tzinfo=dt_timezone(timedelta(hours=5, minutes=30))),
+        'naive': datetime(2024, 5, 1, 12, 30),
+        'day': date(2024, 5, 1),
+        'time': time(9, 5),
+        'rows': [{'amount': Decimal('0.10'), 'lazy': gettext_lazy('Read')}],
+        'note': 'line\u2028break',
+    }
+
+    def test_output_matches_json_renderer(self):
+        rendered = FastJSONRenderer().render(self.data)
+        self.assertEqual(rendered, JSONRenderer().render(self.data))
+        self.assertEqual(json.loads(rendered)['id'], '12345678-1234-5678-1234-567812345678')
+        self.assertEqual(json.loads(rendered)['price'], 12.5)
+        self.assertEqual(json.loads(rendered)['at'], '2024-05-01T12:30:15.123456Z')
+        self.assertIn(b'\\u2028', rendered)
+
+    def test_indented_output_goes_through_json_renderer(self):
+        media_type = 'application/json; indent=2'
+        self.assertEqual(FastJSONRenderer().render(self.data, media_type), JSONRenderer().render(self.data, media_type))
+
+    def test_integers_beyond_64_bits(self):
+        self.assertEqual(FastJSONRenderer().render({'n': 2 ** 70}), b'{"n":1180591620717411303424}')
+
+    def test_parser(self):
+        parsed = FastJSONParser().parse(BytesIO('{"name": "Café", "rows": [1, 2]}'.encode()))
+        self.assertEqual(parsed, {'name': 'Café', 'rows': [1, 2]})
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"name":'))
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    body = b'{"name":"Lamp","price":"12.50"},' * 40   # 1320 bytes
+
+    def respond(self, content=None, accept='gzip, deflate', etag=None):
+        response = HttpResponse(self.body if content is None else content)
+        if etag:
+            response['ETag'] = etag
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_responses_under_1_kb_are_sent_as_is(self):
+        response = self.respond(self.body[:1023])
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(response.has_header('Vary'))
+
+    def test_gzip(self):
+        for content in (self.body[:1024], self.body):
+            response = self.respond(content)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+            self.assertEqual(int(response['Content-Length']), len(response.content))
+            self.assertEqual(gzip.decompress(response.content), content)
+
+    def test_strong_etag_is_weakened(self):
+        self.assertEqual(self.respond(etag='"abc"')['ETag'], 'W/"abc"')
+        self.assertEqual(self.respond(etag='W/"abc"')['ETag'], 'W/"abc"')
+        # Sent as is, the bytes are the ones the strong ETag names
+        self.assertEqual(self.respond(accept='identity', etag='"abc"')['ETag'], '"abc"')
+
+    def test_encodings_the_client_does_not_accept(self):
+        for accept in ('', 'identity', 'gzip;q=0', 'br;q=0, gzip;q=0'):
+            response = self.respond(accept=accept)
+            self.assertFalse(response.has_header('Content-Encoding'), accept)
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+            self.assertEqual(response.content, self.body)
+
+    def test_incompressible_content_is_sent_as_is(self):
+        content = os.urandom(2048)
+        response = self.respond(content, etag='"abc"')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual((response.content, response['ETag']), (content, '"abc"'))
+
+    def test_streaming_responses_are_gzipped(self):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='br, gzip')
+        response = CompressionMiddleware(lambda request: StreamingHttpResponse([self.body, self.body]))(request)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.body * 2)
+
+    @skipUnless(brotli, 'brotli is not installed')
+    def test_brotli_is_preferred(self):
+        response = self.respond(accept='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), self.body)
+
+
+class QueryStatsMiddlewareTests(TestCase):
+    def setUp(self):
+        query_stats.reset()
+        self.addCleanup(query_stats.reset)
+
+    def request(self, lookups, user=None):
+        def view(request):
+            for number in range(lookups):
+                User.objects.filter(email=f'user{number}@example.com').exists()
+            return HttpResponse('ok')
+
+        request = RequestFactory().get('/query-stats-test/')
+        request.user = user or AnonymousUser()
+        return QueryStatsMiddleware(view)(request)
+
+    @override_settings(QUERY_STATS={**settings.QUERY_STATS, 'SERVER_TIMING': True})
+    def test_server_timing(self):
+        timing = self.request(4)['Server-Timing']
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="4 queries", app;dur=[\d.]+$')
+
+    @override_settings(QUERY_STATS={**settings.QUERY_STATS, 'SERVER_TIMING': True, 'N_PLUS_ONE_THRESHOLD': 5})
+    def test_repeated_statements_are_flagged(self):
+        self.assertNotIn('n1;', self.request(4)['Server-Timing'])
+        self.assertIn('n1;desc="1 repeated statements, worst x5"', self.request(5)['Server-Timing'])
+
+        [row] = query_stats.snapshot()
+        self.assertEqual(row['endpoint'], 'GET /query-stats-test/')
+        self.assertEqual((row['requests'], row['queries_total'], row['n_plus_one_requests']), (2, 9, 1))
+        self.assertEqual(row['repeated_statements'][0]['count'], 5)
+
+    @override_settings(DEBUG=False)
+    def test_header_only_for_staff_by_default(self):
+        self.assertFalse(self.request(1).has_header('Server-Timing'))
+        self.assertTrue(self.request(1, User(email='staff@example.com', is_staff=True)).has_header('Server-Timing'))
+
+    @override_settings(QUERY_STATS={**settings.QUERY_STATS, 'ENABLED': False, 'SERVER_TIMING': True})
+    def test_disabled(self):
+        self.assertFalse(self.request(1).has_header('Server-Timing'))
+        self.assertEqual(query_stats.snapshot(), [])
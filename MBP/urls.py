@@ -1,6 +1,6 @@
 from rest_framework import routers
 from django.urls import path, include
-from .views import RoleViewSet, AppModelViewSet, PermissionTypeViewSet, RoleModelPermissionViewSet, AuditLogViewSet, RoleCategoryViewSet
+from .views import RoleViewSet, AppModelViewSet, PermissionTypeViewSet, RoleModelPermissionViewSet, AuditLogViewSet, RoleCategoryViewSet, QueryStatsView
 
 router = routers.DefaultRouter()
 router.register(r'role-categories', RoleCategoryViewSet, basename='role-categories')
@@ -11,5 +11,6 @@ router.register(r'role-permissions', RoleModelPermissionViewSet)
 router.register('logs', AuditLogViewSet, basename='auditlog')
 
 urlpatterns = [
+    path('api/query-stats/', QueryStatsView.as_view(), name='query-stats'),
     path('api/', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,34 +1,146 @@
 from .models import AuditLog
+from .audit import audit_sink, audit_setting
 from django.core.serializers.json import DjangoJSONEncoder
-from django.db.models.fields.files import FileField, ImageField
-from django.db.models import Model
+from django.db import models
+from django.db.models.fields.files import FileField
+from django.utils.http import quote_etag
+from functools import lru_cache
+import hashlib
 import json
-import uuid
-import datetime
 
-def serialize_instance(instance):
-    data = {}
-    for field in instance._meta.fields:
-        field_name = field.name
-        value = getattr(instance, field_name, None)
 
-        if isinstance(field, (FileField, ImageField)):
-            data[field_name] = value.url if value else None
+def _file_value(value):
+    return value.url if value else None
+
+
+def _str_value(value):
+    return str(value) if value is not None else None
+
 
-        elif isinstance(value, (uuid.UUID, datetime.datetime, datetime.date)):
-            data[field_name] = str(value)
+def _related_value(value):
+    return str(value) if value is not None else None
 
-        elif isinstance(value, Model):
-            data[field_name] = str(value)
 
+def _raw_value(value):
+    return value
+
+
+def _coerced_value(value):
+    try:
+        json.dumps(value, cls=DjangoJSONEncoder)
+        return value
+    except (TypeError, ValueError):
+        return str(value)
+
+
+STR_FIELDS = (
+    models.UUIDField, models.DateTimeField, models.DateField, models.TimeField,
+    models.DecimalField, models.DurationField,
+)
+RAW_FIELDS = (
+    models.CharField, models.TextField, models.IntegerField, models.FloatField,
+    models.BooleanField, models.JSONField, models.GenericIPAddressField,
+)
+
+
+@lru_cache(maxsize=None)
+def field_plan(model):
+    """Per-model list of (field name, converter) used to snapshot instances for the audit log."""
+    plan = []
+    for field in model._meta.fields:
+        if isinstance(field, FileField):
+            converter = _file_value
+        elif field.is_relation:
+            converter = _related_value
+        elif isinstance(field, STR_FIELDS):
+            converter = _str_value
+        elif isinstance(field, RAW_FIELDS):
+            converter = _raw_value
         else:
-            try:
-                json.dumps(value, cls=DjangoJSONEncoder)
-                data[field_name] = value
-            except (TypeError, ValueError):
-                data[field_name] = str(value)
+            converter = _coerced_value
+        plan.append((field.name, converter))
+    return tuple(plan)
+
+
+def serialize_instance(instance):
+    return {
+        field_name: converter(getattr(instance, field_name, None))
+        for field_name, converter in field_plan(type(instance))
+    }
+
 
-    return data
+def loaded_values(instance):
+    """Concrete column values currently loaded on the instance (deferred fields are skipped)."""
+    return {
+        field.attname: instance.__dict__[field.attname]
+        for field in instance._meta.concrete_fields
+        if field.attname in instance.__dict__
+    }
+
+
+def changed_fields(instance, loaded):
+    """
+    Names of the concrete fields whose value differs from loaded, plus the
+    auto_now fields when anything changed. This is the update_fields list for a save.
+    """
+    concrete = instance._meta.concrete_fields
+    changed = [
+        field.name for field in concrete
+        if not field.primary_key and field.attname in loaded
+        and getattr(instance, field.attname) != loaded[field.attname]
+    ]
+    if changed:
+        changed += [field.name for field in concrete if getattr(field, 'auto_now', False) and field.name not in changed]
+    return changed
+
+
+def save_changed_fields_only(instance):
+    """
+    Make the next save() of instance write only the columns changed from now on.
+    A save with nothing changed writes nothing and sends no signals.
+    """
+    loaded = loaded_values(instance)
+    model_save = instance.save
+
+    def save(*args, **kwargs):
+        del instance.save
+        if not args and 'update_fields' not in kwargs and not instance._state.adding:
+            kwargs['update_fields'] = changed_fields(instance, loaded)
+        return model_save(*args, **kwargs)
+
+    instance.save = save
+
+
+def instance_etag(instance, related=()):
+    """
+    Strong ETag derived from updated_at, or None for models without one.
+    related (e.g. generations of the models the representation reads) is
+    folded in, so the ETag also moves when those change.
+    """
+    updated_at = getattr(instance, 'updated_at', None)
+    if updated_at is None:
+        return None
+    key = f"{instance._meta.label}:{instance.pk}:{updated_at.isoformat()}"
+    if related:
+        key += ':' + json.dumps(related, default=str)
+    return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+
+def diff_snapshots(old_data, new_data):
+    """Return (old, new) restricted to the fields whose value changed."""
+    old_data = old_data or {}
+    changed = [name for name, value in new_data.items() if old_data.get(name) != value]
+    return (
+        {name: old_data.get(name) for name in changed},
+        {name: new_data[name] for name in changed},
+    )
+
+
+def audit_update_data(old_data, new_data):
+    """Snapshots to store for an update, reduced to changed fields when AUDIT_LOG['DELTA'] is on."""
+    if old_data is not None and audit_setting('DELTA'):
+        return diff_snapshots(old_data, new_data)
+    return old_data, new_data
 
 
 def get_client_ip(request):
@@ -41,7 +153,7 @@ def get_user_agent(request):
 def log_audit(request, action, model_name=None, object_id=None, details=None, old_data=None, new_data=None):
     print(f"3.1 Calling log_audit_from_user for {model_name}, action: {action}")
     try:
-        AuditLog.objects.create(
+        audit_sink.record(AuditLog(
             user=request.user if request and request.user.is_authenticated else None,
             action=action,
             model_name=model_name,
@@ -51,14 +163,14 @@ def log_audit(request, action, model_name=None, object_id=None, details=None, ol
             new_data=new_data,
             ip_address=get_client_ip(request) if request else None,
             user_agent=get_user_agent(request) if request else None
-        )
+        ))
     except Exception as e:
         print("Failed to create audit log:", e)
 
 def log_audit_from_user(user, action, model_name=None, object_id=None, details=None, old_data=None, new_data=None):
     print(f"3.2 Calling log_audit_from_user for {model_name}, action: {action}")
     try:
-        AuditLog.objects.create(
+        audit_sink.record(AuditLog(
             user=user,
             action=action,
             model_name=model_name,
@@ -66,6 +178,24 @@ def log_audit_from_user(user, action, model_name=None, object_id=None, details=N
             details=details,
             old_data=old_data,
             new_data=new_data
-        )
+        ))
     except Exception as e:
         print("Failed to create audit log:", e)
+
+def log_audit_batch(user, action, model_name, changes):
+    """Record one entry per (object_id, details, old_data, new_data) with a single sink call."""
+    try:
+        audit_sink.record_many([
+            AuditLog(
+                user=user,
+                action=action,
+                model_name=model_name,
+                object_id=str(object_id) if object_id else None,
+                details=details,
+                old_data=old_data,
+                new_data=new_data
+            )
+            for object_id, details, old_data, new_data in changes
+        ])
+    except Exception as e:
+        print("Failed to create audit logs:", e)
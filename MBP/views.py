@@ -1,4 +1,8 @@
-from rest_framework import viewsets
+from rest_framework import status, viewsets
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from .permissions import HasModelPermission
 from .models import Role, AppModel, PermissionType, RoleModelPermission, AuditLog, RoleCategory
 from .serializers import (
@@ -9,14 +13,38 @@ from .serializers import (
     RoleModelPermissionSerializer,
     AuditLogSerializer
 )
-from .utils import serialize_instance
+from .utils import serialize_instance, save_changed_fields_only
+from .archive import audit_archive, format_timestamp
+from .pagination import KeysetPagination
+from .bulk import BulkModelMixin, BULK_PERMISSION_CODES, has_stock_save
+from .sparse import SparseFieldsMixin
+from .querystats import query_stats
+from .db_router import allow_replica_reads
+from .response_cache import ResponseCacheMixin, response_cache_stats
+from .conditional import ConditionalGetMixin, not_modified
+from contextlib import nullcontext
+from itertools import islice
+from django.db import transaction
+from django.utils.http import parse_etags
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+import uuid
 from django.db.models.signals import post_save
 
 
-class ProtectedModelViewSet(viewsets.ModelViewSet):
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The object was modified since it was fetched.'
+    default_code = 'precondition_failed'
+
+
+class ProtectedModelViewSet(ConditionalGetMixin, ResponseCacheMixin, SparseFieldsMixin, BulkModelMixin, viewsets.ModelViewSet):
     model_name = None
     permission_code = 'r'
     permission_classes = [HasModelPermission]
+    lock_object = False
+    # Read-only actions whose queries may go to a replica
+    replica_actions = ('list', 'retrieve')
 
     def get_permissions(self):
         if self.action == 'create':
@@ -25,25 +53,118 @@ class ProtectedModelViewSet(viewsets.ModelViewSet):
             self.permission_code = 'u'
         elif self.action == 'destroy':
             self.permission_code = 'd'
+        elif self.action == 'bulk':
+            self.permission_code = BULK_PERMISSION_CODES.get(self.request.method, 'r')
         else:
             self.permission_code = 'r'
         return [permission() for permission in self.permission_classes]
 
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Authenticated and permitted: the rest of a read may go to a replica
+        if self.action in self.replica_actions and request.method in ('GET', 'HEAD'):
+            allow_replica_reads(request.user)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.lock_object:
+            queryset = queryset.select_for_update(of=('self',))
+        return queryset
+
+    def check_if_match(self, instance):
+        """
+        Optimistic concurrency on updated_at: a write carrying If-Match is refused
+        with 412 unless the ETag still matches. The row is loaded with
+        select_for_update, so the check and the write see the same version.
+        """
+        # Compressed responses carry the ETag weakened (W/"..."); it names the same version
+        etags = [etag.removeprefix('W/') for etag in parse_etags(self.request.headers.get('If-Match', ''))]
+        if '*' in etags:
+            return
+        etag = self.object_etag(instance)
+        if etag is not None and etag not in etags:
+            raise PreconditionFailed()
+
+    def with_etag(self, response, instance):
+        etag = self.object_etag(instance)
+        return self.with_validators(response, etag, instance.updated_at if etag is not None else None)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, self.render_list, *args, **kwargs)
+
+    def render_list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        etag = last_modified = None
+        if self.uses_conditional_get(queryset.model):
+            etag, last_modified = self.list_validators(queryset)
+            response = not_modified(request, etag)
+            if response is not None:
+                return response
+
+        # ListModelMixin.list, on the queryset the validators were computed from
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        else:
+            response = Response(self.get_serializer(queryset, many=True).data)
+        return self.with_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, self.render_retrieve, *args, **kwargs)
+
+    def render_retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = self.object_etag(instance)
+        if etag is not None and self.uses_conditional_get(type(instance)):
+            response = not_modified(request, etag, instance.updated_at)
+            if response is not None:
+                return response
+        serializer = self.get_serializer(instance)
+        return self.with_validators(Response(serializer.data), etag, instance.updated_at if etag is not None else None)
+
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
+        self.lock_object = 'If-Match' in request.headers
+        with transaction.atomic() if self.lock_object else nullcontext():
+            instance = self.get_object()
+            if self.lock_object:
+                self.check_if_match(instance)
+            serializer = self.get_serializer(instance, data=request.data, partial=partial)
+            serializer.is_valid(raise_exception=True)
+            self.perform_update(serializer)
+
+        if getattr(instance, '_prefetched_objects_cache', None):
+            # prefetch_related caches on the instance are stale after the write
+            instance._prefetched_objects_cache = {}
+        return self.with_etag(Response(serializer.data), serializer.instance)
+
+    def destroy(self, request, *args, **kwargs):
+        self.lock_object = 'If-Match' in request.headers
+        with transaction.atomic() if self.lock_object else nullcontext():
+            instance = self.get_object()
+            if self.lock_object:
+                self.check_if_match(instance)
+            self.perform_destroy(instance)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     def perform_create(self, serializer):
         serializer.context['request'] = self.request
         instance = serializer.save()
         instance._request_user = self.request.user
-        post_save.send(sender=instance.__class__, instance=instance, created=True)
+        # Re-sent with the request user for the audit log; receivers get the same arguments as Model.save_base
+        post_save.send(sender=instance.__class__, instance=instance, created=True, update_fields=None,
+                       raw=False, using=instance._state.db)
         # instance.save()
 
     def perform_update(self, serializer):
-        instance = self.get_object()
+        # serializer.instance is the object DRF already loaded; it is saved once,
+        # and the audit receiver picks up _old_data and _request_user from that save
+        instance = serializer.instance
         instance._old_data = serialize_instance(instance)
         instance._request_user = self.request.user
-        updated_instance = serializer.save()
-        updated_instance._request_user = self.request.user
-        updated_instance._old_data = instance._old_data
-        updated_instance.save()
+        if has_stock_save(type(instance)):
+            save_changed_fields_only(instance)
+        serializer.save()
 
     def perform_destroy(self, instance):
         instance._request_user = self.request.user
@@ -86,19 +207,101 @@ class RoleModelPermissionViewSet(ProtectedModelViewSet):
 
 
 class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = AuditLog.objects.all().order_by('-timestamp')
+    queryset = AuditLog.objects.all().order_by('-timestamp', '-id')
     serializer_class = AuditLogSerializer
     model_name = 'AuditLog'
     permission_classes = [HasModelPermission]
     permission_code = 'r'  # read-only
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-timestamp', '-id')
+
+    def get_user_ids(self):
+        """
+        Resolve the user filters to user ids up front, so the log query runs on
+        the (user, timestamp) index instead of joining users. None means no filter.
+        """
+        params = self.request.query_params
+        User = get_user_model()
+
+        if params.get('user_id'):
+            try:
+                return [uuid.UUID(params['user_id'])]
+            except ValueError:
+                return []
+        if params.get('user_email'):
+            return list(User.objects.filter(email=params['user_email']).values_list('id', flat=True))
+        if params.get('user'):
+            return list(User.objects.filter(email__icontains=params['user']).values_list('id', flat=True))
+        return None
 
     def get_queryset(self):
         queryset = super().get_queryset()
-        user_email = self.request.query_params.get('user')
         action = self.request.query_params.get('action')
+        model_name = self.request.query_params.get('model_name')
 
-        if user_email:
-            queryset = queryset.filter(user__email__icontains=user_email)
+        if self.action == 'list':
+            user_ids = self.get_user_ids()
+            if user_ids is not None:
+                queryset = queryset.filter(user_id__in=user_ids)
         if action:
             queryset = queryset.filter(action=action)
+        if model_name:
+            queryset = queryset.filter(model_name=model_name)
         return queryset
+
+    def archive_boundary(self, values):
+        """A cursor's (timestamp, id), as cleaned by the paginator, in the form the archive compares."""
+        timestamp, row_id = values
+        if timezone.is_naive(timestamp):
+            # A bare date or naive time, read in the current time zone like the keyset filter does
+            timestamp = timezone.make_aware(timestamp)
+        return format_timestamp(timestamp), row_id
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        data = list(self.get_serializer(page, many=True).data)
+        paginator = self.paginator
+
+        if request.query_params.get('include_archived', '').lower() == 'true' \
+                and not paginator.reverse and not paginator.has_next:
+            # Archived rows are all older than the hot table, so they continue its last page
+            if page:
+                before = (format_timestamp(page[-1].timestamp), page[-1].id)
+            elif paginator.cursor_values:
+                before = self.archive_boundary(paginator.cursor_values)
+            else:
+                before = None
+
+            room = paginator.page_size - len(page)
+            archived = list(islice(audit_archive.query(
+                user_ids=self.get_user_ids(),
+                action=request.query_params.get('action'),
+                model_name=request.query_params.get('model_name'),
+                before=before,
+            ), room + 1))
+            paginator.has_next = len(archived) > room
+            archived = archived[:room]
+            if archived:
+                paginator.next_values = [archived[-1]['timestamp'], archived[-1]['id']]
+                if not page:
+                    paginator.has_previous = False
+            data += archived
+
+        return paginator.get_paginated_response(data)
+
+
+class QueryStatsView(APIView):
+    """
+    Staff-only read of this process's rolling SQL statistics per endpoint,
+    busiest first, and of the response cache counters. DELETE clears both.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({'endpoints': query_stats.snapshot(), 'response_cache': response_cache_stats.snapshot()})
+
+    def delete(self, request):
+        query_stats.reset()
+        response_cache_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -3,6 +3,7 @@ from django.db import models
 from django.utils.text import slugify
 from django.conf import settings
 from MBP.models import Role
+from MBP.slugs import UniqueSlugMixin
 import uuid
 
 class UserManager(BaseUserManager):
@@ -21,7 +22,7 @@ class UserManager(BaseUserManager):
         extra_fields.setdefault('is_active', True)
         return self.create_user(email, password, **extra_fields)
 
-class User(AbstractBaseUser, PermissionsMixin):
+class User(UniqueSlugMixin, AbstractBaseUser, PermissionsMixin):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     email = models.EmailField(unique=True)
     full_name = models.CharField(max_length=100, blank=True)
@@ -40,22 +41,14 @@ class User(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.email
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.full_name or self.email.split('@')[0])
-            slug = base_slug
-            count = 1
-            while User.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{count}"
-                count += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return self.full_name or self.email.split('@')[0]
 
     class Meta:
         verbose_name = "User"
         verbose_name_plural = "Users"
 
-class UserProfile(models.Model):
+class UserProfile(UniqueSlugMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,
@@ -80,17 +73,9 @@ class UserProfile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            # Generate slug from full_name if available, else from email
-            base_slug = slugify(self.user.full_name or self.user.email.split("@")[0])
-            slug_candidate = base_slug
-            counter = 1
-            while UserProfile.objects.filter(slug=slug_candidate).exists():
-                slug_candidate = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug_candidate
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        # Slug from full_name if available, else from email
+        return self.user.full_name or self.user.email.split("@")[0]
 
     def __str__(self):
         return f"Profile of {self.user.full_name or self.user.email}"
@@ -99,7 +84,7 @@ class UserProfile(models.Model):
         verbose_name = "User Profile"
         verbose_name_plural = "User Profiles"
 
-class UserRole(models.Model):
+class UserRole(UniqueSlugMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='user_role')
     role = models.ForeignKey("MBP.Role", on_delete=models.CASCADE)
@@ -113,16 +98,8 @@ class UserRole(models.Model):
         related_name='assigned_roles'
     )
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(f"{self.user.email}-{self.role.name}")
-            slug = base_slug
-            counter = 1
-            while UserRole.objects.filter(slug=slug).exclude(id=self.id).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return f"{self.user.email}-{self.role.name}"
 
     def __str__(self):
         return f"{self.user.email} → {self.role.name}"
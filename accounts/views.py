@@ -7,6 +7,7 @@ from accounts.models import UserRole, UserProfile, Address
 from accounts.serializers import UserSerializer, RegisterUserSerializer, UserRoleSerializer, UserProfileSerializer, AddressSerializer
 from rest_framework.views import APIView
 from MBP.utils import log_audit
+from MBP.permissions import add_permission_claims
 from MBP.views import ProtectedModelViewSet
 from django.contrib.auth import get_user_model
 
@@ -84,6 +85,10 @@ class LoginView(APIView):
                 return Response({"error": "Account is inactive."}, status=status.HTTP_403_FORBIDDEN)
 
             refresh = RefreshToken.for_user(user)
+            access = refresh.access_token
+            if user.is_superuser:
+                # Read by views that authorize from the token alone (TokenUser.is_superuser)
+                access['is_superuser'] = True
 
             log_audit(
                 request=request,
@@ -98,7 +103,8 @@ class LoginView(APIView):
             if hasattr(user, 'user_role') and user.user_role.role:
                 role = user.user_role.role
                 role_name = role.name
-                role_perms = RoleModelPermission.objects.filter(role=role)
+                add_permission_claims(access, role)
+                role_perms = RoleModelPermission.objects.filter(role=role).select_related('model', 'permission_type')
                 for rp in role_perms:
                     accessible_models.append({
                         "model_name": rp.model.name,
@@ -107,7 +113,7 @@ class LoginView(APIView):
 
             return Response({
                 "refresh": str(refresh),
-                "access": str(refresh.access_token),
+                "access": str(access),
                 "user": {
                     "id": str(user.id),
                     "email": user.email,
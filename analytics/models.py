@@ -1,11 +1,11 @@
 import uuid
 from django.db import models
-from django.utils.text import slugify
+from MBP.slugs import UniqueSlugMixin
 from accounts.models import User
 from catalog.models import Product
 
 
-class SearchQuery(models.Model):
+class SearchQuery(UniqueSlugMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     query = models.CharField(max_length=255, db_index=True)
     slug = models.SlugField(unique=True, blank=True)
@@ -18,21 +18,13 @@ class SearchQuery(models.Model):
         verbose_name = "Search Query"
         verbose_name_plural = "Search Queries"
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(f"{self.query}-{self.user_id or 'guest'}")
-            slug = base_slug
-            counter = 1
-            while SearchQuery.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return f"{self.query}-{self.user_id or 'guest'}"
 
     def __str__(self):
         return f"'{self.query}' by {self.user.email if self.user else 'Guest'}"
 
-class UserActivity(models.Model):
+class UserActivity(UniqueSlugMixin, models.Model):
     ACTION_VIEW = "view"
     ACTION_ADD_TO_CART = "add_to_cart"
     ACTION_PURCHASE = "purchase"
@@ -57,21 +49,13 @@ class UserActivity(models.Model):
         verbose_name = "User Activity"
         verbose_name_plural = "User Activities"
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(f"{self.user_id or 'guest'}-{self.product_id or 'na'}-{self.action}")
-            slug = base_slug
-            counter = 1
-            while UserActivity.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return f"{self.user_id or 'guest'}-{self.product_id or 'na'}-{self.action}"
 
     def __str__(self):
         return f"{self.user.email if self.user else 'Guest'} {self.action} {self.product or ''}"
 
-class Recommendation(models.Model):
+class Recommendation(UniqueSlugMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="recommendations", null=True, blank=True)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="recommendations")
@@ -85,16 +69,8 @@ class Recommendation(models.Model):
         verbose_name_plural = "Recommendations"
         unique_together = ("user", "product")
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(f"rec-{self.user_id or 'global'}-{self.product_id}")
-            slug = base_slug
-            counter = 1
-            while Recommendation.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return f"rec-{self.user_id or 'global'}-{self.product_id}"
 
     def __str__(self):
         return f"Recommendation: {self.product} → {self.user.email if self.user else 'Global'}"
@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def setup_search_index(sender, using, **kwargs):
+    from .models import Product
+    from .search import create_search_index, rebuild_search_index
+    if create_search_index(using) and Product.objects.using(using).exists():
+        rebuild_search_index(using)
 
 
 class CatalogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'catalog'
+
+    def ready(self):
+        import catalog.signals
+        post_migrate.connect(setup_search_index, sender=self)
@@ -0,0 +1,226 @@
+import heapq
+import os
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, Q, Sum
+from analytics.models import SearchQuery
+from orders.models import OrderItem
+from .models import Brand, Category, Product
+
+AUTOCOMPLETE_DEFAULTS = {
+    'ENABLED': True,
+    'REFRESH_INTERVAL': 300,    # seconds between background rebuilds
+    'LIMIT': 10,
+    'MAX_LIMIT': 50,
+    'MAX_WORDS': 4,             # a suggestion also matches from its 2nd..nth word on
+    'MIN_QUERY_COUNT': 2,       # searches suggested once made this often (with results)
+    'MAX_QUERIES': 10000,
+}
+
+# Entries pack (suggestion << OFFSET_BITS) | character offset of the word the key starts at
+OFFSET_BITS = 8
+OFFSET_MASK = (1 << OFFSET_BITS) - 1
+
+
+def autocomplete_setting(name):
+    return getattr(settings, 'AUTOCOMPLETE', {}).get(name, AUTOCOMPLETE_DEFAULTS[name])
+
+
+def normalize(text):
+    """Case-folded, accents stripped, whitespace collapsed: what keys and prefixes are compared as."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.casefold().split())
+
+
+def word_offsets(text, max_words):
+    offsets, position = [0], 0
+    while len(offsets) < max_words:
+        position = text.find(' ', position) + 1
+        if not position or position > OFFSET_MASK:
+            break
+        offsets.append(position)
+    return offsets
+
+
+class AutocompleteIndex:
+    """
+    An immutable prefix index over suggestion strings.
+
+    keys is a sorted array of packed entries, one per word start of every
+    suggestion, so the keys sharing a prefix are one contiguous range found
+    by bisection. A max segment tree over the weights in key order gives the
+    heaviest entry of any range in O(log n); the top k of a range are taken
+    by splitting it around each maximum, O(k log n) however many keys share
+    the prefix.
+    """
+
+    def __init__(self, suggestions, max_words):
+        # suggestions: (text, type, slug, weight); the heaviest of equal texts is kept
+        best = {}
+        for text, kind, slug, weight in suggestions:
+            key = normalize(text)
+            if key and (key not in best or weight > best[key][3]):
+                best[key] = (text, kind, slug, weight)
+
+        self.texts = list(best)
+        self.items = [{'text': text, 'type': kind, 'slug': slug} for text, kind, slug, _ in best.values()]
+        self.weights = array('q', (weight for _, _, _, weight in best.values()))
+
+        entries = [
+            (number << OFFSET_BITS) | offset
+            for number, text in enumerate(self.texts)
+            for offset in word_offsets(text, max_words)
+        ]
+        entries.sort(key=self.key)
+        self.keys = array('q', entries)
+
+        size = len(self.keys)
+        self.size = size
+        self.tree = array('q', [0]) * (2 * size)
+        for position in range(size):
+            self.tree[size + position] = position
+        for node in range(size - 1, 0, -1):
+            self.tree[node] = self.heavier(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def key(self, entry):
+        return self.texts[entry >> OFFSET_BITS][entry & OFFSET_MASK:]
+
+    def weight(self, position):
+        return self.weights[self.keys[position] >> OFFSET_BITS]
+
+    def heavier(self, a, b):
+        return a if self.weight(a) >= self.weight(b) else b
+
+    def heaviest(self, low, high):
+        """Position of the heaviest key in [low, high)."""
+        best = low
+        low, high = low + self.size, high + self.size
+        while low < high:
+            if low & 1:
+                best = self.heavier(best, self.tree[low])
+                low += 1
+            if high & 1:
+                high -= 1
+                best = self.heavier(best, self.tree[high])
+            low >>= 1
+            high >>= 1
+        return best
+
+    def complete(self, prefix, limit):
+        prefix = normalize(prefix)
+        if not prefix or not self.size:
+            return []
+        low = bisect_left(self.keys, prefix, key=self.key)
+        high = bisect_left(self.keys, prefix + '\U0010ffff', lo=low, key=self.key)
+
+        results, seen, ranges = [], set(), []
+
+        def push(start, end):
+            if start < end:
+                position = self.heaviest(start, end)
+                heapq.heappush(ranges, (-self.weight(position), position, start, end))
+
+        push(low, high)
+        while ranges and len(results) < limit:
+            _, position, start, end = heapq.heappop(ranges)
+            number = self.keys[position] >> OFFSET_BITS
+            # A suggestion can match at several of its words
+            if number not in seen:
+                seen.add(number)
+                results.append(self.items[number])
+            push(start, position)
+            push(position + 1, end)
+        return results
+
+
+def load_suggestions():
+    """
+    Active products weighted by units sold, brands and categories by their
+    active products, and searches that found something by how often they
+    were made. Returns (text, type, slug, weight) tuples.
+    """
+    visible = Q(is_active=True, status=Product.STATUS_PUBLISHED)
+    sold = dict(
+        OrderItem.objects.order_by().values_list('product_id').annotate(units=Sum('quantity'))
+    )
+    for pk, name, slug in Product.objects.filter(visible).values_list('pk', 'name', 'slug').iterator(chunk_size=5000):
+        yield name, 'product', slug, sold.get(pk) or 0
+
+    for model, kind in ((Brand, 'brand'), (Category, 'category')):
+        rows = model.objects.filter(is_active=True).annotate(
+            weight=Count('products', filter=Q(products__is_active=True, products__status=Product.STATUS_PUBLISHED))
+        ).values_list('name', 'slug', 'weight')
+        for name, slug, weight in rows:
+            yield name, kind, slug, weight
+
+    queries = (
+        SearchQuery.objects.filter(result_count__gt=0).order_by().values('query')
+        .annotate(times=Count('id')).filter(times__gte=autocomplete_setting('MIN_QUERY_COUNT'))
+        .order_by('-times').values_list('query', 'times')[:autocomplete_setting('MAX_QUERIES')]
+    )
+    for query, times in queries:
+        yield query, 'query', None, times
+
+
+class AutocompleteService:
+    """
+    The per-process index. It is built on the first request, then rebuilt
+    every REFRESH_INTERVAL seconds by a background thread and swapped in by
+    a single assignment, so lookups never wait for a rebuild or touch the
+    database.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._thread = None
+        self._pid = None
+
+    def rebuild(self):
+        self._index = AutocompleteIndex(load_suggestions(), autocomplete_setting('MAX_WORDS'))
+
+    def index(self):
+        index = self._index
+        if index is None or self._pid != os.getpid():
+            with self._lock:
+                if self._index is None:
+                    self.rebuild()
+                if self._pid != os.getpid():
+                    # First use in this process (or after a fork, which keeps the index but not the thread)
+                    self._pid = os.getpid()
+                    self._start_refresher()
+                index = self._index
+        return index
+
+    def _start_refresher(self):
+        thread = threading.Thread(target=self._run, name='autocomplete-refresher', daemon=True)
+        try:
+            thread.start()
+        except RuntimeError:
+            # Interpreter is shutting down; the index just stops refreshing
+            return
+        self._thread = thread
+
+    def _run(self):
+        while True:
+            time.sleep(autocomplete_setting('REFRESH_INTERVAL'))
+            try:
+                self.rebuild()
+            except Exception as e:
+                # Keep serving the previous index
+                print("Failed to rebuild the autocomplete index:", e)
+            finally:
+                close_old_connections()
+
+    def complete(self, prefix, limit):
+        return self.index().complete(prefix, limit)
+
+
+autocomplete = AutocompleteService()
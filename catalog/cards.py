@@ -0,0 +1,243 @@
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Avg, Count, Exists, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from MBP.response_cache import invalidate_responses
+from inventory.models import ProductPrice, Stock
+from promotions.models import Promotion
+from reviews.models import ProductReview
+from .models import Category, Product, ProductCard, ProductMedia, Variant
+
+CENT = Decimal('0.01')
+
+# Column groups of a card, each recomputed from its own sources
+PART_FIELDS = {
+    'product': [
+        'name', 'slug', 'sku', 'status', 'is_active', 'category_id', 'category_name', 'category_path',
+        'brand_id', 'brand_name', 'created_at',
+    ],
+    'pricing': ['min_price', 'max_price', 'currency', 'promotion_price', 'promotion_ends_at', 'refresh_at'],
+    'stock': ['available', 'in_stock'],
+    'media': ['image', 'image_alt'],
+    'rating': ['rating_average', 'review_count'],
+}
+PARTS = tuple(PART_FIELDS)
+
+
+def discounted(price, discount_type, value):
+    if discount_type == 'percentage':
+        price = price * (100 - value) / 100
+    else:
+        price = price - value
+    return max(price, Decimal('0')).quantize(CENT)
+
+
+def running_promotions(ids, using, now):
+    """product_id -> [(discount_type, value, starts, ends)] of its active promotions that have not ended."""
+    promotions = {}
+    for product_id, discount_type, value, starts, ends in Promotion.products.through.objects.using(using).filter(
+        product_id__in=ids, promotion__is_active=True, promotion__end_date__gt=now
+    ).values_list(
+        'product_id', 'promotion__discount_type', 'promotion__discount_value',
+        'promotion__start_date', 'promotion__end_date',
+    ):
+        promotions.setdefault(product_id, []).append((discount_type, value, starts, ends))
+    return promotions
+
+
+def apply_promotions(price, promotions, now):
+    """
+    (promotion price, when it ends, next boundary) of price under one product's
+    promotions: the lowest of the running ones, and when the next promotion
+    starts or ends.
+    """
+    promotion_price = ends_at = None
+    boundaries = []
+    for discount_type, value, starts, ends in promotions:
+        if starts > now:
+            boundaries.append(starts)
+            continue
+        boundaries.append(ends)
+        if price is not None:
+            candidate = discounted(price, discount_type, value)
+            if promotion_price is None or candidate < promotion_price:
+                promotion_price, ends_at = candidate, ends
+    return promotion_price, ends_at, min(boundaries, default=None)
+
+
+def load_pricing(cards, ids, using, now):
+    """
+    A variant's price is its active global ProductPrice, else the product's,
+    else Variant.price; products without variants take the product's price.
+    The promotion price is the lowest of the running promotions applied to
+    min_price; refresh_at is when the next promotion starts or ends.
+    """
+    prices = {}
+    for product_id, variant_id, price, currency in ProductPrice.objects.using(using).filter(
+        product_id__in=ids, is_active=True, warehouse__isnull=True
+    ).values_list('product_id', 'variant_id', 'price', 'currency'):
+        prices[product_id, variant_id] = (price, currency)
+
+    variant_prices = {}
+    for product_id, variant_id, price in Variant.objects.using(using).filter(
+        product_id__in=ids, is_active=True
+    ).values_list('product_id', 'pk', 'price'):
+        own = prices.get((product_id, variant_id)) or prices.get((product_id, None))
+        variant_prices.setdefault(product_id, []).append(own or (price, None))
+
+    promotions = running_promotions(ids, using, now)
+    for product_id, card in cards.items():
+        candidates = variant_prices.get(product_id) or ([prices[product_id, None]] if (product_id, None) in prices else [])
+        amounts = [price for price, _ in candidates]
+        card.min_price = min(amounts, default=None)
+        card.max_price = max(amounts, default=None)
+        card.currency = next((currency for _, currency in candidates if currency), '')
+        card.promotion_price, card.promotion_ends_at, card.refresh_at = apply_promotions(
+            card.min_price, promotions.get(product_id, ()), now
+        )
+
+
+def load_stock(cards, ids, using, now):
+    """Available units (quantity - reserved) of the product and its active variants."""
+    totals = {}
+    for product_id, _, available in Stock.objects.using(using).filter(
+        Q(variant__isnull=True) | Q(variant__is_active=True), product_id__in=ids, is_active=True
+    ).order_by().values_list('product_id', 'variant_id').annotate(
+        available=Sum('quantity') - Sum('reserved_quantity')
+    ):
+        totals[product_id] = totals.get(product_id, 0) + max(available, 0)
+    for product_id, card in cards.items():
+        card.available = totals.get(product_id, 0)
+        card.in_stock = card.available > 0
+
+
+def load_media(cards, ids, using, now):
+    """The primary image: product media before variant media, then is_primary, position and age."""
+    best = {}
+    for product_id, variant_product_id, media, alt_text, is_primary, position, created_at in (
+        ProductMedia.objects.using(using)
+        .filter(Q(product_id__in=ids) | Q(variant__product_id__in=ids))
+        .values_list('product_id', 'variant__product_id', 'media', 'alt_text', 'is_primary', 'position', 'created_at')
+    ):
+        owner = product_id or variant_product_id
+        rank = (product_id is None, not is_primary, position, created_at)
+        if owner in cards and (owner not in best or rank < best[owner][0]):
+            best[owner] = (rank, media, alt_text)
+    for product_id, card in cards.items():
+        _, card.image, card.image_alt = best.get(product_id, (None, '', ''))
+        card.image_alt = card.image_alt or ''
+
+
+def load_rating(cards, ids, using, now):
+    ratings = {
+        product_id: (average, count)
+        for product_id, average, count in ProductReview.objects.using(using).filter(
+            product_id__in=ids, is_approved=True
+        ).order_by().values_list('product_id').annotate(average=Avg('rating'), count=Count('id'))
+    }
+    for product_id, card in cards.items():
+        average, card.review_count = ratings.get(product_id, (None, 0))
+        card.rating_average = Decimal(str(average)).quantize(CENT) if average is not None else None
+
+
+LOADERS = {
+    'pricing': load_pricing,
+    'stock': load_stock,
+    'media': load_media,
+    'rating': load_rating,
+}
+
+
+def refresh_cards(product_ids, parts=PARTS, using=DEFAULT_DB_ALIAS):
+    """
+    Recompute the given column groups of the cards of some products with one
+    query per group, then upsert them in one statement. Products without a
+    card get every group; deleted products are skipped. Returns the number
+    of cards written.
+    """
+    ids = {pk for pk in product_ids if pk is not None}
+    if not ids:
+        return 0
+    now = timezone.now()
+    rows = Product.objects.using(using).filter(pk__in=ids).annotate(
+        has_card=Exists(ProductCard.objects.filter(product=OuterRef('pk')))
+    ).values_list(
+        'pk', 'name', 'slug', 'sku', 'status', 'is_active', 'category_id', 'category__name', 'category__path',
+        'brand_id', 'brand__name', 'created_at', 'has_card',
+    )
+    cards, complete = {}, True
+    for (pk, name, slug, sku, status, is_active, category_id, category_name, category_path,
+         brand_id, brand_name, created_at, has_card) in rows:
+        cards[pk] = ProductCard(
+            product_id=pk, name=name, slug=slug, sku=sku, status=status, is_active=is_active,
+            category_id=category_id, category_name=category_name or '', category_path=category_path or '',
+            brand_id=brand_id, brand_name=brand_name or '', created_at=created_at,
+        )
+        complete = complete and has_card
+    if not cards:
+        return 0
+
+    parts = {'product', *parts} if complete else set(PARTS)
+    ids = list(cards)
+    for part in parts - {'product'}:
+        LOADERS[part](cards, ids, using, now)
+
+    ProductCard.objects.using(using).bulk_create(
+        cards.values(), update_conflicts=True, unique_fields=['product'],
+        update_fields=[field for part in PARTS if part in parts for field in PART_FIELDS[part]] + ['updated_at'],
+    )
+    invalidate_responses(ProductCard)
+    return len(cards)
+
+
+def schedule_refresh(product_ids, parts=PARTS, using=DEFAULT_DB_ALIAS):
+    """
+    refresh_cards() once the current transaction commits: the rows it reads
+    are then final, and a product deleted along with its variants or stock
+    is gone instead of getting a card back.
+    """
+    ids = [pk for pk in product_ids if pk is not None]
+    if ids:
+        transaction.on_commit(lambda: refresh_cards(ids, parts, using), using=using)
+
+
+def copy_category_names(cards):
+    """Copy the current name and path of their categories to some cards, after updates that sent no signals."""
+    source = Category.objects.using(cards.db).filter(pk=OuterRef('category_id'))
+    updated = cards.update(
+        category_name=Coalesce(Subquery(source.values('name')[:1]), Value('')),
+        category_path=Coalesce(Subquery(source.values('path')[:1]), Value('')),
+        updated_at=timezone.now(),
+    )
+    if updated:
+        invalidate_responses(ProductCard)
+
+
+def update_brand_cards(brand, using=DEFAULT_DB_ALIAS):
+    cards = ProductCard.objects.using(using).filter(brand_id=brand.pk).exclude(brand_name=brand.name)
+    if cards.update(brand_name=brand.name, updated_at=timezone.now()):
+        invalidate_responses(ProductCard)
+
+
+def rebuild_product_cards(batch_size=1000, due=False, using=DEFAULT_DB_ALIAS):
+    """
+    Recompute every card (or, with due=True, the pricing of the cards whose
+    promotions started or ended since they were written). Returns the number
+    of cards written.
+    """
+    if due:
+        product_ids = ProductCard.objects.using(using).filter(refresh_at__lte=timezone.now()).values_list('product_id', flat=True)
+        parts = ('pricing',)
+    else:
+        product_ids = Product.objects.using(using).order_by('pk').values_list('pk', flat=True)
+        parts = PARTS
+
+    written, batch = 0, []
+    for pk in product_ids.iterator(chunk_size=batch_size):
+        batch.append(pk)
+        if len(batch) >= batch_size:
+            written += refresh_cards(batch, parts, using)
+            batch = []
+    return written + refresh_cards(batch, parts, using)
@@ -0,0 +1,216 @@
+import hashlib
+import json
+import uuid
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Prefetch, Q, prefetch_related_objects
+from django.utils import timezone
+from django.utils.http import quote_etag
+from MBP.response_cache import (
+    generations, response_cache_backend, response_cache_enabled, response_cache_setting, watch_model,
+)
+from inventory.models import ProductPrice, Stock
+from reviews.models import ProductReview
+from .cards import apply_promotions, running_promotions
+from .models import Attribute, AttributeValue, Brand, Category, ProductAttribute, ProductMedia, Variant, VariantAttribute
+
+DOCUMENT_KEY = 'catalog:product-document-entry:{}'   # (document, refresh_at)
+VERSION_KEY = 'catalog:product-document-version:{}'
+# Names read from these end up in every document; their (rare) writes invalidate all of them
+SHARED_MODELS = (Brand, Category, Attribute, AttributeValue)
+
+for model in SHARED_MODELS:
+    watch_model(model)
+
+
+def document_version(product_id):
+    """Opaque version of a product's document, replaced by every write to the rows it is built from."""
+    backend = response_cache_backend()
+    key = VERSION_KEY.format(product_id)
+    version = backend.get(key)
+    if version is None:
+        # A random token rather than a counter: an evicted version never comes back as an old one
+        backend.add(key, uuid.uuid4().hex, None)
+        version = backend.get(key)
+    return version
+
+
+def bump_document_version(product_id):
+    bump_document_versions([product_id])
+
+
+def bump_document_versions(product_ids):
+    keys = [VERSION_KEY.format(product_id) for product_id in product_ids]
+    if not keys:
+        return
+
+    def bump():
+        response_cache_backend().set_many({key: uuid.uuid4().hex for key in keys}, None)
+
+    bump()
+    if transaction.get_connection().in_atomic_block:
+        # A miss that read before the commit may have stored the old rows under the new version
+        transaction.on_commit(bump)
+
+
+def decimal(value):
+    # Strings, like the DecimalFields of the serializers
+    return str(value) if value is not None else None
+
+
+def build_product_document(product, now=None):
+    """
+    Everything a product page shows, in one dict: the product with its brand
+    and category, attributes, active variants with their axis values, media,
+    effective prices, availability and the rating summary. Runs eight queries
+    besides the one that loaded the product (with brand and category).
+    Returns (document, refresh_at), refresh_at being when the next promotion
+    starts or ends and the document goes stale.
+
+    Prices follow the product card (catalog.cards): a variant's effective
+    price is its active global ProductPrice, else the product's, else
+    Variant.price, and warehouse-specific prices are left out. Products
+    without variants take the product's price. Running promotions give each
+    variant and the minimum price a promotion price.
+    Availability sums quantity - reserved_quantity over active stock rows.
+    """
+    now = now or timezone.now()
+    prefetch_related_objects(
+        [product],
+        Prefetch('attributes', queryset=ProductAttribute.objects.select_related('attribute', 'attribute_value')),
+        Prefetch('variants', queryset=Variant.objects.filter(is_active=True).order_by('created_at', 'pk').prefetch_related(
+            Prefetch('variant_attributes', queryset=VariantAttribute.objects.select_related('attribute', 'attribute_value'))
+        )),
+        Prefetch('prices', queryset=ProductPrice.objects.filter(is_active=True, warehouse__isnull=True)),
+        Prefetch('stock', queryset=Stock.objects.filter(is_active=True)),
+    )
+    media = ProductMedia.objects.filter(Q(product=product) | Q(variant__product=product)).order_by('position', 'created_at')
+    ratings = dict(
+        ProductReview.objects.filter(product=product, is_approved=True).order_by()
+        .values_list('rating').annotate(count=Count('id'))
+    )
+    promotions = running_promotions([product.pk], product._state.db, now).get(product.pk, ())
+
+    prices = {price.variant_id: price for price in product.prices.all()}
+    available = {}
+    for stock in product.stock.all():
+        available[stock.variant_id] = available.get(stock.variant_id, 0) + stock.quantity - stock.reserved_quantity
+
+    axes, variants = {}, []
+    for variant in product.variants.all():
+        price = prices.get(variant.pk) or prices.get(None)
+        values = {}
+        for item in variant.variant_attributes.all():
+            values[item.attribute.slug] = item.attribute_value.value
+            axis = axes.setdefault(
+                item.attribute.slug, {'attribute': item.attribute.name, 'slug': item.attribute.slug, 'values': {}}
+            )
+            axis['values'].setdefault(item.attribute_value.slug, item.attribute_value.value)
+        variant_available = max(available.get(variant.pk, 0), 0)
+        amount = price.price if price else variant.price
+        variants.append({
+            'id': variant.pk, 'sku': variant.sku, 'slug': variant.slug, 'name': variant.name,
+            'price': decimal(amount),
+            'promotion_price': decimal(apply_promotions(amount, promotions, now)[0]),
+            'compare_at_price': decimal(price.compare_at_price if price else variant.compare_at_price),
+            'currency': price.currency if price else None,
+            'available': variant_available, 'in_stock': variant_available > 0,
+            'values': values,
+        })
+
+    product_price = prices.get(None)
+    amounts = [Decimal(variant['price']) for variant in variants] or ([product_price.price] if product_price else [])
+    min_price = min(amounts, default=None)
+    promotion_price, promotion_ends_at, refresh_at = apply_promotions(min_price, promotions, now)
+    # Product-level stock plus that of the active variants
+    stocked = {None} | {variant['id'] for variant in variants}
+    total_available = max(available.get(None, 0), 0) + sum(variant['available'] for variant in variants)
+    review_count = sum(ratings.values())
+
+    document = {
+        'id': product.pk, 'slug': product.slug, 'name': product.name, 'sku': product.sku, 'type': product.type,
+        'status': product.status, 'is_active': product.is_active,
+        'short_description': product.short_description, 'description': product.description,
+        'brand': {'id': product.brand.pk, 'name': product.brand.name, 'slug': product.brand.slug} if product.brand else None,
+        'category': {
+            'id': product.category.pk, 'name': product.category.name, 'slug': product.category.slug,
+        } if product.category else None,
+        'attributes': [
+            {
+                'attribute': item.attribute.name, 'slug': item.attribute.slug,
+                'value': item.attribute_value.value if item.attribute_value else item.value_text or decimal(item.value_numeric),
+            }
+            for item in product.attributes.all()
+        ],
+        'axes': [
+            {'attribute': axis['attribute'], 'slug': axis['slug'],
+             'values': [{'slug': slug, 'value': value} for slug, value in axis['values'].items()]}
+            for axis in axes.values()
+        ],
+        'variants': variants,
+        'media': [
+            {'url': item.media.url if item.media else None, 'alt_text': item.alt_text, 'position': item.position,
+             'is_primary': item.is_primary, 'variant_id': item.variant_id}
+            for item in media
+        ],
+        'price': {
+            'price': decimal(product_price.price) if product_price else None,
+            'compare_at_price': decimal(product_price.compare_at_price) if product_price else None,
+            'currency': product_price.currency if product_price else None,
+            'min': decimal(min_price),
+            'max': decimal(max(amounts, default=None)),
+            'promotion_price': decimal(promotion_price),
+            'promotion_ends_at': promotion_ends_at,
+        },
+        'availability': {
+            'available': total_available, 'in_stock': total_available > 0,
+            'warehouses': len({
+                stock.warehouse_id for stock in product.stock.all()
+                if stock.variant_id in stocked and stock.quantity - stock.reserved_quantity > 0
+            }),
+        },
+        'rating': {
+            'count': review_count,
+            'average': round(sum(rating * count for rating, count in ratings.items()) / review_count, 2)
+            if review_count else None,
+            'distribution': {str(rating): ratings.get(rating, 0) for rating in range(1, 6)},
+        },
+        'updated_at': product.updated_at,
+    }
+    return document, refresh_at
+
+
+def document_key(product):
+    return DOCUMENT_KEY.format(hashlib.sha1(json.dumps(
+        [str(product.pk), document_version(product.pk), str(product.updated_at), generations(SHARED_MODELS)]
+    ).encode()).hexdigest())
+
+
+def product_document(product):
+    """
+    (document, ETag) for a loaded product, from the response cache when its
+    version and the shared models are unchanged. Without the response cache
+    (off, or on a per-process backend whose versions other workers never see)
+    the document is built every time and the ETag hashed from its content.
+
+    A promotion starting or ending writes nothing; a cached document built
+    before that moment is replaced under a new version, so its ETag moves too.
+    """
+    now = timezone.now()
+    if not response_cache_enabled():
+        document, _ = build_product_document(product, now)
+        content = json.dumps(document, cls=DjangoJSONEncoder, sort_keys=True)
+        return document, quote_etag(hashlib.sha1(content.encode()).hexdigest())
+
+    backend = response_cache_backend()
+    key = document_key(product)
+    entry = backend.get(key)
+    if entry is not None and entry[1] is not None and entry[1] <= now:
+        bump_document_version(product.pk)
+        key, entry = document_key(product), None
+    if entry is None:
+        entry = build_product_document(product, now)
+        backend.set(key, entry, response_cache_setting('TIMEOUT'))
+    return entry[0], quote_etag(key.rsplit(':', 1)[1])
@@ -0,0 +1,401 @@
+import threading
+import time
+import uuid
+from itertools import zip_longest
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from MBP.caching import is_shared_cache
+from .models import Attribute, AttributeValue, Category, Product, ProductAttribute, VariantAttribute
+
+FACETS_DEFAULTS = {
+    'ENABLED': True,
+    'CACHE': 'default',          # alias in CACHES holding the change journal; should be shared between workers
+    'JOURNAL_TIMEOUT': 3600,     # seconds a change is kept for workers that have not applied it yet
+    'MAX_JOURNAL_GAP': 5000,     # a worker further behind than this many changes rebuilds instead
+    'GAP_GRACE': 5.0,            # seconds a missing journal entry is waited for before rebuilding
+    'REBUILD_INTERVAL': 60,      # seconds an index is kept when CACHE is per-process and misses other workers
+}
+SEQUENCE_KEY = 'catalog:facets:seq'
+JOURNAL_KEY = 'catalog:facets:journal:{}'
+
+
+def facet_setting(name):
+    return getattr(settings, 'FACETS', {}).get(name, FACETS_DEFAULTS[name])
+
+
+def facet_journal():
+    return caches[facet_setting('CACHE')]
+
+
+def journal(kind, pk=None):
+    """
+    Record a change for every worker's index once the transaction commits:
+    ('product', id) re-reads one product, ('meta', None) the attribute,
+    value and category tables.
+    """
+    def write():
+        backend = facet_journal()
+        try:
+            seq = backend.incr(SEQUENCE_KEY)
+        except ValueError:
+            backend.add(SEQUENCE_KEY, 0, None)
+            seq = backend.incr(SEQUENCE_KEY)
+        backend.set(JOURNAL_KEY.format(seq), (kind, pk), facet_setting('JOURNAL_TIMEOUT'))
+
+    transaction.on_commit(write)
+
+
+def parse_uuid(value):
+    try:
+        return uuid.UUID(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def attribute_params(query_params):
+    """{attribute slug: [values]} from attr[<slug>]=<value>[,<value>...] parameters."""
+    filters = {}
+    for key, values in query_params.lists():
+        if key.startswith('attr[') and key.endswith(']') and len(key) > 6:
+            selected = filters.setdefault(key[5:-1], [])
+            selected.extend(value.strip() for raw in values for value in raw.split(',') if value.strip())
+    return filters
+
+
+def attribute_filter(filters):
+    """
+    Q for products having, for every attribute, one of its selected values
+    (matched by value, case-insensitively, or by slug) on the product itself
+    or on one of its variants.
+    """
+    condition = Q()
+    for slug, values in filters.items():
+        matches = Q(slug__in=values)
+        for value in values:
+            matches |= Q(value__iexact=value)
+        selected = AttributeValue.objects.filter(matches, attribute__slug=slug)
+        condition &= (
+            Exists(ProductAttribute.objects.filter(product=OuterRef('pk'), attribute_value__in=selected))
+            | Exists(VariantAttribute.objects.filter(variant__product=OuterRef('pk'), attribute_value__in=selected))
+        )
+    return condition
+
+
+# Bitmaps are lists of int blocks of BLOCK_BITS bits: a category's products sit in
+# a few neighbouring blocks, and counting skips the blocks outside the scope
+BLOCK_BITS = 1 << 16
+
+
+def packed(size):
+    return bytearray(size // 8 + 1)
+
+
+def set_bit(bits, ordinal):
+    bits[ordinal >> 3] |= 1 << (ordinal & 7)
+
+
+def blocks(bits):
+    """Block list of a packed little-endian bytearray."""
+    step = BLOCK_BITS // 8
+    return [int.from_bytes(bits[start:start + step], 'little') for start in range(0, len(bits), step)]
+
+
+def add(bitmap, ordinal):
+    block, bit = divmod(ordinal, BLOCK_BITS)
+    if block >= len(bitmap):
+        bitmap.extend([0] * (block + 1 - len(bitmap)))
+    bitmap[block] |= 1 << bit
+
+
+def discard(bitmap, ordinal):
+    block, bit = divmod(ordinal, BLOCK_BITS)
+    if block < len(bitmap) and bitmap[block] >> bit & 1:
+        bitmap[block] ^= 1 << bit
+
+
+def intersect(a, b):
+    return [x & y for x, y in zip(a, b)]
+
+
+def union(a, b):
+    return [x | y for x, y in zip_longest(a, b, fillvalue=0)]
+
+
+def difference(a, b):
+    return [x & ~y for x, y in zip_longest(a, b[:len(a)], fillvalue=0)]
+
+
+def intersection_count(scope, bitmap):
+    return sum((x & y).bit_count() for x, y in zip(scope, bitmap) if x)
+
+
+class FacetIndex:
+    """
+    Per-process inverted index from attribute value to the products that have
+    it (directly or on a variant), as bitmaps over product ordinals, so facet
+    counts are AND + bit_count in memory instead of GROUP BY queries over the
+    listing.
+
+    Ordinals are assigned in category path order, so a category page or
+    subtree only touches a few blocks of every bitmap. Category, status and
+    is_active are bitmaps too. Other filters (brand, search) are resolved in
+    SQL and the ids mapped to ordinals.
+
+    Every worker builds its index on first use. After that it catches up from
+    a journal in the shared cache, which the catalog signals append to on
+    commit. Only the products that changed are re-read. A worker that has
+    fallen too far behind, or finds the journal cleared, rebuilds. Products
+    added after the build get ordinals at the end until then.
+
+    When CACHE is per-process (LocMem) the journal only holds this worker's
+    own changes, so the index is also rebuilt every REBUILD_INTERVAL seconds
+    to pick up the others'.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.seq = None
+        self.gap = None
+        self.built_at = None
+
+    def reset(self):
+        with self._lock:
+            self.seq = None
+
+    def expired(self):
+        """Whether a per-process journal may have missed other workers' changes for too long."""
+        if is_shared_cache(facet_setting('CACHE')):
+            return False
+        return time.monotonic() - self.built_at >= facet_setting('REBUILD_INTERVAL')
+
+    def current(self):
+        seq = facet_journal().get(SEQUENCE_KEY, 0)
+        if self.seq is None or seq < self.seq or seq - self.seq > facet_setting('MAX_JOURNAL_GAP') or self.expired():
+            self.build(seq)
+        elif seq > self.seq:
+            self.catch_up(seq)
+
+    def build(self, seq):
+        # The sequence is read before the rows, so changes made during the build are applied again
+        self.seq, self.gap, self.built_at = seq, None, time.monotonic()
+        self.values = {}
+        self.load_meta()
+
+        rows = Product.objects.order_by('category__path', 'category_id', 'pk').values_list(
+            'pk', 'category_id', 'status', 'is_active',
+        )
+        size = Product.objects.count() + 8
+        self.ordinals, self.category_of, self.categories = {}, [], {}
+        alive, active, status = packed(size), packed(size), {}
+        category, in_category = None, None
+        for ordinal, (pk, category_id, product_status, is_active) in enumerate(rows.iterator(chunk_size=5000)):
+            if ordinal >= size:
+                break   # inserted while building; the journal brings it in
+            self.ordinals[pk.int] = ordinal
+            self.category_of.append((category_id, product_status))
+            set_bit(alive, ordinal)
+            if is_active:
+                set_bit(active, ordinal)
+            set_bit(status.setdefault(product_status, packed(size)), ordinal)
+            if category_id != category:
+                # Rows come category by category: pack each one when the next starts
+                if category is not None:
+                    self.categories[category] = blocks(in_category)
+                category, in_category = category_id, packed(size)
+            if category_id is not None:
+                set_bit(in_category, ordinal)
+        if category is not None:
+            self.categories[category] = blocks(in_category)
+
+        self.alive, self.active = blocks(alive), blocks(active)
+        self.status = {key: blocks(bits) for key, bits in status.items()}
+
+        values = {}
+        for product_id, value_id in self.value_rows():
+            ordinal = self.ordinals.get(product_id.int)
+            if ordinal is not None and value_id in self.value_meta:
+                set_bit(values.setdefault(value_id, packed(size)), ordinal)
+        self.values = {key: blocks(bits) for key, bits in values.items()}
+
+    def value_rows(self, product_ids=None):
+        direct = ProductAttribute.objects.filter(attribute_value__isnull=False)
+        variants = VariantAttribute.objects.all()
+        if product_ids is not None:
+            direct = direct.filter(product_id__in=product_ids)
+            variants = variants.filter(variant__product_id__in=product_ids)
+        yield from direct.values_list('product_id', 'attribute_value_id').iterator(chunk_size=5000)
+        yield from variants.values_list('variant__product_id', 'attribute_value_id').iterator(chunk_size=5000)
+
+    def load_meta(self):
+        self.attributes = {row['id']: row for row in Attribute.objects.values(
+            'id', 'slug', 'name', 'ordering', 'is_filterable',
+        )}
+        self.value_meta = {row['id']: row for row in AttributeValue.objects.order_by('ordering', 'value').values(
+            'id', 'attribute_id', 'value', 'slug', 'ordering',
+        )}
+        self.values_of = {}
+        for row in self.value_meta.values():
+            self.values_of.setdefault(row['attribute_id'], []).append(row['id'])
+        self.category_paths = dict(Category.objects.values_list('id', 'path'))
+        # Deleted values leave ProductAttribute rows with attribute_value NULL (SET_NULL sends no signal)
+        self.values = {key: bits for key, bits in self.values.items() if key in self.value_meta}
+
+    def catch_up(self, seq):
+        backend = facet_journal()
+        keys = [JOURNAL_KEY.format(n) for n in range(self.seq + 1, seq + 1)]
+        found = backend.get_many(keys)
+        applied, meta, products = self.seq, False, set()
+        for key in keys:
+            entry = found.get(key)
+            if entry is None:
+                break
+            kind, pk = entry
+            if kind == 'meta':
+                meta = True
+            else:
+                products.add(pk)
+            applied += 1
+
+        if applied < seq:
+            # A writer has taken the number but not stored the entry yet, or the entry expired
+            now = time.monotonic()
+            if self.gap is None or self.gap[0] != applied + 1:
+                self.gap = (applied + 1, now)
+            elif now - self.gap[1] > facet_setting('GAP_GRACE'):
+                return self.build(seq)
+        else:
+            self.gap = None
+
+        if meta:
+            self.load_meta()
+        if products:
+            self.reindex(products)
+        self.seq = applied
+
+    def reindex(self, product_ids):
+        rows = {
+            pk: (category_id, status, is_active) for pk, category_id, status, is_active in
+            Product.objects.filter(pk__in=product_ids).values_list('pk', 'category_id', 'status', 'is_active')
+        }
+        ordinals = {}
+        for pk in product_ids:
+            ordinal = self.ordinals.get(pk.int)
+            if ordinal is None:
+                if pk not in rows:
+                    continue
+                ordinal = self.ordinals[pk.int] = len(self.category_of)
+                self.category_of.append((None, None))
+            ordinals[pk] = ordinal
+
+            old_category, old_status = self.category_of[ordinal]
+            for bitmap in (self.alive, self.active, self.status.get(old_status), self.categories.get(old_category)):
+                if bitmap is not None:
+                    discard(bitmap, ordinal)
+            for bitmap in self.values.values():
+                discard(bitmap, ordinal)
+            self.category_of[ordinal] = (None, None)
+
+        for pk, (category_id, status, is_active) in rows.items():
+            ordinal = ordinals[pk]
+            self.category_of[ordinal] = (category_id, status)
+            add(self.alive, ordinal)
+            if is_active:
+                add(self.active, ordinal)
+            add(self.status.setdefault(status, []), ordinal)
+            if category_id is not None:
+                add(self.categories.setdefault(category_id, []), ordinal)
+        for product_id, value_id in self.value_rows(list(rows)):
+            if value_id in self.value_meta:
+                add(self.values.setdefault(value_id, []), ordinals[product_id])
+
+    def base(self, category=None, include_descendants=False, status=None, is_active=None):
+        bits = self.alive
+        if category is not None:
+            path = self.category_paths.get(category)
+            if include_descendants and path:
+                categories = [pk for pk, other in self.category_paths.items() if other.startswith(path)]
+            else:
+                categories = [category]
+            in_categories = []
+            for pk in categories:
+                in_categories = union(in_categories, self.categories.get(pk, []))
+            bits = intersect(bits, in_categories)
+        if status:
+            bits = intersect(bits, self.status.get(status, []))
+        if is_active is not None:
+            bits = intersect(bits, self.active) if is_active else difference(bits, self.active)
+        return bits
+
+    def bitmap(self, product_ids):
+        bits = packed(len(self.category_of))
+        for pk in product_ids:
+            ordinal = self.ordinals.get(pk.int)
+            if ordinal is not None:
+                set_bit(bits, ordinal)
+        return intersect(blocks(bits), self.alive)
+
+    def resolve(self, filters):
+        """{attribute id (or the unknown slug): selected value ids} for attribute_params() output."""
+        by_slug = {attribute['slug']: pk for pk, attribute in self.attributes.items()}
+        selected = {}
+        for slug, values in filters.items():
+            attribute_id = by_slug.get(slug)
+            wanted = {value.lower() for value in values}
+            selected[attribute_id or slug] = {
+                value_id for value_id in self.values_of.get(attribute_id, ())
+                if self.value_meta[value_id]['value'].lower() in wanted or self.value_meta[value_id]['slug'] in values
+            }
+        return selected
+
+    def facets(self, filters, product_ids=None, **base_filters):
+        """
+        Counts per value of every filterable attribute over the products
+        matching base_filters (or product_ids) and the attribute filters. An
+        attribute's own selection does not narrow its counts, so the other
+        values stay selectable.
+        """
+        with self._lock:
+            self.current()
+            base = self.bitmap(product_ids) if product_ids is not None else self.base(**base_filters)
+            selected = self.resolve(filters)
+            matching = {}
+            for attribute_id, value_ids in selected.items():
+                bits = []
+                for value_id in value_ids:
+                    bits = union(bits, self.values.get(value_id, []))
+                matching[attribute_id] = bits
+
+            everywhere = base
+            for bits in matching.values():
+                everywhere = intersect(everywhere, bits)
+
+            facets = []
+            attributes = sorted(self.attributes.values(), key=lambda attribute: (attribute['ordering'], attribute['name']))
+            for attribute in attributes:
+                if not attribute['is_filterable']:
+                    continue
+                scope = everywhere
+                if attribute['id'] in matching:
+                    scope = base
+                    for other, bits in matching.items():
+                        if other != attribute['id']:
+                            scope = intersect(scope, bits)
+                chosen = selected.get(attribute['id'], ())
+                values = []
+                for value_id in self.values_of.get(attribute['id'], ()):
+                    count = intersection_count(scope, self.values.get(value_id, []))
+                    if count or value_id in chosen:
+                        meta = self.value_meta[value_id]
+                        values.append({
+                            'value': meta['value'], 'slug': meta['slug'],
+                            'count': count, 'selected': value_id in chosen,
+                        })
+                if values:
+                    facets.append({'attribute': attribute['slug'], 'name': attribute['name'], 'values': values})
+            return facets
+
+
+facet_index = FacetIndex()
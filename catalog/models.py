@@ -1,27 +1,23 @@
 import uuid
 from django.conf import settings
-from django.db import models
-from django.utils.text import slugify
+from django.db import models, router, transaction
+from django.db.models.functions import Concat, Substr
+from django.utils import timezone
+from MBP.slugs import UniqueSlugMixin
 from django.db.models import Index, JSONField
 from decimal import Decimal
 
 
-def generate_unique_slug(model, base):
-    slug = slugify(base)[:200]
-    counter = 1
-    Model = model
-    while Model.objects.filter(slug=slug).exists():
-        slug = f"{slugify(base)[:190]}-{counter}"
-        counter += 1
-    return slug
-
-
-class Category(models.Model):
+class Category(UniqueSlugMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=200)
     slug = models.SlugField(max_length=255, unique=True, blank=True)
     description = models.TextField(blank=True, null=True)
     parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL, related_name='children')
+    # Materialized path: the ids of the ancestors and of the category itself, root
+    # first, each as 32 hex digits and a slash. Descendants of c are the rows whose
+    # path starts with c.path. A text column, so the tree has no depth limit.
+    path = models.TextField(default='', editable=False)
     image = models.ImageField(upload_to='category/%Y/%m/', null=True, blank=True)
     is_active = models.BooleanField(default=True)
 
@@ -34,18 +30,53 @@ class Category(models.Model):
         indexes = [
             Index(fields=['slug']),
             Index(fields=['parent', 'name']),
+            Index(fields=['path'], name='catalog_category_path_idx', opclasses=['text_pattern_ops']),
         ]
 
+    def slug_source(self):
+        return self.name
+
+    @property
+    def path_segment(self):
+        return f'{self.pk.hex}/'
+
+    @property
+    def depth(self):
+        return len(self.path) // len(self.path_segment) - 1
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = generate_unique_slug(Category, self.name or str(uuid.uuid4()))
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'parent' not in update_fields and self.path:
+            return super().save(*args, **kwargs)
+
+        # Paths are read from the rows, not from instances that may predate a move
+        using = kwargs.get('using') or router.db_for_write(Category, instance=self)
+        with transaction.atomic(using=using):
+            paths = dict(
+                Category.objects.using(using).select_for_update()
+                .filter(pk__in=[self.pk, self.parent_id]).order_by('pk').values_list('pk', 'path')
+            )
+            old_path = paths.get(self.pk, '')
+            parent_path = paths.get(self.parent_id, '') if self.parent_id else ''
+            if old_path and parent_path.startswith(old_path):
+                raise ValueError(f"Category {self} cannot be moved under itself or its descendants.")
+
+            self.path = parent_path + self.path_segment
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'path'}
+            super().save(*args, **kwargs)
+
+            if old_path and old_path != self.path:
+                Category.objects.using(using).filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                    path=Concat(models.Value(self.path), Substr('path', len(old_path) + 1)),
+                    updated_at=timezone.now(),
+                )
 
     def __str__(self):
         return self.name
 
 
-class Brand(models.Model):
+class Brand(UniqueSlugMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=200, unique=True)
     slug = models.SlugField(max_length=255, unique=True, blank=True)
@@ -62,16 +93,14 @@ class Brand(models.Model):
         verbose_name_plural = "Brands"
         indexes = [Index(fields=['slug'])]
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = generate_unique_slug(Brand, self.name)
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return self.name
 
     def __str__(self):
         return self.name
 
 
-class Attribute(models.Model):
+class Attribute(UniqueSlugMixin, models.Model):
     TYPE_TEXT = 'text'
     TYPE_INTEGER = 'integer'
     TYPE_DECIMAL = 'decimal'
@@ -105,16 +134,14 @@ class Attribute(models.Model):
         verbose_name_plural = "Attributes"
         indexes = [Index(fields=['slug']), Index(fields=['name'])]
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = generate_unique_slug(Attribute, self.name)
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return self.name
 
     def __str__(self):
         return self.name
 
 
-class AttributeValue(models.Model):
+class AttributeValue(UniqueSlugMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     attribute = models.ForeignKey(Attribute, on_delete=models.CASCADE, related_name='values')
     value = models.CharField(max_length=255)
@@ -130,17 +157,14 @@ class AttributeValue(models.Model):
         unique_together = ('attribute', 'value')
         indexes = [Index(fields=['attribute']), Index(fields=['value'])]
     
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base = f"{self.attribute.name}-{self.value}"
-            self.slug = generate_unique_slug(AttributeValue, base)
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return f"{self.attribute.name}-{self.value}"
 
     def __str__(self):
         return f"{self.attribute.name}: {self.value}"
 
 
-class Product(models.Model):
+class Product(UniqueSlugMixin, models.Model):
     TYPE_SIMPLE = 'simple'
     TYPE_VARIANT = 'variant_parent'
     TYPE_BUNDLE = 'bundle'
@@ -193,10 +217,73 @@ class Product(models.Model):
             Index(fields=['category']),
         ]
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = generate_unique_slug(Product, self.name)
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return self.name
+
+    def __str__(self):
+        return self.name
+
+
+class ProductSearchDocument(models.Model):
+    """
+    A product's row in the full-text index: an FTS5 table on SQLite, a tsvector
+    table on PostgreSQL. Created and kept current by catalog.search, outside
+    migrations; mapped here only so searches can join it.
+    """
+    product = models.OneToOneField(
+        Product, on_delete=models.DO_NOTHING, primary_key=True, db_constraint=False,
+        db_column='product_id', related_name='search_document',
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'catalog_product_search'
+
+
+class ProductCard(models.Model):
+    """
+    Read model for product listings: one row per product with everything a
+    grid tile shows, so a listing page reads this table alone. Maintained by
+    catalog.cards from signals; rebuild_product_cards recomputes every row.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='card')
+    name = models.CharField(max_length=255)
+    slug = models.SlugField(max_length=255)
+    sku = models.CharField(max_length=120, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=Product.STATUS_CHOICES)
+    is_active = models.BooleanField()
+    category_id = models.UUIDField(null=True, blank=True)
+    category_name = models.CharField(max_length=200, blank=True, default='')
+    category_path = models.TextField(blank=True, default='')
+    brand_id = models.UUIDField(null=True, blank=True)
+    brand_name = models.CharField(max_length=200, blank=True, default='')
+    image = models.ImageField(blank=True, default='')
+    image_alt = models.CharField(max_length=255, blank=True, default='')
+    min_price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    max_price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    currency = models.CharField(max_length=5, blank=True, default='')
+    promotion_price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    promotion_ends_at = models.DateTimeField(null=True, blank=True)
+    # When a promotion of this product starts or ends next; rebuild_product_cards --due refreshes these
+    refresh_at = models.DateTimeField(null=True, blank=True)
+    available = models.IntegerField(default=0)
+    in_stock = models.BooleanField(default=False)
+    rating_average = models.DecimalField(max_digits=3, decimal_places=2, null=True, blank=True)
+    review_count = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField()  # the product's, for the default listing order
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Product Card"
+        verbose_name_plural = "Product Cards"
+        indexes = [
+            Index(fields=['created_at', 'product'], name='catalog_card_created_idx'),
+            Index(fields=['category_path'], name='catalog_card_category_idx', opclasses=['text_pattern_ops']),
+            Index(fields=['brand_id'], name='catalog_card_brand_idx'),
+            Index(fields=['min_price'], name='catalog_card_price_idx'),
+            Index(fields=['refresh_at'], name='catalog_card_refresh_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -220,7 +307,7 @@ class ProductAttribute(models.Model):
         return f"{self.product.name} — {self.attribute.name}"
 
 
-class Variant(models.Model):
+class Variant(UniqueSlugMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='variants')
     sku = models.CharField(max_length=120, unique=True)
@@ -246,11 +333,8 @@ class Variant(models.Model):
     def stock_status(self):
         return "Active" if self.is_active else "Inactive"
     
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base = self.name or self.sku or str(uuid.uuid4())
-            self.slug = generate_unique_slug(Variant, base)
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return self.name or self.sku
 
     def __str__(self):
         return self.name or f"{self.product.name} — {self.sku}"
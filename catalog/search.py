@@ -0,0 +1,358 @@
+import atexit
+import re
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, IntegrityError, connections, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.fields import BooleanField, FloatField
+from rest_framework import filters
+from rest_framework.settings import api_settings
+from MBP.buffer import BufferedWriter
+from MBP.slugs import assign_unique_slugs
+from analytics.models import SearchQuery
+from .models import Product
+
+SEARCH_DEFAULTS = {
+    'ENABLED': True,
+    'LANGUAGE': 'english',   # PostgreSQL text search configuration
+    'MAX_TERMS': 8,
+    'LOG_QUERIES': True,
+    'BUFFERED': True,
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 2.0,
+    'MAX_QUEUE': 10000,
+}
+
+# DRF SearchFilter fields, used where no full-text index is available
+FALLBACK_SEARCH_FIELDS = ["name", "slug", "sku", "short_description", "description"]
+# Product fields that end up in the indexed document
+INDEXED_FIELDS = {'name', 'sku', 'brand', 'category', 'short_description', 'description'}
+
+
+def search_setting(name):
+    return getattr(settings, 'PRODUCT_SEARCH', {}).get(name, SEARCH_DEFAULTS[name])
+
+
+def search_terms(value):
+    """Words of a search string, lower-cased; punctuation and query operators are dropped."""
+    return re.findall(r'\w+', (value or '').lower())[:search_setting('MAX_TERMS')]
+
+
+class SQLiteSearchBackend:
+    """
+    An FTS5 table ranked with bm25(). FTS rows are keyed on the integer id of a
+    small rowid table rather than on catalog_product's rowid, which VACUUM may
+    renumber for tables without an INTEGER PRIMARY KEY.
+    """
+    table = 'catalog_product_search'
+    rowid_table = 'catalog_product_search_rowid'
+    tables = (table, rowid_table)
+    # bm25 column weights: product_id (not indexed), name, sku, brand, category, descriptions
+    weights = (0.0, 10.0, 8.0, 4.0, 3.0, 1.0)
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create(self, cursor):
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.rowid_table} ("
+            "id integer PRIMARY KEY, product_id char(32) NOT NULL UNIQUE)"
+        )
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+            "product_id UNINDEXED, name, sku, brand, category, body, "
+            "tokenize = 'porter unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+
+    def index(self, cursor, products_sql, params):
+        cursor.execute(
+            f"INSERT OR IGNORE INTO {self.rowid_table} (product_id) "
+            f"SELECT id FROM catalog_product WHERE id IN ({products_sql})", params
+        )
+        cursor.execute(
+            f"DELETE FROM {self.table} WHERE rowid IN "
+            f"(SELECT id FROM {self.rowid_table} WHERE product_id IN ({products_sql}))", params
+        )
+        cursor.execute(
+            f"INSERT INTO {self.table} (rowid, product_id, name, sku, brand, category, body) "
+            "SELECT r.id, p.id, p.name, COALESCE(p.sku, ''), COALESCE(b.name, ''), COALESCE(c.name, ''), "
+            "COALESCE(p.short_description, '') || ' ' || COALESCE(p.description, '') "
+            f"FROM catalog_product p JOIN {self.rowid_table} r ON r.product_id = p.id "
+            "LEFT JOIN catalog_brand b ON b.id = p.brand_id "
+            "LEFT JOIN catalog_category c ON c.id = p.category_id "
+            f"WHERE p.id IN ({products_sql})", params
+        )
+
+    def remove(self, cursor, product_ids):
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        cursor.execute(
+            f"DELETE FROM {self.table} WHERE rowid IN "
+            f"(SELECT id FROM {self.rowid_table} WHERE product_id IN ({placeholders}))", product_ids
+        )
+        cursor.execute(f"DELETE FROM {self.rowid_table} WHERE product_id IN ({placeholders})", product_ids)
+
+    def clear(self, cursor):
+        cursor.execute(f"DELETE FROM {self.table}")
+        cursor.execute(f"DELETE FROM {self.rowid_table}")
+
+    def query(self, terms):
+        # Every term must match in some column; the last one may be a prefix still being typed
+        return ' '.join(f'"{term}"' for term in terms) + '*'
+
+    def matches(self, terms):
+        return RawSQL(f"{self.table} MATCH %s", [self.query(terms)], output_field=BooleanField())
+
+    def rank(self, terms):
+        # bm25() is negative and lower is better, so the best match sorts first ascending
+        weights = ', '.join(str(weight) for weight in self.weights)
+        return RawSQL(f"bm25({self.table}, {weights})", [], output_field=FloatField())
+
+    def count(self, cursor, terms):
+        cursor.execute(f"SELECT count(*) FROM {self.table} WHERE {self.table} MATCH %s", [self.query(terms)])
+        return cursor.fetchone()[0]
+
+
+class PostgresSearchBackend:
+    """A weighted tsvector per product with a GIN index, ranked with ts_rank_cd()."""
+    table = 'catalog_product_search'
+    tables = (table,)
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.language = search_setting('LANGUAGE')
+
+    def create(self, cursor):
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "product_id uuid PRIMARY KEY REFERENCES catalog_product (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table}_document_idx ON {self.table} USING GIN (document)"
+        )
+
+    def index(self, cursor, products_sql, params):
+        cursor.execute(
+            f"INSERT INTO {self.table} (product_id, document) "
+            "SELECT p.id, "
+            "setweight(to_tsvector(%s::regconfig, p.name), 'A') || "
+            "setweight(to_tsvector('simple', COALESCE(p.sku, '')), 'A') || "
+            "setweight(to_tsvector(%s::regconfig, COALESCE(b.name, '') || ' ' || COALESCE(c.name, '')), 'B') || "
+            "setweight(to_tsvector(%s::regconfig, COALESCE(p.short_description, '')), 'C') || "
+            "setweight(to_tsvector(%s::regconfig, COALESCE(p.description, '')), 'D') "
+            "FROM catalog_product p "
+            "LEFT JOIN catalog_brand b ON b.id = p.brand_id "
+            "LEFT JOIN catalog_category c ON c.id = p.category_id "
+            f"WHERE p.id IN ({products_sql}) "
+            "ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+            [self.language] * 4 + list(params)
+        )
+
+    def remove(self, cursor, product_ids):
+        cursor.execute(f"DELETE FROM {self.table} WHERE product_id = ANY(%s)", [product_ids])
+
+    def clear(self, cursor):
+        cursor.execute(f"TRUNCATE {self.table}")
+
+    def query(self, terms):
+        return ' & '.join(terms) + ':*'
+
+    def matches(self, terms):
+        return RawSQL(
+            f"{self.table}.document @@ to_tsquery(%s::regconfig, %s)",
+            [self.language, self.query(terms)], output_field=BooleanField(),
+        )
+
+    def rank(self, terms):
+        # Negated so that, as with bm25() on SQLite, the best match sorts first ascending
+        return RawSQL(
+            f"-ts_rank_cd({self.table}.document, to_tsquery(%s::regconfig, %s))",
+            [self.language, self.query(terms)], output_field=FloatField(),
+        )
+
+    def count(self, cursor, terms):
+        cursor.execute(
+            f"SELECT count(*) FROM {self.table} WHERE document @@ to_tsquery(%s::regconfig, %s)",
+            [self.language, self.query(terms)]
+        )
+        return cursor.fetchone()[0]
+
+
+SEARCH_BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+# alias -> whether the index tables exist there
+_available = {}
+
+
+def search_backend(using=DEFAULT_DB_ALIAS):
+    """The full-text backend of a database, or None where there is no index to use."""
+    if not search_setting('ENABLED'):
+        return None
+    connection = connections[using]
+    backend_class = SEARCH_BACKENDS.get(connection.vendor)
+    if backend_class is None:
+        return None
+    if using not in _available:
+        _available[using] = set(backend_class.tables) <= set(connection.introspection.table_names())
+    return backend_class(connection) if _available[using] else None
+
+
+def create_search_index(using=DEFAULT_DB_ALIAS):
+    """Create the index tables if missing; returns True when they were created just now."""
+    connection = connections[using]
+    backend_class = SEARCH_BACKENDS.get(connection.vendor)
+    if backend_class is None:
+        return False
+    backend = backend_class(connection)
+    existed = set(backend.tables) <= set(connection.introspection.table_names())
+    try:
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            backend.create(cursor)
+    except DatabaseError as e:
+        # e.g. SQLite built without FTS5: searches fall back to DRF's SearchFilter
+        print("Product search index unavailable:", e)
+        _available[using] = False
+        return False
+    _available[using] = True
+    return not existed
+
+
+def products_sql(queryset):
+    return queryset.order_by().values('pk').query.sql_with_params()
+
+
+def index_products(queryset):
+    """(Re)index the products of a queryset, in the database it reads from."""
+    backend = search_backend(queryset.db)
+    if backend is None:
+        return
+    sql, params = products_sql(queryset)
+    with connections[queryset.db].cursor() as cursor:
+        backend.index(cursor, sql, params)
+
+
+def remove_products(product_ids, using=DEFAULT_DB_ALIAS):
+    backend = search_backend(using)
+    if backend is None or not product_ids:
+        return
+    field = Product._meta.pk
+    values = [field.get_db_prep_value(pk, connections[using]) for pk in product_ids]
+    with connections[using].cursor() as cursor:
+        backend.remove(cursor, values)
+
+
+def rebuild_search_index(using=DEFAULT_DB_ALIAS):
+    """
+    Drop and rebuild every document, e.g. after bulk loads that skip signals.
+    Returns the product count, None where there is no index.
+    """
+    create_search_index(using)
+    backend = search_backend(using)
+    if backend is None:
+        return None
+    sql, params = products_sql(Product.objects.using(using).all())
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        backend.clear(cursor)
+        backend.index(cursor, sql, params)
+    return Product.objects.using(using).count()
+
+
+def search_products(queryset, terms):
+    """
+    Products matching every term (the last as a prefix), annotated with
+    search_rank: lower is more relevant. None without a full-text backend.
+    The queryset may also be of a model with a one-to-one `product` (cards).
+
+    The inner join on search_document lets the database start from the index
+    matches; the raw match and rank expressions refer to that joined table.
+    """
+    backend = search_backend(queryset.db)
+    if backend is None:
+        return None
+    document = 'search_document' if queryset.model is Product else 'product__search_document'
+    return (
+        queryset.filter(**{f'{document}__isnull': False})
+        .filter(backend.matches(terms))
+        .annotate(search_rank=backend.rank(terms))
+    )
+
+
+def result_count(query, using=DEFAULT_DB_ALIAS):
+    """Products matching a search string, counted on the index alone where there is one."""
+    terms = search_terms(query)
+    if not terms:
+        return 0
+    backend = search_backend(using)
+    if backend is not None:
+        with connections[using].cursor() as cursor:
+            return backend.count(cursor, terms)
+    # Same match as SearchFilter: every word in at least one of the fields
+    queryset = Product.objects.using(using)
+    for word in query.split():
+        queryset = queryset.filter(reduce(or_, (Q(**{f'{field}__icontains': word}) for field in FALLBACK_SEARCH_FIELDS)))
+    return queryset.count()
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    ?search= on the full-text index, ranked by relevance unless ?ordering= is
+    given. Falls back to SearchFilter's icontains scans where there is no index.
+    List it after OrderingFilter so the rank ordering is applied last.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = search_terms(' '.join(self.get_search_terms(request)))
+        if not terms:
+            return queryset
+        searched = search_products(queryset, terms)
+        if searched is None:
+            return super().filter_queryset(request, queryset, view)
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            return searched
+        return searched.order_by('search_rank', 'pk')
+
+
+class SearchLog(BufferedWriter):
+    """
+    Records searches as SearchQuery rows off the request path; result_count
+    is counted in the writer, once per distinct query of a batch.
+    """
+    thread_name = 'search-query-writer'
+    label = 'search queries'
+
+    def setting(self, name):
+        return search_setting(name)
+
+    def record_search(self, request):
+        query = request.query_params.get('search', '').strip()
+        # Later pages of the same search are not new searches
+        if not query or not search_setting('LOG_QUERIES') or request.query_params.get('cursor'):
+            return
+        user = request.user
+        self.record(SearchQuery(query=query[:255], user_id=user.pk if user.is_authenticated else None))
+
+    def write_batch(self, entries):
+        counts = {}
+        for entry in entries:
+            if entry.query not in counts:
+                counts[entry.query] = result_count(entry.query)
+            entry.result_count = counts[entry.query]
+        try:
+            with transaction.atomic():
+                assign_unique_slugs(entries)
+                SearchQuery.objects.bulk_create(entries, batch_size=search_setting('BATCH_SIZE'))
+        except IntegrityError:
+            # Another worker took one of the slugs; save() retries each with a fresh one
+            for entry in entries:
+                entry.slug = ''
+                entry.save()
+
+
+search_log = SearchLog()
+atexit.register(search_log.shutdown)
@@ -1,7 +1,8 @@
+from django.utils import timezone
 from rest_framework import serializers
 from .models import (
     Attribute, AttributeValue, ProductAttribute, 
-    Variant, VariantAttribute, BundleItem, Product, Category, Brand
+    Variant, VariantAttribute, BundleItem, Product, ProductCard, Category, Brand
 )
 
 
@@ -20,6 +21,14 @@ class CategorySerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id", "slug", "created_at", "updated_at"]
 
+    def validate_parent_id(self, parent):
+        category = self.instance
+        if parent is not None and category is not None and (
+            parent.pk == category.pk or (category.path and parent.path.startswith(category.path))
+        ):
+            raise serializers.ValidationError("A category cannot be moved under itself or its descendants.")
+        return parent
+
 
 class BrandSerializer(serializers.ModelSerializer):
     class Meta:
@@ -249,4 +258,37 @@ class ProductSerializer(serializers.ModelSerializer):
         """Cross-field validation"""
         if data.get("status") == Product.STATUS_PUBLISHED and not data.get("category"):
             raise serializers.ValidationError("Published products must have a category assigned.")
-        return data
\ No newline at end of file
+        return data
+
+
+class ProductCardSerializer(serializers.ModelSerializer):
+    id = serializers.UUIDField(source="product_id", read_only=True)
+    price = serializers.SerializerMethodField()
+    promotion_price = serializers.SerializerMethodField()
+    promotion_ends_at = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProductCard
+        fields = [
+            "id", "name", "slug", "sku", "status", "is_active",
+            "category_id", "category_name", "brand_id", "brand_name",
+            "image", "image_alt",
+            "price", "min_price", "max_price", "promotion_price", "promotion_ends_at", "currency",
+            "available", "in_stock", "rating_average", "review_count",
+            "created_at", "updated_at"
+        ]
+
+    def running_promotion(self, card):
+        # A card keeps an ended promotion until rebuild_product_cards --due rewrites it
+        return card.promotion_price is not None and card.promotion_ends_at > timezone.now()
+
+    def get_price(self, card):
+        """Effective price: the promotion price while it runs, else the lowest variant price."""
+        price = card.promotion_price if self.running_promotion(card) else card.min_price
+        return str(price) if price is not None else None
+
+    def get_promotion_price(self, card):
+        return str(card.promotion_price) if self.running_promotion(card) else None
+
+    def get_promotion_ends_at(self, card):
+        return serializers.DateTimeField().to_representation(card.promotion_ends_at) if self.running_promotion(card) else None
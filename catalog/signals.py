@@ -0,0 +1,215 @@
+from django.db.models import Q, Value
+from django.db.models.functions import StrIndex, Substr
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from inventory.models import ProductPrice, Stock
+from promotions.models import Promotion
+from reviews.models import ProductReview
+from .cards import copy_category_names, schedule_refresh, update_brand_cards
+from .document import bump_document_version, bump_document_versions
+from .facets import journal
+from .models import (
+    Attribute, AttributeValue, Brand, Category, Product, ProductAttribute, ProductCard, ProductMedia, Variant,
+    VariantAttribute,
+)
+from .search import INDEXED_FIELDS, index_products, remove_products
+
+
+@receiver(post_delete, sender=Category)
+def detach_category_subtree(sender, instance, using, **kwargs):
+    # on_delete=SET_NULL made the children roots: drop the deleted category and
+    # its ancestors from the front of every path below it
+    segment = instance.path_segment
+    Category.objects.using(using).filter(path__contains=segment).update(
+        path=Substr('path', StrIndex('path', Value(segment)) + len(segment)),
+        updated_at=timezone.now(),
+    )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Variant)
+def journal_product(sender, instance, **kwargs):
+    journal('product', instance.pk if sender is Product else instance.product_id)
+
+
+@receiver(post_save, sender=ProductAttribute)
+@receiver(post_delete, sender=ProductAttribute)
+def journal_product_attribute(sender, instance, **kwargs):
+    journal('product', instance.product_id)
+
+
+@receiver(post_save, sender=VariantAttribute)
+@receiver(post_delete, sender=VariantAttribute)
+def variant_attribute_changed(sender, instance, **kwargs):
+    # A variant deleted with its attributes is handled by the variant's own receivers
+    product_id = Variant.objects.filter(pk=instance.variant_id).values_list('product_id', flat=True).first()
+    if product_id is not None:
+        journal('product', product_id)
+        bump_document_version(product_id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductAttribute)
+@receiver(post_delete, sender=ProductAttribute)
+@receiver(post_save, sender=Variant)
+@receiver(post_delete, sender=Variant)
+@receiver(post_save, sender=ProductPrice)
+@receiver(post_delete, sender=ProductPrice)
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def bump_product_document(sender, instance, **kwargs):
+    bump_document_version(instance.pk if sender is Product else instance.product_id)
+
+
+@receiver(post_save, sender=ProductMedia)
+@receiver(post_delete, sender=ProductMedia)
+def media_changed(sender, instance, using, **kwargs):
+    product_id = instance.product_id
+    if product_id is None and instance.variant_id is not None:
+        product_id = Variant.objects.filter(pk=instance.variant_id).values_list('product_id', flat=True).first()
+    if product_id is not None:
+        bump_document_version(product_id)
+        schedule_refresh([product_id], ('media',), using)
+
+
+@receiver(post_save, sender=Attribute)
+@receiver(post_delete, sender=Attribute)
+@receiver(post_save, sender=AttributeValue)
+@receiver(post_delete, sender=AttributeValue)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def journal_facet_meta(sender, **kwargs):
+    journal('meta')
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, using, update_fields=None, **kwargs):
+    if update_fields is not None and not INDEXED_FIELDS & set(update_fields):
+        return
+    index_products(Product.objects.using(using).filter(pk=instance.pk))
+
+
+@receiver(pre_delete, sender=Product)
+def unindex_product(sender, instance, using, **kwargs):
+    remove_products([instance.pk], using)
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Category)
+def reindex_named_products(sender, instance, using, created, update_fields=None, **kwargs):
+    # Brand and category names are part of every product document under them
+    if created or (update_fields is not None and 'name' not in update_fields):
+        return
+    index_products(instance.products.using(using).all())
+
+
+@receiver(pre_delete, sender=Brand)
+@receiver(pre_delete, sender=Category)
+def collect_named_products(sender, instance, using, **kwargs):
+    # on_delete=SET_NULL empties the foreign keys without signals; remember which products to reindex
+    instance._search_product_ids = list(instance.products.using(using).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Brand)
+@receiver(post_delete, sender=Category)
+def reindex_orphaned_products(sender, instance, using, **kwargs):
+    product_ids = getattr(instance, '_search_product_ids', None)
+    if product_ids:
+        index_products(Product.objects.using(using).filter(pk__in=product_ids))
+        schedule_refresh(product_ids, ('product',), using)
+
+
+# Product cards: each write refreshes the column groups it feeds once the transaction commits
+
+CARD_PRODUCT_FIELDS = {'name', 'slug', 'sku', 'status', 'is_active', 'category', 'brand'}
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_card(sender, instance, using, update_fields=None, **kwargs):
+    if update_fields is not None and not CARD_PRODUCT_FIELDS & set(update_fields):
+        return
+    schedule_refresh([instance.pk], ('product',), using)
+
+
+@receiver(post_save, sender=Variant)
+@receiver(post_delete, sender=Variant)
+def refresh_variant_card(sender, instance, using, **kwargs):
+    schedule_refresh([instance.product_id], ('pricing', 'stock'), using)
+
+
+@receiver(post_save, sender=ProductPrice)
+@receiver(post_delete, sender=ProductPrice)
+def refresh_price_card(sender, instance, using, **kwargs):
+    schedule_refresh([instance.product_id], ('pricing',), using)
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def refresh_stock_card(sender, instance, using, **kwargs):
+    schedule_refresh([instance.product_id], ('stock',), using)
+
+
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def refresh_rating_card(sender, instance, using, **kwargs):
+    schedule_refresh([instance.product_id], ('rating',), using)
+
+
+def promoted_products_changed(product_ids, using):
+    product_ids = list(product_ids)
+    bump_document_versions(product_ids)
+    schedule_refresh(product_ids, ('pricing',), using)
+
+
+@receiver(post_save, sender=Promotion)
+def refresh_promotion_cards(sender, instance, using, **kwargs):
+    promoted_products_changed(instance.products.using(using).values_list('pk', flat=True), using)
+
+
+@receiver(pre_delete, sender=Promotion)
+def collect_promotion_products(sender, instance, using, **kwargs):
+    instance._card_product_ids = list(instance.products.using(using).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Promotion)
+def refresh_unpromoted_cards(sender, instance, using, **kwargs):
+    promoted_products_changed(getattr(instance, '_card_product_ids', ()), using)
+
+
+@receiver(m2m_changed, sender=Promotion.products.through)
+def refresh_promoted_cards(sender, instance, action, reverse, pk_set, using, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        instance._card_product_ids = list(instance.products.using(using).values_list('pk', flat=True))
+    elif action == 'post_clear' and not reverse:
+        promoted_products_changed(getattr(instance, '_card_product_ids', ()), using)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        # reverse: product.promotions changed, pk_set (None on clear) are promotions
+        promoted_products_changed([instance.pk] if reverse else pk_set, using)
+
+
+@receiver(post_save, sender=Category)
+def update_category_names(sender, instance, using, created, **kwargs):
+    # Renamed: the cards of its products; moved: also those of the categories below it
+    if not created:
+        subtree = Category.objects.using(using).filter(path__startswith=instance.path).values('pk')
+        copy_category_names(ProductCard.objects.using(using).filter(
+            ~Q(category_path__startswith=instance.path) | Q(category_id=instance.pk) & ~Q(category_name=instance.name),
+            category_id__in=subtree,
+        ))
+
+
+@receiver(post_delete, sender=Category)
+def update_detached_paths(sender, instance, using, **kwargs):
+    # detach_category_subtree rewrote the paths below it with an update; the category's own products are refreshed above
+    copy_category_names(ProductCard.objects.using(using).filter(category_path__contains=instance.path_segment))
+
+
+@receiver(post_save, sender=Brand)
+def update_brand_names(sender, instance, using, created, update_fields=None, **kwargs):
+    if not created and (update_fields is None or 'name' in update_fields):
+        update_brand_cards(instance, using)
@@ -1,3 +1,423 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from accounts.models import User, UserRole
+from inventory.models import ProductPrice, Stock, Warehouse
+from promotions.models import Promotion
+from reviews.models import ProductReview
+from MBP.models import AppModel, AuditLog, PermissionType, Role, RoleModelPermission
+from .cards import refresh_cards
+from .document import build_product_document, document_version
+from .facets import FacetIndex
+from .models import (
+    Attribute, AttributeValue, Brand, Category, Product, ProductAttribute, ProductCard, ProductMedia, Variant,
+)
+
+
+# Audit rows are written inside the request, so the test database sees them
+UNBUFFERED_AUDIT_LOG = {**settings.AUDIT_LOG, 'BUFFERED': False}
+
+# Document versions live in the response cache, which needs a backend every worker shares
+SHARED_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': tempfile.mkdtemp(prefix='catalog-tests-'),
+}}
+
+
+class FacetIndexRefreshTests(TestCase):
+    def setUp(self):
+        self.color = Attribute.objects.create(name='Color', is_filterable=True)
+        self.red = AttributeValue.objects.create(attribute=self.color, value='Red')
+        self.lamp = Product.objects.create(name='Lamp', sku='LAMP-1')
+        ProductAttribute.objects.create(product=self.lamp, attribute=self.color, attribute_value=self.red)
+
+    def red_count(self, index):
+        facets = index.facets({})
+        return facets[0]['values'][0]['count'] if facets else 0
+
+    def write_elsewhere(self):
+        # Another worker's write: it reaches the database but not this process's journal
+        other = Product.objects.create(name='Shade', sku='SHADE-1')
+        ProductAttribute.objects.bulk_create([
+            ProductAttribute(product=other, attribute=self.color, attribute_value=self.red),
+        ])
+
+    @override_settings(FACETS={'REBUILD_INTERVAL': 0})
+    def test_per_process_journal_rebuilds_on_a_timer(self):
+        index = FacetIndex()
+        self.assertEqual(self.red_count(index), 1)
+        self.write_elsewhere()
+        self.assertEqual(self.red_count(index), 2)
+
+    @override_settings(FACETS={'REBUILD_INTERVAL': 3600})
+    def test_per_process_journal_keeps_the_index_within_the_interval(self):
+        index = FacetIndex()
+        self.assertEqual(self.red_count(index), 1)
+        self.write_elsewhere()
+        self.assertEqual(self.red_count(index), 1)
+
+
+class CategoryFilterTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_superuser('admin@example.com', 'pw'))
+        self.home = Category.objects.create(name='Home')
+        self.lighting = Category.objects.create(name='Lighting', parent=self.home)
+        self.lamp = Product.objects.create(name='Lamp', sku='LAMP-1', category=self.lighting)
+        refresh_cards([self.lamp.pk])
+
+    def names(self, path, **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['name'] for row in response.json()['results']]
+
+    def test_category_ids_that_are_not_uuids_match_nothing(self):
+        for path in ('/api/products/', '/api/product-cards/'):
+            self.assertEqual(self.names(path, category='lighting'), [])
+            self.assertEqual(self.names(path, category='lighting', include_descendants='true'), [])
+            self.assertEqual(self.names(path, brand='acme'), [])
+
+    def test_include_descendants(self):
+        for path in ('/api/products/', '/api/product-cards/'):
+            self.assertEqual(self.names(path, category=self.home.pk), [])
+            self.assertEqual(self.names(path, category=self.home.pk, include_descendants='true'), ['Lamp'])
+
+    def test_reparent_rewrites_the_paths_below(self):
+        office = Category.objects.create(name='Office')
+        desk = Category.objects.create(name='Desk lamps', parent=self.lighting)
+
+        self.lighting.parent = office
+        self.lighting.save()
+
+        self.lighting.refresh_from_db()
+        desk.refresh_from_db()
+        self.assertEqual(self.lighting.path, office.path + self.lighting.path_segment)
+        self.assertEqual(desk.path, self.lighting.path + desk.path_segment)
+        self.assertEqual(ProductCard.objects.get(product=self.lamp).category_path, self.lighting.path)
+
+        for path in ('/api/products/', '/api/product-cards/'):
+            self.assertEqual(self.names(path, category=office.pk, include_descendants='true'), ['Lamp'])
+            self.assertEqual(self.names(path, category=self.home.pk, include_descendants='true'), [])
+
+    def test_moving_under_a_descendant_is_refused(self):
+        with self.assertRaises(ValueError):
+            self.home.parent = self.lighting
+            self.home.save()
+
+    def test_deep_trees(self):
+        parent = self.lighting
+        for level in range(40):
+            parent = Category.objects.create(name=f'Level {level}', parent=parent)
+        lamp = Product.objects.create(name='Deep lamp', sku='LAMP-2', category=parent)
+        refresh_cards([lamp.pk])
+
+        parent.refresh_from_db()
+        self.assertEqual(parent.depth, 41)
+        self.assertEqual(ProductCard.objects.get(product=lamp).category_path, parent.path)
+        for path in ('/api/products/', '/api/product-cards/'):
+            self.assertEqual(
+                sorted(self.names(path, category=self.home.pk, include_descendants='true')), ['Deep lamp', 'Lamp']
+            )
+
+    def test_tree_sorts_roots_and_children_by_name(self):
+        for name in ('Wall lights', 'Ceiling lights', 'desk lamps'):
+            Category.objects.create(name=name, parent=self.lighting)
+        Category.objects.create(name='Garden')
+        Category.objects.create(name='Attic')
+
+        tree = self.client.get('/api/categories/tree/').json()
+        self.assertEqual([node['name'] for node in tree], ['Attic', 'Garden', 'Home'])
+        lighting = tree[2]['children'][0]
+        self.assertEqual([node['name'] for node in lighting['children']], ['Ceiling lights', 'desk lamps', 'Wall lights'])
+        self.assertEqual(tree[2]['total_product_count'], 1)
+
+
+class AutocompletePermissionTests(APITestCase):
+    def setUp(self):
+        self.role = Role.objects.create(name='Shopper')
+        self.read = PermissionType.objects.create(name='Read', code='r')
+        self.product = AppModel.objects.create(name='Product', verbose_name='Product', app_label='catalog')
+        Product.objects.create(name='Lamp', sku='LAMP-1', status='active', is_active=True)
+
+    def token(self, user):
+        response = self.client.post('/api/login/', {'email': user.email, 'password': 'pw'})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['access']
+
+    def user(self, email, role=None):
+        user = User.objects.create_user(email=email, password='pw', is_active=True)
+        if role is not None:
+            UserRole.objects.create(user=user, role=role)
+        return user
+
+    def complete(self, token):
+        return self.client.get('/api/autocomplete/', {'q': 'la'}, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_product_read_from_the_token_claims(self):
+        RoleModelPermission.objects.create(role=self.role, model=self.product, permission_type=self.read)
+        token = self.token(self.user('shopper@example.com', self.role))
+        self.assertEqual(self.complete(token).status_code, 200)
+        # A keystroke runs no SQL: claims, compiled matrix and index are all in memory
+        with self.assertNumQueries(0):
+            self.assertEqual(self.complete(token).status_code, 200)
+
+    def test_role_without_product_read_is_refused(self):
+        token = self.token(self.user('shopper@example.com', self.role))
+        self.assertEqual(self.complete(token).status_code, 403)
+
+    def test_revoked_product_read_is_refused(self):
+        grant = RoleModelPermission.objects.create(role=self.role, model=self.product, permission_type=self.read)
+        token = self.token(self.user('shopper@example.com', self.role))
+        grant.delete()
+        self.assertEqual(self.complete(token).status_code, 403)
+
+    def test_superuser(self):
+        admin = User.objects.create_superuser('admin@example.com', 'pw')
+        self.assertEqual(self.complete(self.token(admin)).status_code, 200)
+
+    def test_anonymous_is_refused(self):
+        response = self.client.get('/api/autocomplete/', {'q': 'la'})
+        self.assertIn(response.status_code, (401, 403))
+
+
+class ProductCardRefreshTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lamp = Product.objects.create(name='Lamp', sku='LAMP-1')
+        self.warehouse = Warehouse.objects.create(name='Main')
+
+    def card(self):
+        return ProductCard.objects.get(product=self.lamp)
+
+    def test_product_write_creates_the_card(self):
+        card = self.card()
+        self.assertEqual((card.name, card.available, card.review_count), ('Lamp', 0, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lamp.name = 'Desk lamp'
+            self.lamp.save()
+        self.assertEqual(self.card().name, 'Desk lamp')
+
+    def test_price_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            price = ProductPrice.objects.create(product=self.lamp, price=Decimal('25.00'), currency='EUR')
+        self.assertEqual((self.card().min_price, self.card().currency), (Decimal('25.00'), 'EUR'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            price.price = Decimal('19.50')
+            price.save()
+        self.assertEqual(self.card().min_price, Decimal('19.50'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            price.delete()
+        self.assertIsNone(self.card().min_price)
+
+    def test_stock_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            stock = Stock.objects.create(product=self.lamp, warehouse=self.warehouse, quantity=5, reserved_quantity=2)
+        self.assertEqual((self.card().available, self.card().in_stock), (3, True))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            stock.reserved_quantity = 5
+            stock.save()
+        self.assertEqual((self.card().available, self.card().in_stock), (0, False))
+
+    def test_review_writes(self):
+        reviewer = User.objects.create_user(email='reviewer@example.com', password='pw')
+        critic = User.objects.create_user(email='critic@example.com', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            review = ProductReview.objects.create(product=self.lamp, user=reviewer, rating=4, is_approved=True)
+            ProductReview.objects.create(product=self.lamp, user=critic, rating=1)   # not approved yet
+        self.assertEqual((self.card().rating_average, self.card().review_count), (Decimal('4.00'), 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            review.delete()
+        self.assertEqual((self.card().rating_average, self.card().review_count), (None, 0))
+
+
+@override_settings(AUDIT_LOG=UNBUFFERED_AUDIT_LOG)
+class ApiCreateTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin@example.com', 'pw')
+        self.client.force_authenticate(self.admin)
+
+    def create(self, path, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(path, data, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+    def test_product(self):
+        brand = Brand.objects.create(name='Acme')
+        data = self.create('/api/products/', {'name': 'Lamp', 'sku': 'LAMP-1', 'brand_id': str(brand.pk)})
+        product = Product.objects.get(pk=data['id'])
+        self.assertEqual(ProductCard.objects.get(product=product).brand_name, 'Acme')
+        self.assertTrue(AuditLog.objects.filter(object_id=str(product.pk), action='create', user=self.admin).exists())
+
+    def test_brand(self):
+        data = self.create('/api/brands/', {'name': 'Acme'})
+        self.assertEqual(data['slug'], 'acme')
+
+    def test_category(self):
+        home = Category.objects.create(name='Home')
+        data = self.create('/api/categories/', {'name': 'Lighting', 'parent_id': str(home.pk)})
+        lighting = Category.objects.get(pk=data['id'])
+        self.assertEqual(lighting.path, home.path + lighting.path_segment)
+
+
+@override_settings(AUDIT_LOG=UNBUFFERED_AUDIT_LOG)
+class ApiCardRefreshTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_superuser('admin@example.com', 'pw'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lamp = Product.objects.create(name='Lamp', sku='LAMP-1')
+        self.warehouse = Warehouse.objects.create(name='Main')
+
+    def write(self, method, path, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(path, data, format='json')
+        self.assertIn(response.status_code, (200, 201), response.content)
+        return ProductCard.objects.get(product=self.lamp)
+
+    def test_variant(self):
+        card = self.write('post', '/api/variants/', {'product': self.lamp.slug, 'sku': 'LAMP-1-RED', 'price': '30.00'})
+        self.assertEqual(card.min_price, Decimal('30.00'))
+
+    def test_price(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            price = ProductPrice.objects.create(product=self.lamp, price=Decimal('25.00'), currency='EUR')
+
+        # The API writes warehouse prices; the card shows the global one
+        card = self.write('post', '/api/product-prices/', {
+            'product_slug': self.lamp.slug, 'warehouse_slug': self.warehouse.slug, 'price': '21.00', 'currency': 'EUR',
+        })
+        self.assertEqual((card.min_price, card.currency), (Decimal('25.00'), 'EUR'))
+
+        card = self.write('patch', f'/api/product-prices/{price.pk}/', {'price': '19.50'})
+        self.assertEqual(card.min_price, Decimal('19.50'))
+
+    def test_stock(self):
+        card = self.write('post', '/api/stocks/', {
+            'product_slug': self.lamp.slug, 'warehouse_slug': self.warehouse.slug, 'quantity': 5,
+        })
+        self.assertEqual((card.available, card.in_stock), (5, True))
+
+    def test_review(self):
+        reviewer = User.objects.create_user(email='reviewer@example.com', password='pw')
+        card = self.write('post', '/api/reviews/', {
+            'product': str(self.lamp.pk), 'user': str(reviewer.pk), 'rating': 5, 'is_approved': True,
+        })
+        self.assertEqual((card.rating_average, card.review_count), (Decimal('5.00'), 1))
+
+    def test_brand(self):
+        self.client.post('/api/brands/', {'name': 'Acme'}, format='json')
+        brand = Brand.objects.get(name='Acme')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lamp.brand = brand
+            self.lamp.save()
+
+        card = self.write('patch', f'/api/brands/{brand.slug}/', {'name': 'Acme Lighting'})
+        self.assertEqual(card.brand_name, 'Acme Lighting')
+
+    def test_media(self):
+        # Media has no endpoint of its own; it is written through the admin inline
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductMedia.objects.create(product=self.lamp, media='product/lamp.jpg', alt_text='Lamp', is_primary=True)
+        card = ProductCard.objects.get(product=self.lamp)
+        self.assertEqual((card.image.name, card.image_alt), ('product/lamp.jpg', 'Lamp'))
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class ProductDocumentPromotionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_superuser('admin@example.com', 'pw'))
+        self.lamp = Product.objects.create(name='Lamp', sku='LAMP-1')
+        ProductPrice.objects.create(product=self.lamp, price=Decimal('40.00'), currency='EUR')
+        self.now = timezone.now()
+
+    def promote(self, discount_value='25', starts=None, ends=None, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            promotion = Promotion.objects.create(
+                name=kwargs.pop('name', 'Spring'), discount_type='percentage', discount_value=Decimal(discount_value),
+                start_date=starts or self.now - timedelta(days=1), end_date=ends or self.now + timedelta(days=1),
+            )
+            promotion.products.add(self.lamp)
+        return promotion
+
+    def document(self):
+        response = self.client.get(f'/api/products/{self.lamp.slug}/document/')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_running_promotion_prices_the_document_like_the_card(self):
+        promotion = self.promote()
+        Variant.objects.create(product=self.lamp, sku='LAMP-1-RED', price=Decimal('30.00'))
+
+        document, refresh_at = build_product_document(self.lamp, self.now)
+        self.assertEqual(document['price']['min'], '40.00')
+        self.assertEqual(document['price']['promotion_price'], '30.00')
+        self.assertEqual(document['price']['promotion_ends_at'], promotion.end_date)
+        self.assertEqual(document['variants'][0]['promotion_price'], '30.00')
+        self.assertEqual(refresh_at, promotion.end_date)
+
+        refresh_cards([self.lamp.pk])
+        card = ProductCard.objects.get(product=self.lamp)
+        self.assertEqual(card.promotion_price, Decimal(document['price']['promotion_price']))
+
+    def test_promotion_not_started_leaves_the_price(self):
+        starts = self.now + timedelta(hours=1)
+        self.promote(starts=starts)
+        document, refresh_at = build_product_document(self.lamp, self.now)
+        self.assertIsNone(document['price']['promotion_price'])
+        self.assertEqual(refresh_at, starts)
+
+    def test_promotion_writes_bump_the_document_version(self):
+        version = document_version(self.lamp.pk)
+        promotion = self.promote()
+        self.assertNotEqual(document_version(self.lamp.pk), version)
+
+        for write in (
+            lambda: promotion.save(),
+            lambda: promotion.products.remove(self.lamp),
+            lambda: self.lamp.promotions.add(promotion),
+            lambda: promotion.products.clear(),
+            lambda: promotion.products.add(self.lamp),
+            lambda: promotion.delete(),
+        ):
+            version = document_version(self.lamp.pk)
+            with self.captureOnCommitCallbacks(execute=True):
+                write()
+            self.assertNotEqual(document_version(self.lamp.pk), version)
+
+    def test_promotion_change_changes_the_document(self):
+        promotion = self.promote()
+        first = self.document()
+        self.assertEqual(first.json()['price']['promotion_price'], '30.00')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            promotion.discount_value = Decimal('50')
+            promotion.save()
+        response = self.client.get(f'/api/products/{self.lamp.slug}/document/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['price']['promotion_price'], '20.00')
+
+    def test_document_cached_before_a_promotion_starts_is_replaced(self):
+        self.promote(starts=self.now + timedelta(hours=1))
+        first = self.document()
+        self.assertIsNone(first.json()['price']['promotion_price'])
+        self.assertEqual(self.document()['ETag'], first['ETag'])
+
+        # Nothing is written when the promotion starts
+        later = self.now + timedelta(hours=2)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            response = self.client.get(f'/api/products/{self.lamp.slug}/document/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response.json()['price']['promotion_price'], '30.00')
@@ -0,0 +1,88 @@
+import hashlib
+import json
+
+from django.db.models import Count
+from MBP.response_cache import (
+    generations, response_cache_backend, response_cache_enabled, response_cache_setting, watch_model,
+)
+from .models import Category, Product
+
+TREE_MODELS = (Category, Product)
+TREE_KEY = 'catalog:category-tree:{}'
+
+for model in TREE_MODELS:
+    watch_model(model)
+
+
+def build_category_tree():
+    """
+    Every category nested under its parent, with the number of active products
+    filed directly under it and under its whole subtree. Roots and the children
+    of each category are sorted by name. Two queries.
+    """
+    counts = dict(
+        Product.objects.filter(is_active=True, category__isnull=False).order_by()
+        .values_list('category_id').annotate(count=Count('id'))
+    )
+    rows = list(Category.objects.order_by('path').values('id', 'name', 'slug', 'is_active', 'parent_id'))
+    nodes = {}
+    for row in rows:
+        count = counts.get(row['id'], 0)
+        nodes[row['id']] = {
+            'id': row['id'], 'name': row['name'], 'slug': row['slug'], 'is_active': row['is_active'],
+            'product_count': count, 'total_product_count': count, 'children': [],
+        }
+
+    roots = []
+    for row in rows:
+        parent = nodes.get(row['parent_id'])
+        (parent['children'] if parent else roots).append(nodes[row['id']])
+    # Path order puts every category after its ancestors, so children are summed before their parent
+    for row in reversed(rows):
+        parent = nodes.get(row['parent_id'])
+        if parent:
+            parent['total_product_count'] += nodes[row['id']]['total_product_count']
+
+    def by_name(node):
+        return node['name'].casefold(), node['name'], node['slug']
+
+    roots.sort(key=by_name)
+    for node in nodes.values():
+        node['children'].sort(key=by_name)
+    return roots
+
+
+def category_tree():
+    """build_category_tree(), cached in the response cache until a category or product changes."""
+    if not response_cache_enabled():
+        return build_category_tree()
+    backend = response_cache_backend()
+    key = TREE_KEY.format(hashlib.sha1(json.dumps(generations(TREE_MODELS)).encode()).hexdigest())
+    tree = backend.get(key)
+    if tree is None:
+        tree = build_category_tree()
+        backend.set(key, tree, response_cache_setting('TIMEOUT'))
+    return tree
+
+
+def rebuild_category_paths(batch_size=1000):
+    """
+    Recompute every path from the parent links, for rows written before paths
+    existed or with QuerySet.update(). Returns (updated, unreachable); the
+    unreachable categories sit on a parent cycle and keep their path.
+    """
+    rows = list(Category.objects.values_list('id', 'parent_id', 'path'))
+    children = {}
+    for pk, parent_id, _ in rows:
+        children.setdefault(parent_id, []).append(pk)
+
+    paths = {}
+    pending = [(pk, '') for pk in children.get(None, [])]
+    while pending:
+        pk, parent_path = pending.pop()
+        paths[pk] = f'{parent_path}{pk.hex}/'
+        pending.extend((child, paths[pk]) for child in children.get(pk, []))
+
+    changed = [Category(pk=pk, path=paths[pk]) for pk, _, path in rows if pk in paths and paths[pk] != path]
+    Category.objects.bulk_update(changed, ['path'], batch_size=batch_size)
+    return len(changed), len(rows) - len(paths)
@@ -4,7 +4,7 @@ from .views import (
     AttributeViewSet, AttributeValueViewSet,
     ProductAttributeViewSet, VariantViewSet,
     VariantAttributeViewSet, BundleItemViewSet,
-    ProductViewSet, CategoryViewSet, BrandViewSet
+    ProductViewSet, ProductCardViewSet, CategoryViewSet, BrandViewSet, AutocompleteView
 )
 
 router = DefaultRouter()
@@ -13,6 +13,7 @@ router = DefaultRouter()
 router.register(r'categories', CategoryViewSet, basename="category")
 router.register(r'brands', BrandViewSet, basename="brand")
 router.register(r'products', ProductViewSet, basename="product")
+router.register(r'product-cards', ProductCardViewSet, basename="productcard")
 router.register(r'attributes', AttributeViewSet, basename="attribute")
 router.register(r'attribute-values', AttributeValueViewSet, basename="attributevalue")
 router.register(r'product-attributes', ProductAttributeViewSet, basename="productattribute")
@@ -21,5 +22,6 @@ router.register(r'variant-attributes', VariantAttributeViewSet, basename="varian
 router.register(r'bundle-items', BundleItemViewSet, basename="bundleitem")
 
 urlpatterns = [
+    path('api/autocomplete/', AutocompleteView.as_view(), name='autocomplete'),
     path('api/', include(router.urls)),
 ]
@@ -1,16 +1,28 @@
+from MBP.conditional import not_modified
+from MBP.permissions import HasModelPermission
 from MBP.views import ProtectedModelViewSet
 from rest_framework import filters
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
 
 from .models import (
     Attribute, AttributeValue, ProductAttribute,
-    Variant, VariantAttribute, BundleItem, Product, Category, Brand
+    Variant, VariantAttribute, BundleItem, Product, ProductCard, Category, Brand
 )
 from .serializers import (
     AttributeSerializer, AttributeValueSerializer,
     ProductAttributeSerializer, VariantSerializer,
     VariantAttributeSerializer, BundleItemSerializer,
-    ProductSerializer, CategorySerializer, BrandSerializer
+    ProductSerializer, ProductCardSerializer, CategorySerializer, BrandSerializer
 )
+from .tree import category_tree
+from .facets import attribute_filter, attribute_params, facet_index, facet_setting, parse_uuid
+from .search import FALLBACK_SEARCH_FIELDS, ProductSearchFilter, search_log
+from .autocomplete import autocomplete, autocomplete_setting
+from .document import product_document
 
 
 # ------------------ Category ------------------
@@ -18,55 +30,155 @@ class CategoryViewSet(ProtectedModelViewSet):
     queryset = Category.objects.all().order_by("name")
     serializer_class = CategorySerializer
     model_name = "Category"
+    cache_responses = True
     lookup_field = "slug"
 
+    @action(detail=False, methods=['get'])
+    def tree(self, request):
+        """The whole category tree with direct and subtree product counts."""
+        return Response(category_tree())
+
 # ------------------ Brand ------------------
 class BrandViewSet(ProtectedModelViewSet):  
     queryset = Brand.objects.all().order_by("name")
     serializer_class = BrandSerializer
     model_name = "Brand"
+    cache_responses = True
     lookup_field = "slug"
     
 # ------------------ Product ------------------
-class ProductViewSet(ProtectedModelViewSet):
-    queryset = Product.objects.select_related("category", "brand").all().order_by("-created_at")
-    serializer_class = ProductSerializer
-    model_name = "Product"
-    lookup_field = "slug" 
-
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ["name", "slug", "sku", "short_description", "description"]
-    ordering_fields = ["created_at", "updated_at", "name"]
-    ordering = ["-created_at"]
+class ProductListingMixin:
+    """?status, ?category (with ?include_descendants), ?brand, ?is_active and attr[...] filters of product listings."""
+    category_path_lookup = "category__path__startswith"
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = self.filter_products(super().get_queryset())
+        attributes = attribute_params(self.request.query_params)
+        if attributes:
+            queryset = queryset.filter(attribute_filter(attributes))
+        return queryset
 
+    def filter_products(self, queryset):
         # Query params for filtering
         status = self.request.query_params.get("status")
         category = self.request.query_params.get("category")
         brand = self.request.query_params.get("brand")
         is_active = self.request.query_params.get("is_active")
+        include_descendants = self.request.query_params.get("include_descendants", "").lower() == "true"
 
         if status:
             queryset = queryset.filter(status=status)
 
+        # Ids that are not UUIDs match nothing, like ids of deleted rows
         if category:
-            queryset = queryset.filter(category__id=category)
+            category = parse_uuid(category)
+            if category is None:
+                queryset = queryset.none()
+            elif include_descendants:
+                # A primary key lookup, then a prefix range on the category path index
+                path = Category.objects.filter(id=category).values_list("path", flat=True).first()
+                queryset = queryset.filter(**{self.category_path_lookup: path}) if path else queryset.none()
+            else:
+                queryset = queryset.filter(category_id=category)
 
         if brand:
-            queryset = queryset.filter(brand__id=brand)
+            brand = parse_uuid(brand)
+            queryset = queryset.filter(brand_id=brand) if brand is not None else queryset.none()
 
         if is_active is not None:
             queryset = queryset.filter(is_active=is_active.lower() == "true")
 
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if response.status_code < 400:
+            search_log.record_search(request)
+        return response
+
+
+class ProductViewSet(ProductListingMixin, ProtectedModelViewSet):
+    queryset = Product.objects.select_related("category", "brand").all().order_by("-created_at")
+    serializer_class = ProductSerializer
+    model_name = "Product"
+    replica_actions = ("list", "retrieve", "document")
+    lookup_field = "slug" 
+    cache_responses = True
+    # attr[...] filters and facet counts read these
+    cache_depends_on = (
+        "catalog.ProductAttribute", "catalog.VariantAttribute", "catalog.AttributeValue", "catalog.Attribute",
+    )
+
+    # ?search= runs on the full-text index, best match first unless ?ordering= is given
+    filter_backends = [filters.OrderingFilter, ProductSearchFilter]
+    search_fields = FALLBACK_SEARCH_FIELDS
+    ordering_fields = ["created_at", "updated_at", "name"]
+    ordering = ["-created_at"]
+
+    def render_list(self, request, *args, **kwargs):
+        response = super().render_list(request, *args, **kwargs)
+        if request.query_params.get("facets", "").lower() == "true" and facet_setting("ENABLED") \
+                and response.status_code == 200 and isinstance(response.data, dict):
+            response.data["facets"] = self.facet_counts()
+        return response
+
+    @action(detail=True, methods=["get"])
+    def document(self, request, *args, **kwargs):
+        """
+        The whole product page in one response: variants with axis values,
+        attributes, media, effective prices, availability and rating summary.
+        Cached per product version (see catalog.document).
+        """
+        product = self.get_object()
+        document, etag = product_document(product)
+        return not_modified(request, etag) or Response(document, headers={"ETag": etag})
+
+    def facet_counts(self):
+        """Facets of the current result set, from the in-memory index (see catalog.facets)."""
+        params = self.request.query_params
+        attributes = attribute_params(params)
+        if params.get("brand") or params.get("search"):
+            # Not indexed: the rest of the result set comes from the database
+            queryset = self.filter_queryset(self.filter_products(super().get_queryset()))
+            return facet_index.facets(attributes, product_ids=queryset.order_by().values_list("pk", flat=True))
+
+        is_active = params.get("is_active")
+        category = params.get("category")
+        return facet_index.facets(
+            attributes,
+            category=parse_uuid(category) if category else None,
+            include_descendants=params.get("include_descendants", "").lower() == "true",
+            status=params.get("status"),
+            is_active=is_active.lower() == "true" if is_active is not None else None,
+        )
+
+# ------------------ ProductCard ------------------
+class ProductCardViewSet(ProductListingMixin, ProtectedModelViewSet):
+    """
+    The storefront grid: read-only listings served from the ProductCard
+    table alone, with the filters of the product list. See catalog.cards.
+    """
+    queryset = ProductCard.objects.all().order_by("-created_at")
+    serializer_class = ProductCardSerializer
+    model_name = "Product"
+    http_method_names = ["get", "head", "options"]
+    category_path_lookup = "category_path__startswith"
+    cache_responses = True
+    cache_depends_on = (
+        "catalog.ProductAttribute", "catalog.VariantAttribute", "catalog.AttributeValue", "catalog.Attribute",
+    )
+
+    filter_backends = [filters.OrderingFilter, ProductSearchFilter]
+    search_fields = ["name", "slug", "sku"]
+    ordering_fields = ["created_at", "name", "min_price", "rating_average"]
+    ordering = ["-created_at"]
+
 # ------------------ Attribute ------------------
 class AttributeViewSet(ProtectedModelViewSet):
     queryset = Attribute.objects.all().order_by("name")
     serializer_class = AttributeSerializer
     model_name = "Attribute"
+    cache_responses = True
     lookup_field = "slug"
 
 
@@ -104,7 +216,33 @@ class VariantAttributeViewSet(ProtectedModelViewSet):
 
 # ------------------ BundleItem ------------------
 class BundleItemViewSet(ProtectedModelViewSet):
-    queryset = BundleItem.objects.select_related("bundle", "product").all()
+    queryset = BundleItem.objects.select_related("bundle", "child_product").all()
     serializer_class = BundleItemSerializer
     model_name = "BundleItem"
-    lookup_field = "id"  # No slug → use ID
\ No newline at end of file
+    lookup_field = "id"  # No slug → use ID
+
+
+# ------------------ Autocomplete ------------------
+class AutocompleteView(APIView):
+    """
+    Typeahead suggestions for ?q= (products, brands, categories and popular
+    searches) from the in-process index in catalog.autocomplete.
+    """
+    # The token is verified without loading the user, and Product read is
+    # checked against its permission claims: a keystroke reads at most the
+    # permission matrix version, never the user
+    authentication_classes = [JWTStatelessUserAuthentication]
+    permission_classes = [HasModelPermission]
+    model_name = "Product"
+    permission_code = "r"
+
+    def get(self, request):
+        if not autocomplete_setting("ENABLED"):
+            raise NotFound("Autocomplete is disabled.")
+        query = request.query_params.get("q", "")
+        try:
+            limit = int(request.query_params.get("limit", autocomplete_setting("LIMIT")))
+        except ValueError:
+            limit = autocomplete_setting("LIMIT")
+        limit = max(1, min(limit, autocomplete_setting("MAX_LIMIT")))
+        return Response({"query": query, "results": autocomplete.complete(query, limit)})
@@ -62,8 +62,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # SQL count/time per request, Server-Timing and N+1 flags; outermost so it sees every query
+    'MBP.middleware.QueryStatsMiddleware',
+    # per-request read replica routing and read-your-writes pinning
+    'MBP.middleware.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # brotli (if installed) or gzip for responses over 1 KB; keep above anything that edits the body
+    'MBP.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -102,6 +108,43 @@ DATABASES = {
     }
 }
 
+# Read replicas for ProtectedModelViewSet list/retrieve, e.g. DB_REPLICAS=replica.sqlite3
+# (comma separated). A copy of db.sqlite3 works as a snapshot replica for local testing.
+for number, replica_path in enumerate(filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / replica_path.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['MBP.db_router.ReplicaRouter']
+
+# Shared between workers, e.g. REDIS_URL=redis://localhost:6379/0. Without it every
+# process has its own LocMem cache: read replicas refuse to start (a user's
+# read-your-writes pin must be seen by whichever worker serves the next request)
+# the response cache stays off and facet indexes rebuild on a timer.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+DATABASE_REPLICAS = {
+    'REPLICAS': None,            # None: every alias in DATABASES other than default
+    'PIN_SECONDS': 5.0,          # read-your-writes window after a user's write
+    'MAX_LAG_SECONDS': None,     # e.g. 2.0 to skip lagging Postgres replicas; None: no lag checks
+    'LAG_CHECK_INTERVAL': 5.0,
+    'CACHE': 'default',          # read-your-writes pins; must be a shared backend when replicas are set
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -165,6 +208,19 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # Keyset cursors on each list's own ordering; ?page_size= is capped at 500
+    'DEFAULT_PAGINATION_CLASS': 'MBP.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+    # orjson-backed when orjson is installed, stdlib json otherwise
+    'DEFAULT_RENDERER_CLASSES': (
+        'MBP.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'MBP.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 SWAGGER_SETTINGS = {
@@ -192,6 +248,85 @@ SIMPLE_JWT = {
     "TOKEN_BLACKLIST_ENABLED": True,
 }
 
+PERMISSION_MATRIX = {
+    # Seconds a worker serves checks from its compiled matrix before re-reading the
+    # shared version; permission changes made on other workers apply within this
+    'VERSION_TTL': 1.0,
+}
+
+AUDIT_LOG = {
+    'BUFFERED': True,       # write audit rows in batches from a background thread
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 2.0,  # seconds
+    'MAX_QUEUE': 10000,     # entries beyond this are dropped and counted
+    'DELTA': True,          # store only the changed fields of updates
+    'ARCHIVE_DIR': BASE_DIR / 'audit_archive',  # cold segments written by archive_audit_logs
+    'ARCHIVE_AFTER_DAYS': 90,
+    # Models whose writes through ProtectedModelViewSet are audited. High-volume
+    # rows (UserActivity, SearchQuery, Recommendation, CartItem) are left out on purpose.
+    'MODELS': (
+        'MBP.RoleCategory', 'MBP.Role', 'MBP.AppModel', 'MBP.PermissionType', 'MBP.RoleModelPermission',
+        'accounts.User', 'accounts.UserRole', 'accounts.Address', 'accounts.UserProfile',
+        'catalog.Category', 'catalog.Brand', 'catalog.Product', 'catalog.Attribute', 'catalog.AttributeValue',
+        'catalog.ProductAttribute', 'catalog.Variant', 'catalog.VariantAttribute', 'catalog.BundleItem',
+        'inventory.Warehouse', 'inventory.Stock', 'inventory.ProductPrice', 'inventory.StockTransaction',
+        'purchasing.Supplier', 'purchasing.PurchaseOrder', 'purchasing.PurchaseOrderItem', 'purchasing.GoodsReceipt',
+        'sales.Customer', 'sales.SalesOrder', 'sales.SalesOrderItem', 'sales.SalesPayment',
+        'sales.SalesShipment', 'sales.SalesInvoice',
+        'orders.Cart', 'orders.Order', 'orders.OrderItem', 'orders.Payment', 'orders.Refund', 'orders.OrderInvoice',
+        'reviews.ProductReview', 'reviews.ReviewComment', 'reviews.ProductQuestion', 'reviews.ProductAnswer',
+        'reviews.ContentEngagement',
+        'wishlist_compare.Wishlist', 'wishlist_compare.WishlistItem',
+        'wishlist_compare.CompareList', 'wishlist_compare.CompareItem',
+        'promotions.Coupon', 'promotions.GiftCard', 'promotions.Promotion',
+        'shipments.ShippingMethod', 'shipments.ShippingAddress', 'shipments.Shipment',
+        'notification_commucation_support.Notification', 'notification_commucation_support.Message',
+        'notification_commucation_support.SupportTicket',
+    ),
+}
+
+RESPONSE_CACHE = {
+    'ENABLED': True,           # viewsets opt in with cache_responses = True; needs a shared CACHE
+    'CACHE': 'default',        # per-process (LocMem) backends keep the response cache off
+    'TIMEOUT': 300,
+    'FILL_LOCK_TIMEOUT': 10,   # concurrent misses wait for the first one to fill the entry
+    'FILL_WAIT': 5.0,
+}
+
+FACETS = {
+    'ENABLED': True,              # ?facets=true on /api/products/ adds per-value counts
+    'CACHE': 'default',           # change journal read by every worker's in-memory index; should be shared
+    'REBUILD_INTERVAL': 60,       # with a per-process CACHE, indexes rebuild this often to see other workers' writes
+    'JOURNAL_TIMEOUT': 3600,
+    'MAX_JOURNAL_GAP': 5000,      # workers further behind rebuild their index from the database
+}
+
+PRODUCT_SEARCH = {
+    'ENABLED': True,              # ?search= on /api/products/ uses the FTS5 / tsvector index
+    'LANGUAGE': 'english',        # PostgreSQL text search configuration
+    'LOG_QUERIES': True,          # first pages of searches are saved as SearchQuery rows
+    'BUFFERED': True,             # written in batches from a background thread, like AUDIT_LOG
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 2.0,
+    'MAX_QUEUE': 10000,
+}
+
+AUTOCOMPLETE = {
+    'ENABLED': True,              # /api/autocomplete/?q= from a per-process in-memory index
+    'REFRESH_INTERVAL': 300,      # seconds; rebuilt in a background thread and swapped in
+    'LIMIT': 10,
+    'MAX_LIMIT': 50,
+    'MIN_QUERY_COUNT': 2,         # past searches are suggested once made this often
+}
+
+QUERY_STATS = {
+    'ENABLED': True,
+    'WINDOW': 200,                # recent requests per endpoint used for p95
+    'MAX_ENDPOINTS': 500,
+    'N_PLUS_ONE_THRESHOLD': 5,    # same statement shape this many times in one request
+    'SERVER_TIMING': None,        # None: header only under DEBUG or for staff users
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
@@ -1,10 +1,10 @@
 import uuid
 from django.db import models
-from django.utils.text import slugify
+from MBP.slugs import UniqueSlugMixin
 from catalog.models import Product, Variant
 
 
-class Warehouse(models.Model):
+class Warehouse(UniqueSlugMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=200, unique=True)
     slug = models.SlugField(unique=True, blank=True)
@@ -22,21 +22,13 @@ class Warehouse(models.Model):
         verbose_name = "Warehouse"
         verbose_name_plural = "Warehouses"
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.name)
-            slug = base_slug
-            counter = 1
-            while Warehouse.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return self.name
 
     def __str__(self):
         return self.name
 
-class Stock(models.Model):
+class Stock(UniqueSlugMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     slug = models.SlugField(unique=True, blank=True)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock')
@@ -56,21 +48,13 @@ class Stock(models.Model):
         verbose_name_plural = "Stocks"
         unique_together = ('product', 'variant', 'warehouse')
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(f"{self.product.name}-{self.variant or 'default'}-{self.warehouse.name}")
-            slug = base_slug
-            counter = 1
-            while Stock.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return f"{self.product.name}-{self.variant or 'default'}-{self.warehouse.name}"
 
     def __str__(self):
         return f"{self.product.name} - {self.variant or 'Default'} @ {self.warehouse.name}"
 
-class ProductPrice(models.Model):
+class ProductPrice(UniqueSlugMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     slug = models.SlugField(unique=True, blank=True)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='prices')
@@ -90,25 +74,17 @@ class ProductPrice(models.Model):
         verbose_name_plural = "Product Prices"
         unique_together = ('product', 'variant', 'warehouse')
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            target = self.variant or self.product
-            location = self.warehouse.name if self.warehouse else 'global'
-            base_slug = slugify(f"{target}-{location}-price")
-            slug = base_slug
-            counter = 1
-            while ProductPrice.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        target = self.variant or self.product
+        location = self.warehouse.name if self.warehouse else 'global'
+        return f"{target}-{location}-price"
 
     def __str__(self):
         target = self.variant or self.product
         location = self.warehouse.name if self.warehouse else "Global"
         return f"{target} - {location} Price: {self.price} {self.currency}"
 
-class StockTransaction(models.Model):
+class StockTransaction(UniqueSlugMixin, models.Model):
     TYPE_ADJUSTMENT = 'adjustment'
     TYPE_SALE = 'sale'
     TYPE_RETURN = 'return'
@@ -136,16 +112,8 @@ class StockTransaction(models.Model):
         verbose_name = "Stock Transaction"
         verbose_name_plural = "Stock Transactions"
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(f"{self.stock}-{self.type}-{self.quantity}")
-            slug = base_slug
-            counter = 1
-            while StockTransaction.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return f"{self.stock}-{self.type}-{self.quantity}"
 
     def __str__(self):
         return f"{self.type} - {self.quantity} units for {self.stock}"
@@ -1,10 +1,10 @@
 import uuid
 from django.db import models
-from django.utils.text import slugify
+from MBP.slugs import UniqueSlugMixin
 from accounts.models import User
 
 
-class Notification(models.Model):
+class Notification(UniqueSlugMixin, models.Model):
     TYPE_ORDER = "order"
     TYPE_PROMOTION = "promotion"
     TYPE_SYSTEM = "system"
@@ -32,19 +32,13 @@ class Notification(models.Model):
         verbose_name_plural = "Notifications"
         ordering = ["-created_at"]
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(f"{self.user.email}-{self.type}-{uuid.uuid4().hex[:6]}")
-            slug = base_slug
-            while Notification.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{uuid.uuid4().hex[:4]}"
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return f"{self.user.email}-{self.type}-{uuid.uuid4().hex[:6]}"
 
     def __str__(self):
         return f"Notification: {self.title} → {self.user.email}"
 
-class Message(models.Model):
+class Message(UniqueSlugMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name="sent_messages")
     receiver = models.ForeignKey(User, on_delete=models.CASCADE, related_name="received_messages")
@@ -60,19 +54,13 @@ class Message(models.Model):
         verbose_name_plural = "Messages"
         ordering = ["-created_at"]
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(f"{self.sender.email}-to-{self.receiver.email}-{uuid.uuid4().hex[:6]}")
-            slug = base_slug
-            while Message.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{uuid.uuid4().hex[:4]}"
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return f"{self.sender.email}-to-{self.receiver.email}-{uuid.uuid4().hex[:6]}"
 
     def __str__(self):
         return f"Message from {self.sender.email} to {self.receiver.email}"
 
-class SupportTicket(models.Model):
+class SupportTicket(UniqueSlugMixin, models.Model):
     STATUS_OPEN = "open"
     STATUS_IN_PROGRESS = "in_progress"
     STATUS_RESOLVED = "resolved"
@@ -105,14 +93,8 @@ class SupportTicket(models.Model):
         verbose_name_plural = "Support Tickets"
         ordering = ["-created_at"]
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(f"ticket-{self.user.email}-{uuid.uuid4().hex[:6]}")
-            slug = base_slug
-            while SupportTicket.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{uuid.uuid4().hex[:4]}"
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return f"ticket-{self.user.email}-{uuid.uuid4().hex[:6]}"
 
     def __str__(self):
         return f"Ticket {self.subject} ({self.status})"
@@ -3,11 +3,12 @@ from django.db import models
 from django.conf import settings
 from catalog.models import Product, Variant
 from django.utils.text import slugify
+from MBP.slugs import UniqueSlugMixin
 from django.contrib.auth import get_user_model
 User = get_user_model()
 
 
-class Cart(models.Model):
+class Cart(UniqueSlugMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     slug = models.SlugField(unique=True, blank=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="carts")
@@ -21,21 +22,13 @@ class Cart(models.Model):
         verbose_name = "Cart"
         verbose_name_plural = "Carts"
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(f"{self.user.full_name}-{self.id.hex[:6]}")
-            slug = base_slug
-            counter = 1
-            while Cart.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return f"{self.user.full_name}-{self.id.hex[:6]}"
 
     def __str__(self):
         return f"Cart ({self.user.full_name})"
 
-class CartItem(models.Model):
+class CartItem(UniqueSlugMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     slug = models.SlugField(unique=True, blank=True)
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="items")
@@ -53,15 +46,10 @@ class CartItem(models.Model):
         verbose_name_plural = "Cart Items"
         unique_together = ('cart', 'product', 'variant')
 
+    def slug_source(self):
+        return f"{self.product.name}-{self.cart.id.hex[:6]}"
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(f"{self.product.name}-{self.cart.id.hex[:6]}")
-            slug = base_slug
-            counter = 1
-            while CartItem.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
         # Auto-update total_price
         self.total_price = self.price * self.quantity
         super().save(*args, **kwargs)
@@ -148,7 +136,7 @@ from orders.models import Order
 from accounts.models import User
 
 
-class Payment(models.Model):
+class Payment(UniqueSlugMixin, models.Model):
     STATUS_CHOICES = [
         ("pending", "Pending"),
         ("completed", "Completed"),
@@ -183,21 +171,13 @@ class Payment(models.Model):
         verbose_name = "Payment"
         verbose_name_plural = "Payments"
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(f"payment-{self.order.slug}-{self.user.email}")
-            slug = base_slug
-            counter = 1
-            while Payment.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return f"payment-{self.order.slug}-{self.user.email}"
 
     def __str__(self):
         return f"{self.order.slug} - {self.method} - {self.status}"
 
-class Refund(models.Model):
+class Refund(UniqueSlugMixin, models.Model):
     STATUS_CHOICES = [
         ("pending", "Pending"),
         ("approved", "Approved"),
@@ -219,16 +199,8 @@ class Refund(models.Model):
         verbose_name = "Refund"
         verbose_name_plural = "Refunds"
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(f"refund-{self.payment.order.slug}")
-            slug = base_slug
-            counter = 1
-            while Refund.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return f"refund-{self.payment.order.slug}"
 
     def __str__(self):
         return f"Refund {self.slug} - {self.amount}"
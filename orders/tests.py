@@ -1,3 +1,113 @@
-from django.test import TestCase
+import tempfile
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from accounts.models import User, UserRole
+from MBP.models import AppModel, PermissionType, Role, RoleModelPermission
+from catalog.models import Product
+from .models import Cart, CartItem
+
+
+class CartExpandPermissionTests(APITestCase):
+    def setUp(self):
+        self.read = PermissionType.objects.create(name='Read', code='r')
+        self.role = Role.objects.create(name='Cart reader')
+        self.grant('Cart')
+        self.user = User.objects.create_user(email='reader@example.com', password='pw')
+        UserRole.objects.create(user=self.user, role=self.role)
+        self.owner = User.objects.create_user(email='owner@example.com', password='pw', full_name='Owner')
+        Cart.objects.create(user=self.owner)
+        self.client.force_authenticate(self.user)
+
+    def grant(self, model_name):
+        model = AppModel.objects.create(name=model_name, verbose_name=model_name, app_label='orders')
+        RoleModelPermission.objects.create(role=self.role, model=model, permission_type=self.read)
+
+    def test_expanding_needs_read_permission_on_the_related_model(self):
+        self.assertEqual(self.client.get('/api/carts/').status_code, 200)
+
+        response = self.client.get('/api/carts/', {'expand': 'user'})
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('owner@example.com', response.content.decode())
+
+    def test_expanding_with_read_permission(self):
+        self.grant('User')
+        response = self.client.get('/api/carts/', {'expand': 'user'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['user']['email'], 'owner@example.com')
+
+    def test_superuser_expands_anything(self):
+        self.client.force_authenticate(User.objects.create_superuser('admin@example.com', 'pw'))
+        response = self.client.get('/api/carts/', {'expand': 'user'})
+        self.assertEqual(response.status_code, 200)
+
+
+# Generations version ETags only when every worker shares them; a file cache stands in for Redis
+SHARED_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': tempfile.mkdtemp(prefix='orders-tests-'),
+}}
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class CartConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_superuser('admin@example.com', 'pw'))
+        owner = User.objects.create_user(email='owner@example.com', password='pw', full_name='Owner')
+        self.cart = Cart.objects.create(user=owner)
+        self.product = Product.objects.create(name='Lamp', sku='LAMP-1')
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=1, price=10)
+
+    def revalidate(self, path, etag, **params):
+        return self.client.get(path, params, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_cart_is_not_modified(self):
+        path = f'/api/carts/{self.cart.slug}/'
+        etag = self.client.get(path)['ETag']
+        self.assertEqual(self.revalidate(path, etag).status_code, 304)
+
+    def test_added_item_changes_the_cart_etag(self):
+        path = f'/api/carts/{self.cart.slug}/'
+        first = self.client.get(path)
+        self.assertEqual(first.json()['total_items'], 1)
+
+        other = Product.objects.create(name='Shade', sku='SHADE-1')
+        CartItem.objects.create(cart=self.cart, product=other, quantity=2, price=5)
+
+        response = self.revalidate(path, first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_items'], 3)
+
+    def test_item_change_changes_the_list_etag(self):
+        etag = self.client.get('/api/carts/')['ETag']
+        self.assertEqual(self.revalidate('/api/carts/', etag).status_code, 304)
+
+        item = CartItem.objects.get(cart=self.cart)
+        item.quantity = 4
+        item.save()
+
+        response = self.revalidate('/api/carts/', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['total_items'], 4)
+
+    def test_representation_parameters_are_part_of_the_etag(self):
+        etag = self.client.get('/api/carts/')['ETag']
+        for params in ({'fields': 'id,slug'}, {'expand': 'user'}, {'page_size': 1}):
+            self.assertEqual(self.revalidate('/api/carts/', etag, **params).status_code, 200, params)
+
+        path = f'/api/carts/{self.cart.slug}/'
+        etag = self.client.get(path)['ETag']
+        self.assertEqual(self.revalidate(path, etag, fields='id').status_code, 200)
+        self.assertEqual(self.revalidate(path, etag).status_code, 304)
+
+
+class CartConditionalGetWithoutSharedCacheTests(APITestCase):
+    def test_no_not_modified_for_data_read_from_other_models(self):
+        self.client.force_authenticate(User.objects.create_superuser('admin@example.com', 'pw'))
+        cart = Cart.objects.create(user=User.objects.create_user(email='owner@example.com', password='pw'))
+        path = f'/api/carts/{cart.slug}/'
+        etag = self.client.get(path)['ETag']
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -10,6 +10,8 @@ class CartViewSet(ProtectedModelViewSet):
     serializer_class = CartSerializer
     model_name = "Cart"
     lookup_field = "slug"
+    # total_items and total_price only read the items, which the ETag already covers
+    conditional_get = True
 
 
 class CartItemViewSet(ProtectedModelViewSet):
@@ -1,10 +1,10 @@
 import uuid
 from django.db import models
-from django.utils.text import slugify
+from MBP.slugs import UniqueSlugMixin
 from accounts.models import User
 
 
-class Coupon(models.Model):
+class Coupon(UniqueSlugMixin, models.Model):
     DISCOUNT_TYPE_CHOICES = [
         ("percentage", "Percentage"),
         ("fixed", "Fixed Amount"),
@@ -34,21 +34,13 @@ class Coupon(models.Model):
         verbose_name = "Coupon"
         verbose_name_plural = "Coupons"
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.code)
-            slug = base_slug
-            counter = 1
-            while Coupon.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return self.code
 
     def __str__(self):
         return f"{self.code} - {self.discount_type} {self.discount_value}"
 
-class GiftCard(models.Model):
+class GiftCard(UniqueSlugMixin, models.Model):
     STATUS_CHOICES = [
         ("active", "Active"),
         ("redeemed", "Redeemed"),
@@ -74,16 +66,8 @@ class GiftCard(models.Model):
         verbose_name = "Gift Card"
         verbose_name_plural = "Gift Cards"
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(f"giftcard-{self.code}")
-            slug = base_slug
-            counter = 1
-            while GiftCard.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return f"giftcard-{self.code}"
 
     def __str__(self):
         return f"GiftCard {self.code} - Balance {self.balance}"
@@ -91,7 +75,7 @@ class GiftCard(models.Model):
 from catalog.models import Product
 
 
-class Promotion(models.Model):
+class Promotion(UniqueSlugMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=200, unique=True)
     slug = models.SlugField(unique=True, blank=True)
@@ -113,16 +97,8 @@ class Promotion(models.Model):
         verbose_name = "Promotion"
         verbose_name_plural = "Promotions"
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.name)
-            slug = base_slug
-            counter = 1
-            while Promotion.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return self.name
 
     def __str__(self):
         return f"{self.name} - {self.discount_type} {self.discount_value}"
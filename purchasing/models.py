@@ -1,11 +1,12 @@
 import uuid
 from django.db import models
 from django.utils.text import slugify
+from MBP.slugs import UniqueSlugMixin
 from catalog.models import Product, Variant
 from inventory.models import Warehouse
 
 # ---------------- Supplier ----------------
-class Supplier(models.Model):
+class Supplier(UniqueSlugMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255, unique=True)
     slug = models.SlugField(unique=True, blank=True)
@@ -26,22 +27,14 @@ class Supplier(models.Model):
         verbose_name = "Supplier"
         verbose_name_plural = "Suppliers"
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.name)
-            slug = base_slug
-            counter = 1
-            while Supplier.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return self.name
 
     def __str__(self):
         return self.name
 
 # ---------------- Purchase Order ----------------
-class PurchaseOrder(models.Model):
+class PurchaseOrder(UniqueSlugMixin, models.Model):
     STATUS_PENDING = 'pending'
     STATUS_RECEIVED = 'received'
     STATUS_CANCELLED = 'cancelled'
@@ -70,16 +63,8 @@ class PurchaseOrder(models.Model):
         verbose_name = "Purchase Order"
         verbose_name_plural = "Purchase Orders"
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(f"{self.supplier.name}-{self.order_number}")
-            slug = base_slug
-            counter = 1
-            while PurchaseOrder.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return f"{self.supplier.name}-{self.order_number}"
 
     def __str__(self):
         return f"PO {self.order_number} - {self.supplier.name}"
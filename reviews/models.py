@@ -1,11 +1,11 @@
 import uuid
 from django.db import models
-from django.utils.text import slugify
+from MBP.slugs import UniqueSlugMixin
 from accounts.models import User
 from catalog.models import Product
 
 
-class ProductReview(models.Model):
+class ProductReview(UniqueSlugMixin, models.Model):
     RATING_CHOICES = [(i, str(i)) for i in range(1, 6)]
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -27,16 +27,8 @@ class ProductReview(models.Model):
         verbose_name_plural = "Product Reviews"
         unique_together = ("product", "user")
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(f"{self.product.slug}-{self.user.email}-review")
-            slug = base_slug
-            counter = 1
-            while ProductReview.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return f"{self.product.slug}-{self.user.email}-review"
 
     def __str__(self):
         return f"Review by {self.user.email} on {self.product.name}"
@@ -1,11 +1,11 @@
 import uuid
 from django.db import models
-from django.utils.text import slugify
+from MBP.slugs import UniqueSlugMixin
 from accounts.models import User
 from catalog.models import Product
 
 
-class Wishlist(models.Model):
+class Wishlist(UniqueSlugMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="wishlists")
     name = models.CharField(max_length=200)
@@ -21,16 +21,8 @@ class Wishlist(models.Model):
         verbose_name_plural = "Wishlists"
         unique_together = ("user", "name")
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(f"{self.user.email}-{self.name}")
-            slug = base_slug
-            counter = 1
-            while Wishlist.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return f"{self.user.email}-{self.name}"
 
     def __str__(self):
         return f"{self.name} ({self.user.email})"
@@ -50,7 +42,7 @@ class WishlistItem(models.Model):
     def __str__(self):
         return f"{self.product.name} in {self.wishlist.name}"
 
-class CompareList(models.Model):
+class CompareList(UniqueSlugMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="compare_list")
     slug = models.SlugField(unique=True, blank=True)
@@ -61,16 +53,8 @@ class CompareList(models.Model):
         verbose_name = "Compare List"
         verbose_name_plural = "Compare Lists"
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(f"{self.user.email}-compare")
-            slug = base_slug
-            counter = 1
-            while CompareList.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_source(self):
+        return f"{self.user.email}-compare"
 
     def __str__(self):
         return f"Compare List of {self.user.email}"
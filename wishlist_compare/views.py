@@ -26,6 +26,7 @@ class WishlistItemViewSet(ProtectedModelViewSet):
     queryset = WishlistItem.objects.select_related("wishlist", "product")
     serializer_class = WishlistItemSerializer
     model_name = "WishlistItem"
+    bulk_actions = ('update', 'delete')  # create depends on the request, see perform_create
 
     def get_queryset(self):
         return super().get_queryset().filter(wishlist__user=self.request.user)
@@ -41,6 +42,7 @@ class CompareListViewSet(ProtectedModelViewSet):
     serializer_class = CompareListSerializer
     model_name = "CompareList"
     lookup_field = "slug"
+    bulk_actions = ('update', 'delete')  # create depends on the request, see perform_create
 
     def get_queryset(self):
         return super().get_queryset().filter(user=self.request.user)
@@ -55,6 +57,7 @@ class CompareItemViewSet(ProtectedModelViewSet):
     queryset = CompareItem.objects.select_related("compare_list", "product")
     serializer_class = CompareItemSerializer
     model_name = "CompareItem"
+    bulk_actions = ('update', 'delete')  # create depends on the request, see perform_create
 
     def get_queryset(self):
         return super().get_queryset().filter(compare_list__user=self.request.user)